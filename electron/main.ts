@@ -1,6 +1,6 @@
 import { app, BrowserWindow, globalShortcut, dialog } from 'electron'
 import { join } from 'path'
-import { readFileSync, writeFileSync, existsSync, mkdirSync } from 'fs'
+import { readFileSync, writeFileSync, existsSync, mkdirSync, openSync, readSync, closeSync } from 'fs'
 import { exec } from 'child_process'
 
 // 屏蔽安全警告
@@ -279,6 +279,80 @@ import { spawn, ChildProcess } from 'child_process'
 let pyProc: ChildProcess | null = null
 let pythonOutputBuffer = '' // 缓冲区用于处理不完整的JSON
 
+// 带id的命令：Python对每条命令恰好回复一行 type 为 response 的消息并带回id
+// 因此可以连续发送多条命令，按id把回复交给对应的调用方，无需等待上一条命令完成
+interface PendingRequest {
+  resolve: (response: any) => void
+  reject: (error: Error) => void
+  timer: NodeJS.Timeout
+}
+
+const pendingRequests = new Map<string, PendingRequest>()
+let requestSeq = 0
+const DEFAULT_REQUEST_TIMEOUT = 30000 // 命令回复的默认超时（毫秒）
+
+function resolvePendingRequest(response: any): void {
+  const id = response?.id
+  if (id === null || id === undefined) return
+  const pending = pendingRequests.get(String(id))
+  if (!pending) return
+  clearTimeout(pending.timer)
+  pendingRequests.delete(String(id))
+  pending.resolve(response)
+}
+
+function rejectAllPendingRequests(reason: string): void {
+  pendingRequests.forEach((pending) => {
+    clearTimeout(pending.timer)
+    pending.reject(new Error(reason))
+  })
+  pendingRequests.clear()
+}
+
+// --- 实时预览帧通道 ---
+// Python把预览帧写入共享内存环形文件，stdout上只发送 preview_frame 通知（路径、偏移、长度、seq）
+// 主进程按通知读取图像数据后直接转发给渲染进程，不经过JSON/Base64
+const PREVIEW_SLOT_HEADER_SIZE = 48 // 槽位头大小，槽位头的前8字节为seq
+
+let previewFd: number | null = null
+let previewPath: string | null = null
+
+function closePreviewChannel(): void {
+  if (previewFd !== null) {
+    try {
+      closeSync(previewFd)
+    } catch (e) {
+      // 文件可能已被Python删除
+    }
+  }
+  previewFd = null
+  previewPath = null
+}
+
+function readPreviewFrame(notification: any): Buffer | null {
+  try {
+    if (previewFd === null || previewPath !== notification.path) {
+      closePreviewChannel()
+      previewFd = openSync(notification.path, 'r')
+      previewPath = notification.path
+    }
+
+    const data = Buffer.allocUnsafe(notification.length)
+    readSync(previewFd, data, 0, notification.length, notification.offset)
+
+    // 读完后槽位的seq仍等于通知中的seq，说明读取期间槽位没有被覆盖
+    const seq = Buffer.allocUnsafe(8)
+    readSync(previewFd, seq, 0, 8, notification.offset - PREVIEW_SLOT_HEADER_SIZE)
+    if (seq.readBigUInt64LE(0) !== BigInt(notification.seq)) return null
+
+    return data
+  } catch (error) {
+    console.error('Failed to read preview frame:', error)
+    closePreviewChannel()
+    return null
+  }
+}
+
 function startPythonEngine() {
   // 根据操作系统选择合适的Python路径
   let pythonPath: string
@@ -340,6 +414,17 @@ function startPythonEngine() {
       if (!line.trim()) return
       try {
         const json = JSON.parse(line)
+        if (json.type === 'response') {
+          resolvePendingRequest(json)
+        }
+        // 预览帧通知只转发读取到的图像数据，不进入通用消息通道
+        if (json.type === 'preview_frame') {
+          const frame = readPreviewFrame(json.data)
+          if (frame && win) {
+            win.webContents.send('preview-frame', { meta: json.data, data: frame })
+          }
+          return
+        }
         if (win) {
           win.webContents.send('python-data', json)
         }
@@ -378,6 +463,8 @@ function startPythonEngine() {
     }
     pyProc = null
     pythonOutputBuffer = ''
+    closePreviewChannel()
+    rejectAllPendingRequests(`Python process exited with code ${code}`)
   })
 
   pyProc.on('error', (error: Error) => {
@@ -411,6 +498,26 @@ ipcMain.on('to-python', (_event: IpcMainEvent, arg: any) => {
   }
 })
 
+// 发送带id的命令并等待对应的回复（回复消息为 { type: 'response', id, action, success, data, timing }）
+ipcMain.handle('python-request', (_event, command: any, timeoutMs?: number) => {
+  return new Promise((resolve, reject) => {
+    if (!pyProc || !pyProc.stdin) {
+      reject(new Error('Python engine is not running'))
+      return
+    }
+
+    const id = `req-${++requestSeq}`
+    const timeout = timeoutMs ?? DEFAULT_REQUEST_TIMEOUT
+    const timer = setTimeout(() => {
+      pendingRequests.delete(id)
+      reject(new Error(`Python command '${command?.action}' timed out after ${timeout}ms`))
+    }, timeout)
+    pendingRequests.set(id, { resolve, reject, timer })
+
+    pyProc.stdin.write(JSON.stringify({ ...command, id }) + '\n')
+  })
+})
+
 // 处理 ping 请求
 ipcMain.handle('ping', async () => {
   console.log('Received ping from renderer')
@@ -5,6 +5,13 @@ console.log('[Preload] Script loaded')
 contextBridge.exposeInMainWorld('electronAPI', {
   ping: () => ipcRenderer.invoke('ping'),
   sendToPython: (data: any) => ipcRenderer.send('to-python', data),
+  // 发送命令并等待该命令的回复（可以同时发送多条命令）
+  invokePython: (command: any, timeoutMs?: number) => ipcRenderer.invoke('python-request', command, timeoutMs),
+  // 实时预览帧（图像数据由主进程从共享内存通道读取）
+  onPreviewFrame: (callback: (frame: { meta: any; data: Uint8Array }) => void) => {
+    ipcRenderer.on('preview-frame', (_event, value) => callback(value))
+  },
+  offPreviewFrame: () => ipcRenderer.removeAllListeners('preview-frame'),
   onPythonData: (callback: (data: any) => void) => {
     ipcRenderer.on('python-data', (_event, value) => callback(value))
   },
@@ -0,0 +1,223 @@
+"""
+截图后端模块
+描述可用的截图方式（GDI、MIT-SHM、PIL ImageGrab、pyautogui等），并通过短时间的计时测试
+测量每种方式的帧率、延迟和画面正确性，自动选出当前机器上最快的可用后端
+"""
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from engine_log import get_logger
+from frame_source import convert_image, converted_shape
+
+logger = get_logger('capture_backends')
+
+
+# 原生格式的通道数
+_FORMAT_CHANNELS = {'bgra': 4, 'rgba': 4, 'rgb': 3, 'bgr': 3, 'gray': None}
+
+
+class CaptureBackend:
+    """
+    截图后端
+    
+    grab返回原生格式的 (image, format)，失败返回None；
+    region说明截图覆盖的范围：'window'为目标窗口区域，'screen'为整个屏幕。
+    只有覆盖范围相同的后端之间才能比较画面内容
+    """
+    
+    __slots__ = ('name', 'grab', 'region', 'description')
+    
+    def __init__(self, name: str, grab: Callable[[], Optional[Tuple[np.ndarray, str]]], region: str,
+                 description: str = ''):
+        """
+        初始化截图后端
+        
+        Args:
+            name: 后端名称
+            grab: 截图函数
+            region: 截图覆盖范围（'window'或'screen'）
+            description: 说明
+        """
+        self.name = name
+        self.grab = grab
+        self.region = region
+        self.description = description
+
+
+class CaptureBenchmark:
+    """
+    截图后端计时测试
+    
+    每个后端先预热截图一次（分配共享内存、建立设备上下文等一次性开销），再连续截图
+    直到达到帧数或时间预算，截图耗时包含转换为存储格式的开销。正确性检查包括：
+    - 返回的图像类型和通道数与声明的原生格式一致，尺寸稳定
+    - 画面不是纯色（硬件加速窗口用GDI截图时常得到全黑画面，缺少录屏权限时得到空白画面）
+    - 与覆盖范围相同的参考后端（列表中第一个通过上述检查的后端）的缩略图一致
+    
+    不在用户屏幕上绘制测试图案：参考画面即屏幕上的实际内容
+    """
+    
+    DEFAULT_FRAMES = 10          # 每个后端计时的截图次数
+    DEFAULT_TIME_BUDGET = 1.5    # 每个后端的最长计时时间（秒）
+    BLANK_STD = 2.0              # 缩略图像素值标准差低于该值视为纯色画面
+    MAX_MEAN_DIFF = 12.0         # 与参考后端缩略图的平均像素差上限（0-255）
+    THUMBNAIL_SIZE = (64, 36)    # 比较画面使用的缩略图尺寸
+    
+    def __init__(self, frames: int = DEFAULT_FRAMES, time_budget: float = DEFAULT_TIME_BUDGET, fmt: str = 'bgr'):
+        """
+        初始化计时测试
+        
+        Args:
+            frames: 每个后端计时的截图次数
+            time_budget: 每个后端的最长计时时间（秒）
+            fmt: 截图转换到的存储格式（与截图线程一致）
+        """
+        self.frames = max(1, int(frames))
+        self.time_budget = float(time_budget)
+        self.format = fmt
+    
+    def run(self, backends: List[CaptureBackend]) -> Dict[str, Any]:
+        """
+        依次测试所有后端并选出最快的可用后端
+        
+        Args:
+            backends: 待测试的后端，按优先级排列（第一个通过检查的作为对应覆盖范围的参考）
+        
+        Returns:
+            Dict[str, Any]: {'selected': 后端名称或None, 'results': [每个后端的测试结果], 'timestamp': 测试时间}
+        """
+        results = []
+        references = {}
+        
+        for backend in backends:
+            result, thumbnail = self._measure(backend)
+            if result['ok']:
+                reference = references.get(backend.region)
+                if reference is None:
+                    references[backend.region] = (backend.name, thumbnail)
+                elif thumbnail.shape == reference[1].shape:
+                    diff = float(np.mean(cv2.absdiff(thumbnail, reference[1])))
+                    result['reference_diff'] = round(diff, 2)
+                    if diff > self.MAX_MEAN_DIFF:
+                        result['ok'] = False
+                        result['error'] = f"画面与{reference[0]}不一致（平均差{diff:.1f}）"
+            results.append(result)
+            
+            status = f"{result['avg_ms']:.1f}ms, {result['fps']:.1f}fps" if result['ok'] else result['error']
+            logger.info("Capture backend %s: %s", backend.name, status)
+        
+        passed = [result for result in results if result['ok']]
+        selected = min(passed, key=lambda result: result['avg_ms'])['name'] if passed else None
+        return {'selected': selected, 'results': results, 'timestamp': time.time()}
+    
+    def _measure(self, backend: CaptureBackend) -> Tuple[Dict[str, Any], Optional[np.ndarray]]:
+        """
+        测试单个后端
+        
+        Args:
+            backend: 截图后端
+        
+        Returns:
+            tuple: (result, thumbnail) 测试结果和最后一帧的缩略图（检查未通过时为None）
+        """
+        result = {
+            'name': backend.name,
+            'region': backend.region,
+            'ok': False,
+            'error': None,
+            'frames': 0,
+            'avg_ms': None,
+            'max_ms': None,
+            'fps': None,
+            'size': None,
+            'native_format': None
+        }
+        
+        try:
+            # 预热：一次性的初始化开销不计入
+            grabbed = backend.grab()
+            error = self._check(grabbed)
+            if error:
+                result['error'] = error
+                return result, None
+            size = grabbed[0].shape[:2]
+            
+            buffer = None
+            latencies = []
+            started = time.perf_counter()
+            while len(latencies) < self.frames and time.perf_counter() - started < self.time_budget:
+                grab_started = time.perf_counter()
+                grabbed = backend.grab()
+                if grabbed is None:
+                    result['error'] = "截图失败"
+                    return result, None
+                image, fmt = grabbed
+                if image.shape[:2] != size:
+                    result['error'] = f"截图尺寸不稳定: {size} -> {image.shape[:2]}"
+                    return result, None
+                shape = converted_shape(image.shape, self.format)
+                if buffer is None or buffer.shape != shape:
+                    buffer = np.empty(shape, dtype=np.uint8)
+                convert_image(image, fmt, self.format, dst=buffer)
+                latencies.append((time.perf_counter() - grab_started) * 1000)
+            elapsed = time.perf_counter() - started
+        except Exception as e:
+            result['error'] = f"截图异常: {e}"
+            return result, None
+        
+        thumbnail = self._thumbnail(image, fmt)
+        result.update({
+            'frames': len(latencies),
+            'avg_ms': round(sum(latencies) / len(latencies), 2),
+            'max_ms': round(max(latencies), 2),
+            'fps': round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+            'size': (int(size[1]), int(size[0])),
+            'native_format': fmt
+        })
+        
+        if float(np.std(thumbnail)) < self.BLANK_STD:
+            result['error'] = "画面为纯色（截图内容无效）"
+            return result, None
+        
+        result['ok'] = True
+        return result, thumbnail
+    
+    @staticmethod
+    def _check(grabbed) -> Optional[str]:
+        """
+        检查截图结果的类型、格式和通道数
+        
+        Args:
+            grabbed: 后端返回的 (image, format)
+        
+        Returns:
+            str: 错误说明，通过时返回None
+        """
+        if grabbed is None:
+            return "截图失败"
+        image, fmt = grabbed
+        if not isinstance(image, np.ndarray) or image.dtype != np.uint8 or image.size == 0:
+            return "截图结果不是有效的uint8图像"
+        if fmt not in _FORMAT_CHANNELS:
+            return f"不支持的原生格式: {fmt}"
+        channels = image.shape[2] if image.ndim == 3 else None
+        if channels != _FORMAT_CHANNELS[fmt]:
+            return f"通道数 {channels} 与格式 {fmt} 不一致"
+        return None
+    
+    def _thumbnail(self, image: np.ndarray, fmt: str) -> np.ndarray:
+        """
+        生成比较画面用的彩色缩略图（保留颜色，通道顺序声明错误的后端也能被发现）
+        
+        Args:
+            image: 原生格式的图像
+            fmt: 原生格式
+        
+        Returns:
+            numpy.ndarray: float32 BGR缩略图
+        """
+        small = cv2.resize(image, self.THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+        return convert_image(small, fmt, 'bgr').astype(np.float32)
@@ -0,0 +1,276 @@
+"""
+截图调度模块
+由独立的截图线程按固定节奏从帧来源读取画面，写入预分配的帧环形缓冲区。
+所有消费者（识别循环、窗口服务、坐标转换等）读取最新帧或等待下一帧，不再各自截图
+"""
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from engine_log import get_logger
+from frame_source import FRAME_FORMATS, Frame, convert_image, converted_shape
+
+logger = get_logger('capture_scheduler')
+
+
+class CaptureScheduler:
+    """
+    截图调度器
+    
+    截图线程按配置的帧率调用read_frame，把图像从原生格式一次转换为存储格式（format），
+    直接写入环形缓冲区的下一个槽位，
+    并为每帧分配调度器内单调递增的帧序号。Frame.timestamp沿用帧来源的时间戳
+    （实时截图为time.monotonic()，回放为原始时间戳）。
+    
+    槽位的缓冲区只在没有消费者持有时复用：仍被引用的旧帧保持不变，
+    该槽位改为分配新的缓冲区，因此消费者拿到的帧在使用期间不会被覆盖
+    """
+    
+    DEFAULT_FPS = 10.0       # 默认截图帧率
+    DEFAULT_RING_SIZE = 4    # 环形缓冲区槽位数
+    FPS_WINDOW = 30          # 统计实际帧率使用的最近帧数
+    
+    def __init__(self, read_frame: Callable[[], Optional[Frame]], fps: float = DEFAULT_FPS,
+                 ring_size: int = DEFAULT_RING_SIZE, fmt: str = 'bgr'):
+        """
+        初始化截图调度器
+        
+        Args:
+            read_frame: 读取一帧的函数，失败返回None
+            fps: 截图帧率
+            ring_size: 环形缓冲区槽位数（至少2）
+            fmt: 环形缓冲区中帧的存储格式（FRAME_FORMATS之一）
+        """
+        self._read_frame = read_frame
+        self.fps = float(fps)
+        self.ring_size = max(2, int(ring_size))
+        self.format = fmt
+        
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        
+        # 环形缓冲区
+        self._buffers: List[Optional[np.ndarray]] = [None] * self.ring_size
+        self._frames: List[Optional[Frame]] = [None] * self.ring_size
+        self._next_slot = 0
+        self._latest: Optional[Frame] = None
+        self._frame_id = 0
+        
+        # 统计信息
+        self._capture_times = deque(maxlen=self.FPS_WINDOW)
+        self._stats = {
+            'frames_captured': 0,
+            'capture_failures': 0,
+            'buffer_allocations': 0,
+            'latest_reads': 0,
+            'wait_reads': 0,
+            'total_grab_ms': 0.0
+        }
+    
+    @property
+    def is_running(self) -> bool:
+        """截图线程是否在运行（已请求停止的线程不算）"""
+        return self._thread is not None and self._thread.is_alive() and not self._stop_event.is_set()
+    
+    def start(self) -> bool:
+        """
+        启动截图线程
+        
+        Returns:
+            bool: 是否启动（已在运行时返回False）
+        """
+        if self.is_running:
+            return False
+        
+        # 上一个截图线程可能卡在截图调用中尚未退出，两个线程不能同时写入环形缓冲区
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            if self._thread.is_alive():
+                logger.warn("Previous capture thread is still stopping, scheduler not restarted")
+                return False
+            self._thread = None
+        
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="CaptureScheduler", daemon=True)
+        self._thread.start()
+        logger.info("Capture scheduler started at %.1f fps", self.fps)
+        return True
+    
+    def stop(self) -> None:
+        """停止截图线程并唤醒所有等待中的消费者"""
+        if self._thread is None:
+            return
+        
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        self._thread.join(timeout=2.0)
+        if self._thread.is_alive():
+            # 截图调用卡住时保留线程引用，线程看到停止标志后自行退出，start()会等待它
+            logger.warn("Capture thread did not stop within 2s, still waiting for the current grab")
+            return
+        self._thread = None
+        logger.info("Capture scheduler stopped")
+    
+    def set_fps(self, fps: float) -> None:
+        """
+        设置截图帧率，下一帧开始生效
+        
+        Args:
+            fps: 截图帧率（大于0）
+        """
+        if fps <= 0:
+            raise ValueError("fps必须大于0")
+        self.fps = float(fps)
+    
+    def set_format(self, fmt: str) -> None:
+        """
+        设置帧的存储格式，下一帧开始生效
+        
+        Args:
+            fmt: 存储格式（FRAME_FORMATS之一）
+        """
+        if fmt not in FRAME_FORMATS:
+            raise ValueError(f"不支持的帧格式: {fmt}")
+        self.format = fmt
+    
+    def clear(self) -> None:
+        """丢弃当前的最新帧（切换帧来源后调用，使消费者等待新来源的帧）"""
+        with self._condition:
+            self._latest = None
+    
+    def latest(self) -> Optional[Frame]:
+        """
+        获取最新帧，不触发截图
+        
+        Returns:
+            Frame: 最新帧，还没有帧时返回None
+        """
+        with self._condition:
+            self._stats['latest_reads'] += 1
+            return self._latest
+    
+    def wait_next(self, after_id: Optional[int] = None, timeout: Optional[float] = None) -> Optional[Frame]:
+        """
+        等待比after_id更新的帧
+        
+        Args:
+            after_id: 已处理过的帧序号，None表示等待当前最新帧之后的下一帧
+            timeout: 最长等待时间（秒），None一直等待直到调度器停止
+        
+        Returns:
+            Frame: 新帧，超时或调度器停止时返回None
+        """
+        with self._condition:
+            self._stats['wait_reads'] += 1
+            # 大于已分配序号的after_id来自调度器之外（如调度器启动前直接截图），按None处理
+            if after_id is None or after_id > self._frame_id:
+                after_id = self._latest.frame_id if self._latest is not None else 0
+            
+            self._condition.wait_for(
+                lambda: self._stop_event.is_set()
+                or (self._latest is not None and self._latest.frame_id > after_id),
+                timeout=timeout
+            )
+            frame = self._latest
+        
+        return frame if frame is not None and frame.frame_id > after_id else None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取截图统计信息
+        
+        Returns:
+            Dict[str, Any]: 配置帧率、实际帧率、截图耗时、失败次数等
+        """
+        with self._condition:
+            stats = dict(self._stats)
+            times = list(self._capture_times)
+            latest = self._latest
+        
+        captured = stats.pop('frames_captured')
+        total_grab_ms = stats.pop('total_grab_ms')
+        measured_fps = (len(times) - 1) / (times[-1] - times[0]) if len(times) > 1 and times[-1] > times[0] else 0.0
+        
+        stats.update({
+            'running': self.is_running,
+            'target_fps': self.fps,
+            'measured_fps': round(measured_fps, 2),
+            'frames_captured': captured,
+            'avg_grab_ms': round(total_grab_ms / captured, 2) if captured else 0.0,
+            'ring_size': self.ring_size,
+            'format': self.format,
+            'latest_frame_id': latest.frame_id if latest is not None else None,
+            'latest_frame_age_ms': round((time.monotonic() - times[-1]) * 1000, 1) if latest is not None and times else None
+        })
+        return stats
+    
+    def _run(self) -> None:
+        """截图线程主循环"""
+        next_due = time.monotonic()
+        
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                frame = self._read_frame()
+            except Exception as e:
+                logger.error("Capture scheduler read failed: %s", e, interval=5)
+                frame = None
+            grab_ms = (time.monotonic() - started) * 1000
+            if self._stop_event.is_set():
+                # 停止期间完成的截图不再发布（可能已暂停或切换了帧来源）
+                break
+            
+            if frame is not None:
+                self._store(frame, grab_ms)
+            else:
+                with self._condition:
+                    self._stats['capture_failures'] += 1
+            
+            # 按固定节奏截图；截图耗时超过间隔时从当前时间重新计时，不补帧
+            next_due += 1.0 / self.fps
+            now = time.monotonic()
+            if next_due < now:
+                next_due = now
+            self._stop_event.wait(next_due - now)
+    
+    def _store(self, frame: Frame, grab_ms: float) -> None:
+        """
+        把帧转换为存储格式写入环形缓冲区的下一个槽位，并通知等待的消费者
+        
+        Args:
+            frame: 帧来源读取的帧
+            grab_ms: 截图耗时（毫秒）
+        """
+        image = frame.image
+        fmt = self.format
+        shape = converted_shape(image.shape, fmt)
+        slot = self._next_slot
+        self._next_slot = (slot + 1) % self.ring_size
+        
+        # 先释放环形缓冲区对旧帧的引用，再判断是否还有消费者持有该槽位的缓冲区
+        # （无人持有时引用只有缓冲区列表、局部变量和getrefcount的参数）
+        self._frames[slot] = None
+        buffer = self._buffers[slot]
+        if buffer is None or buffer.shape != shape or buffer.dtype != image.dtype \
+                or sys.getrefcount(buffer) > 3:
+            buffer = np.empty(shape, dtype=image.dtype)
+            self._buffers[slot] = buffer
+            self._stats['buffer_allocations'] += 1
+        
+        convert_image(image, frame.format, fmt, dst=buffer)
+        
+        with self._condition:
+            self._frame_id += 1
+            stored = Frame(buffer.view(), self._frame_id, frame.timestamp, frame.source, fmt, frame.captured_at)
+            self._frames[slot] = stored
+            self._latest = stored
+            self._capture_times.append(time.monotonic())
+            self._stats['frames_captured'] += 1
+            self._stats['total_grab_ms'] += grab_ms
+            self._condition.notify_all()
@@ -4,11 +4,23 @@
 
 from .base_service import BaseService, ServiceManager
 from .command_handler import CommandRouter, BaseCommandHandler, SystemCommandHandler
+from .dispatcher import CommandDispatcher, CONCURRENT_LANE
+from .protocol import (PROTOCOL_VERSION, emit, build_response, build_ready_message,
+                       install_output_writer, uninstall_output_writer, get_output_writer)
 
 __all__ = [
     'BaseService',
     'ServiceManager', 
     'CommandRouter',
     'BaseCommandHandler',
-    'SystemCommandHandler'
+    'SystemCommandHandler',
+    'CommandDispatcher',
+    'CONCURRENT_LANE',
+    'PROTOCOL_VERSION',
+    'emit',
+    'build_response',
+    'build_ready_message',
+    'install_output_writer',
+    'uninstall_output_writer',
+    'get_output_writer'
 ]
\ No newline at end of file
@@ -4,9 +4,11 @@
 """
 from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional
-import json
 import time
 
+from engine_log import get_logger
+from .protocol import emit
+
 
 class BaseService(ABC):
     """
@@ -90,14 +92,25 @@ class BaseService(ABC):
         """
         return self._config.copy()
     
-    def log(self, message: str, level: str = "INFO") -> None:
+    def log(self, message: str, level: str = "INFO", interval: Optional[float] = None) -> None:
         """
         记录日志 - 统一的日志格式
         
         Args:
             message: 日志消息
             level: 日志级别 (INFO, WARN, ERROR, DEBUG)
-        """
+            interval: 同一条消息的最小发送间隔（秒），用于循环中重复出现的日志，None不限频
+        """
+        # 低于服务日志级别（set_log_level命令可按服务调整）的日志不构造消息
+        logger = get_logger(self.service_name)
+        if not logger.is_enabled(level):
+            return
+        if interval is not None:
+            suppressed = logger.allow(message, interval)
+            if suppressed < 0:
+                return
+            if suppressed:
+                message = f"{message} (已抑制 {suppressed} 条相同日志)"
         log_data = {
             "type": "log",
             "data": {
@@ -107,7 +120,7 @@ class BaseService(ABC):
                 "timestamp": time.time()
             }
         }
-        print(json.dumps(log_data), flush=True)
+        emit(log_data)
     
     def send_response(self, response_type: str, data: Dict[str, Any]) -> None:
         """
@@ -123,7 +136,7 @@ class BaseService(ABC):
             "service": self.service_name,
             "timestamp": time.time()
         }
-        print(json.dumps(response), flush=True)
+        emit(response)
     
     def handle_error(self, error: Exception, context: str = "") -> None:
         """
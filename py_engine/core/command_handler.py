@@ -4,9 +4,12 @@
 """
 from typing import Dict, Any, Callable, Optional
 from abc import ABC, abstractmethod
-import json
 import time
 
+from engine_log import log_manager, get_logger
+from .dispatcher import CONCURRENT_LANE
+from .protocol import emit, get_output_writer
+
 
 class CommandValidator:
     """
@@ -56,7 +59,7 @@ class CommandValidator:
         
         # 检查未知参数（可选）
         all_params = set(required_params + (optional_params or []))
-        unknown_params = set(cmd.keys()) - all_params - {'action'}
+        unknown_params = set(cmd.keys()) - all_params - {'action', 'id'}
         
         if unknown_params:
             return False, f"未知参数: {', '.join(unknown_params)}"
@@ -103,6 +106,29 @@ class BaseCommandHandler(ABC):
         """
         pass
     
+    def get_concurrent_actions(self) -> list:
+        """
+        获取可以并发执行的命令（只读的状态查询等），其余命令在处理器自己的通道中按顺序执行
+        
+        Returns:
+            list: 命令名称列表
+        """
+        return []
+    
+    def get_command_lane(self, action: str) -> str:
+        """
+        获取命令的调度通道
+        
+        Args:
+            action: 命令名称
+            
+        Returns:
+            str: 并发命令返回CONCURRENT_LANE，其余命令返回处理器名称（同一处理器的命令串行执行）
+        """
+        if action in self.get_concurrent_actions():
+            return CONCURRENT_LANE
+        return self.handler_name
+    
     def can_handle(self, action: str) -> bool:
         """
         检查是否可以处理指定命令
@@ -126,6 +152,8 @@ class BaseCommandHandler(ABC):
             message: 日志消息
             level: 日志级别
         """
+        if not get_logger(self.handler_name).is_enabled(level):
+            return
         log_data = {
             "type": "log",
             "data": {
@@ -135,7 +163,7 @@ class BaseCommandHandler(ABC):
                 "timestamp": time.time()
             }
         }
-        print(json.dumps(log_data), flush=True)
+        emit(log_data)
     
     def send_response(self, response_type: str, data: Dict[str, Any]) -> None:
         """
@@ -151,7 +179,7 @@ class BaseCommandHandler(ABC):
             "handler": self.handler_name,
             "timestamp": time.time()
         }
-        print(json.dumps(response), flush=True)
+        emit(response)
 
 
 class CommandRouter:
@@ -253,6 +281,22 @@ class CommandRouter:
             
             return error_result
     
+    def get_command_lane(self, cmd: Dict[str, Any]) -> str:
+        """
+        获取命令的调度通道
+        
+        Args:
+            cmd: 命令字典
+            
+        Returns:
+            str: 通道名称；无效或未知的命令直接返回错误，放在并发通道
+        """
+        action = cmd.get('action') if isinstance(cmd, dict) else None
+        handler = self._handlers.get(self._action_to_handler.get(action))
+        if handler is None:
+            return CONCURRENT_LANE
+        return handler.get_command_lane(action)
+    
     def get_supported_commands(self) -> Dict[str, str]:
         """
         获取所有支持的命令及其处理器
@@ -286,15 +330,17 @@ class SystemCommandHandler(BaseCommandHandler):
     如ping、获取状态、获取支持的命令列表等
     """
     
-    def __init__(self, service_manager):
+    def __init__(self, service_manager, dispatcher=None):
         """
         初始化系统命令处理器
         
         Args:
             service_manager: 服务管理器实例
+            dispatcher: 命令调度器实例（用于查询调度状态）
         """
         super().__init__("SystemCommandHandler")
         self.service_manager = service_manager
+        self.dispatcher = dispatcher
     
     def get_supported_actions(self) -> list:
         """获取支持的命令列表"""
@@ -302,9 +348,15 @@ class SystemCommandHandler(BaseCommandHandler):
             'ping',
             'get_system_status',
             'get_supported_commands',
-            'get_service_status'
+            'get_service_status',
+            'set_output_policy',
+            'set_log_level'
         ]
     
+    def get_concurrent_actions(self) -> list:
+        """系统命令都是轻量操作，全部并发执行"""
+        return self.get_supported_actions()
+    
     def handle_command(self, action: str, cmd: Dict[str, Any]) -> Dict[str, Any]:
         """
         处理系统命令
@@ -324,6 +376,10 @@ class SystemCommandHandler(BaseCommandHandler):
             return self._handle_get_supported_commands(cmd)
         elif action == 'get_service_status':
             return self._handle_get_service_status(cmd)
+        elif action == 'set_output_policy':
+            return self._handle_set_output_policy(cmd)
+        elif action == 'set_log_level':
+            return self._handle_set_log_level(cmd)
         else:
             return {
                 "success": False,
@@ -373,7 +429,10 @@ class SystemCommandHandler(BaseCommandHandler):
                 "architecture": platform.architecture(),
                 "processor": platform.processor()
             },
-            "services": self.service_manager.get_all_status() if self.service_manager else {}
+            "services": self.service_manager.get_all_status() if self.service_manager else {},
+            "dispatcher": self.dispatcher.get_stats() if self.dispatcher else None,
+            "output": get_output_writer().get_stats() if get_output_writer() else None,
+            "logging": log_manager.get_stats()
         }
         
         return status
@@ -413,4 +472,72 @@ class SystemCommandHandler(BaseCommandHandler):
         return {
             "success": True,
             "services": self.service_manager.get_all_status()
-        }
\ No newline at end of file
+        }
+    
+    def _handle_set_output_policy(self, cmd: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        调整输出队列的容量和队列满时的丢弃策略
+        
+        Args:
+            cmd: 命令参数（max_messages、policy、droppable_levels）
+            
+        Returns:
+            Dict[str, Any]: 调整后的输出统计
+        """
+        writer = get_output_writer()
+        if writer is None:
+            return {
+                "success": False,
+                "error": "异步输出未启用"
+            }
+        
+        try:
+            writer.configure(cmd.get('max_messages'), cmd.get('policy'), cmd.get('droppable_levels'))
+        except (TypeError, ValueError) as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+        
+        return {
+            "success": True,
+            "output": writer.get_stats()
+        }
+    
+    def _handle_set_log_level(self, cmd: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        运行时调整日志级别
+        
+        Args:
+            cmd: 命令参数
+                - level: DEBUG、INFO、WARN、ERROR或OFF；指定module时为null表示恢复为默认级别
+                - module: 模块、服务或处理器名称（如image_recognition、window_capture、WindowService），
+                  不指定时设置默认级别
+                - dedup_window: 重复日志的去重窗口（秒），可选
+            
+        Returns:
+            Dict[str, Any]: 调整后的日志配置
+        """
+        module = cmd.get('module')
+        level = cmd.get('level')
+        if module is None and level is None and cmd.get('dedup_window') is None:
+            return {
+                "success": False,
+                "error": "缺少参数: level"
+            }
+        
+        try:
+            if module is not None or level is not None:
+                log_manager.set_level(level, module)
+            if cmd.get('dedup_window') is not None:
+                log_manager.dedup_window = max(0.0, float(cmd['dedup_window']))
+        except (TypeError, ValueError) as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+        
+        return {
+            "success": True,
+            "logging": log_manager.get_stats()
+        }
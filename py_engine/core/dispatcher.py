@@ -0,0 +1,258 @@
+"""
+命令调度器 - 在线程池中执行命令，避免慢命令阻塞stdin读取循环
+命令按处理器给出的通道（lane）调度：
+- 串行通道：同一通道的命令按收到的顺序逐条执行（如窗口命令），不同通道之间互不等待
+- 并发通道（CONCURRENT_LANE）：状态查询等只读命令收到即执行，不排在慢命令之后
+每个通道限制排队深度，超过时立即回复错误，而不是无限堆积
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Optional
+import threading
+import time
+
+from engine_log import get_logger
+from .protocol import build_response
+
+logger = get_logger('dispatcher')
+
+
+# 并发通道名称：该通道的命令不排队，收到即提交到线程池
+CONCURRENT_LANE = "concurrent"
+
+
+def _field(command: Any, key: str) -> Any:
+    """读取命令字段（命令不是字典时返回None）"""
+    return command.get(key) if isinstance(command, dict) else None
+
+
+class CommandLane:
+    """
+    调度通道 - 记录一个通道的排队命令和统计
+    """
+    
+    def __init__(self, name: str, serial: bool, max_depth: int):
+        """
+        初始化调度通道
+        
+        Args:
+            name: 通道名称
+            serial: 是否串行执行
+            max_depth: 最大深度（排队中和执行中的命令总数）
+        """
+        self.name = name
+        self.serial = serial
+        self.max_depth = max(1, int(max_depth))
+        self.queue = deque()   # 串行通道等待执行的 (command, received_at)
+        self.active = False    # 串行通道是否有线程正在依次执行命令
+        self.in_flight = 0     # 排队中和执行中的命令数
+        self.stats = {'completed': 0, 'rejected': 0, 'max_in_flight': 0, 'total_wait_ms': 0.0}
+
+
+class CommandDispatcher:
+    """
+    命令调度器
+    
+    execute在工作线程中处理一条命令并返回回复消息，respond负责把回复发送给前端；
+    lane_of根据命令返回通道名称。未在lanes中配置的通道按串行通道处理
+    """
+    
+    DEFAULT_MAX_WORKERS = 8         # 线程池大小（应大于串行通道数，保证并发通道始终有空闲线程）
+    DEFAULT_SERIAL_DEPTH = 16       # 串行通道默认最大深度
+    DEFAULT_CONCURRENT_DEPTH = 64   # 并发通道默认最大深度
+    
+    def __init__(self, execute: Callable[[Dict[str, Any], float], Dict[str, Any]],
+                 respond: Callable[[Dict[str, Any]], None],
+                 lane_of: Callable[[Dict[str, Any]], str],
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 lanes: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        初始化命令调度器
+        
+        Args:
+            execute: 执行命令的函数，参数为 (command, received_at)，返回回复消息
+            respond: 发送回复消息的函数
+            lane_of: 返回命令所在通道名称的函数
+            max_workers: 线程池大小
+            lanes: 通道配置 {lane_name: {'serial': bool, 'max_depth': int}}
+        """
+        self._execute = execute
+        self._respond = respond
+        self._lane_of = lane_of
+        self.max_workers = max(2, int(max_workers))
+        
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lanes: Dict[str, CommandLane] = {}
+        self._accepting = True
+        
+        self.configure_lanes({CONCURRENT_LANE: {'serial': False, 'max_depth': self.DEFAULT_CONCURRENT_DEPTH}})
+        if lanes:
+            self.configure_lanes(lanes)
+    
+    def configure_lanes(self, lanes: Dict[str, Dict[str, Any]]) -> None:
+        """
+        设置通道的执行方式和最大深度（已在排队的命令不受影响）
+        
+        Args:
+            lanes: 通道配置 {lane_name: {'serial': bool, 'max_depth': int}}
+        """
+        with self._lock:
+            for name, options in lanes.items():
+                lane = self._get_lane(name)
+                if 'serial' in options and name != CONCURRENT_LANE:
+                    lane.serial = bool(options['serial'])
+                if 'max_depth' in options:
+                    lane.max_depth = max(1, int(options['max_depth']))
+    
+    def submit(self, command: Dict[str, Any], received_at: float) -> bool:
+        """
+        提交一条命令，立即返回（回复由工作线程发送）
+        
+        Args:
+            command: 命令字典
+            received_at: 收到命令的时间（time.perf_counter()）
+        
+        Returns:
+            bool: 是否已接受；通道已满或调度器已关闭时直接回复错误并返回False
+        """
+        try:
+            lane_name = self._lane_of(command) or CONCURRENT_LANE
+        except Exception:
+            lane_name = CONCURRENT_LANE
+        
+        with self._lock:
+            lane = self._get_lane(lane_name)
+            error = None
+            if not self._accepting:
+                error = ("引擎正在停止，不再接受命令", "dispatcher_closed")
+            elif lane.in_flight >= lane.max_depth:
+                lane.stats['rejected'] += 1
+                error = (f"命令通道 {lane_name} 已满（{lane.max_depth}），请稍后重试", "queue_full")
+            
+            if error is None:
+                lane.in_flight += 1
+                lane.stats['max_in_flight'] = max(lane.stats['max_in_flight'], lane.in_flight)
+                executor = self._get_executor()
+                if not lane.serial:
+                    executor.submit(self._run_one, lane, command, received_at)
+                else:
+                    lane.queue.append((command, received_at))
+                    if not lane.active:
+                        lane.active = True
+                        executor.submit(self._drain, lane)
+        
+        if error is not None:
+            message, error_type = error
+            result = {"success": False, "error": message, "error_type": error_type, "lane": lane_name}
+            now = time.perf_counter()
+            self._respond(build_response(_field(command, 'id'), _field(command, 'action'), result, received_at, now, now))
+            return False
+        return True
+    
+    def shutdown(self, timeout: Optional[float] = 10.0) -> bool:
+        """
+        停止接受新命令，等待已接受的命令执行完毕
+        
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+        
+        Returns:
+            bool: 是否所有命令都已执行完毕
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._accepting = False
+            while any(lane.in_flight for lane in self._lanes.values()):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._idle.wait(remaining)
+            finished = not any(lane.in_flight for lane in self._lanes.values())
+            executor, self._executor = self._executor, None
+        
+        if executor is not None:
+            executor.shutdown(wait=False)
+        return finished
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取各通道的排队和执行统计
+        
+        Returns:
+            Dict[str, Any]: {lane_name: 通道状态}
+        """
+        with self._lock:
+            stats = {}
+            for name, lane in self._lanes.items():
+                completed = lane.stats['completed']
+                stats[name] = {
+                    'serial': lane.serial,
+                    'max_depth': lane.max_depth,
+                    'in_flight': lane.in_flight,
+                    'queued': len(lane.queue),
+                    'completed': completed,
+                    'rejected': lane.stats['rejected'],
+                    'max_in_flight': lane.stats['max_in_flight'],
+                    'avg_wait_ms': round(lane.stats['total_wait_ms'] / completed, 3) if completed else 0.0
+                }
+            return {'max_workers': self.max_workers, 'accepting': self._accepting, 'lanes': stats}
+    
+    def _get_lane(self, name: str) -> CommandLane:
+        """获取通道，不存在时按串行通道创建（调用方需持有锁）"""
+        lane = self._lanes.get(name)
+        if lane is None:
+            serial = name != CONCURRENT_LANE
+            depth = self.DEFAULT_SERIAL_DEPTH if serial else self.DEFAULT_CONCURRENT_DEPTH
+            lane = self._lanes[name] = CommandLane(name, serial, depth)
+        return lane
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """按需创建线程池（调用方需持有锁）"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="CommandWorker")
+        return self._executor
+    
+    def _drain(self, lane: CommandLane) -> None:
+        """
+        串行通道的执行循环：依次执行队列中的命令，队列为空时退出
+        
+        Args:
+            lane: 串行通道
+        """
+        while True:
+            with self._lock:
+                if not lane.queue:
+                    lane.active = False
+                    return
+                command, received_at = lane.queue.popleft()
+            self._run_one(lane, command, received_at)
+    
+    def _run_one(self, lane: CommandLane, command: Dict[str, Any], received_at: float) -> None:
+        """
+        执行一条命令并发送回复（异常也转换为回复，保证每条命令恰好一条回复）
+        
+        Args:
+            lane: 命令所在通道
+            command: 命令字典
+            received_at: 收到命令的时间（time.perf_counter()）
+        """
+        started_at = time.perf_counter()
+        try:
+            response = self._execute(command, received_at)
+        except Exception as e:
+            result = {"success": False, "error": str(e), "error_type": "dispatch_error"}
+            response = build_response(_field(command, 'id'), _field(command, 'action'), result,
+                                      received_at, started_at, time.perf_counter())
+        
+        try:
+            self._respond(response)
+        except Exception as e:
+            logger.error("[CommandDispatcher] 发送回复失败: %s, 错误: %s", _field(command, 'action'), e)
+        finally:
+            with self._lock:
+                lane.in_flight -= 1
+                lane.stats['completed'] += 1
+                lane.stats['total_wait_ms'] += (started_at - received_at) * 1000
+                self._idle.notify_all()
@@ -0,0 +1,305 @@
+"""
+异步输出 - 所有发往Electron的输出由一个写线程统一写入stdout
+识别线程、脚本线程和命令工作线程只把消息放入有界队列后立即返回，Electron读取变慢时
+不会阻塞在print中。写线程把队列中积累的多行合并为一次写入，减少系统调用和flush次数
+
+队列满时的策略：
+- 可丢弃的消息（非ERROR日志、预览帧通知、普通文本输出）按策略丢弃并计数
+- 命令回复、事件通知和ERROR日志从不丢弃，队列满时允许超出容量（计入overflow），也不阻塞调用方
+"""
+from collections import deque
+from typing import Dict, Any, Optional, TextIO
+import threading
+import time
+
+
+# 队列满时的策略
+POLICY_DROP_NEW = "drop_new"        # 丢弃新到达的可丢弃消息
+POLICY_DROP_OLDEST = "drop_oldest"  # 丢弃队列中最早的可丢弃消息，为新消息腾出位置
+OUTPUT_POLICIES = (POLICY_DROP_NEW, POLICY_DROP_OLDEST)
+
+# 可以丢弃的消息类型（高频且只反映最新状态）
+DROPPABLE_TYPES = ('preview_frame',)
+
+
+class StdoutWriter:
+    """
+    stdout写线程
+    
+    每条消息是一行文本。emit_line由任意线程调用，只做入队；写线程取出队列中的所有行，
+    拼接后一次写入并flush
+    """
+    
+    DEFAULT_MAX_MESSAGES = 2000     # 队列容量（行）
+    DEFAULT_BATCH_BYTES = 64 * 1024  # 单次写入的最大字节数（近似）
+    DEFAULT_DROPPABLE_LEVELS = ('DEBUG', 'INFO', 'WARN')  # 队列满时可以丢弃的日志级别
+    
+    def __init__(self, stream: TextIO, max_messages: int = DEFAULT_MAX_MESSAGES,
+                 policy: str = POLICY_DROP_NEW, droppable_levels=DEFAULT_DROPPABLE_LEVELS):
+        """
+        初始化写线程
+        
+        Args:
+            stream: 实际写入的流（原始stdout）
+            max_messages: 队列容量
+            policy: 队列满时的策略（OUTPUT_POLICIES之一）
+            droppable_levels: 队列满时可以丢弃的日志级别
+        """
+        self._stream = stream
+        self._condition = threading.Condition()
+        self._queue = deque()  # (line, droppable)
+        self._droppable_count = 0
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+        
+        self.max_messages = self.DEFAULT_MAX_MESSAGES
+        self.policy = POLICY_DROP_NEW
+        self.droppable_levels = frozenset(self.DEFAULT_DROPPABLE_LEVELS)
+        self.configure(max_messages, policy, droppable_levels)
+        
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'bytes': 0,
+            'dropped': 0,
+            'overflow': 0,
+            'max_depth': 0,
+            'write_errors': 0,
+            'total_write_ms': 0.0
+        }
+        self._dropped_by_kind: Dict[str, int] = {}
+    
+    @property
+    def is_running(self) -> bool:
+        """写线程是否在运行"""
+        return self._thread is not None and self._thread.is_alive()
+    
+    def configure(self, max_messages: Optional[int] = None, policy: Optional[str] = None,
+                  droppable_levels=None) -> None:
+        """
+        调整队列容量和丢弃策略
+        
+        Args:
+            max_messages: 队列容量
+            policy: 队列满时的策略
+            droppable_levels: 队列满时可以丢弃的日志级别（ERROR级别始终保留）
+        """
+        if policy is not None and policy not in OUTPUT_POLICIES:
+            raise ValueError(f"不支持的输出策略: {policy}")
+        with self._condition:
+            if max_messages is not None:
+                self.max_messages = max(10, int(max_messages))
+            if policy is not None:
+                self.policy = policy
+            if droppable_levels is not None:
+                self.droppable_levels = frozenset(str(level).upper() for level in droppable_levels) - {'ERROR'}
+    
+    def start(self) -> None:
+        """启动写线程"""
+        if self.is_running:
+            return
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="StdoutWriter", daemon=True)
+        self._thread.start()
+    
+    def close(self, timeout: float = 2.0) -> None:
+        """
+        写出队列中剩余的消息并停止写线程
+        
+        Args:
+            timeout: 最长等待时间（秒）
+        """
+        with self._condition:
+            self._stop = True
+            self._condition.notify_all()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=timeout)
+        self._thread = None
+    
+    def is_droppable(self, message: Dict[str, Any]) -> bool:
+        """
+        判断消息在队列满时能否丢弃
+        
+        Args:
+            message: 消息字典
+        
+        Returns:
+            bool: 可丢弃的日志级别和DROPPABLE_TYPES中的消息返回True，命令回复和事件返回False
+        """
+        message_type = message.get('type')
+        if message_type == 'log':
+            data = message.get('data')
+            level = data.get('level') if isinstance(data, dict) else None
+            return str(level).upper() in self.droppable_levels
+        return message_type in DROPPABLE_TYPES
+    
+    def emit_line(self, line: str, droppable: bool, kind: str = 'message') -> bool:
+        """
+        把一行放入队列（不阻塞）
+        
+        Args:
+            line: 不含换行符的一行文本
+            droppable: 队列满时能否丢弃
+            kind: 丢弃统计使用的分类
+        
+        Returns:
+            bool: 是否已入队（被丢弃时返回False）
+        """
+        with self._condition:
+            if len(self._queue) >= self.max_messages:
+                if droppable and (self.policy == POLICY_DROP_NEW or not self._evict_oldest_droppable()):
+                    self._record_drop(kind)
+                    return False
+                if not droppable and not self._evict_oldest_droppable():
+                    # 回复和事件从不丢弃，允许超出容量
+                    self._stats['overflow'] += 1
+            
+            self._queue.append((line, droppable))
+            if droppable:
+                self._droppable_count += 1
+            self._stats['enqueued'] += 1
+            self._stats['max_depth'] = max(self._stats['max_depth'], len(self._queue))
+            self._condition.notify()
+        return True
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取写线程统计
+        
+        Returns:
+            Dict[str, Any]: 入队、写出、批次、丢弃（按分类）和队列深度等
+        """
+        with self._condition:
+            stats = dict(self._stats)
+            stats['dropped_by_kind'] = dict(self._dropped_by_kind)
+            stats['depth'] = len(self._queue)
+        batches = stats['batches']
+        total_write_ms = stats.pop('total_write_ms')
+        stats.update({
+            'running': self.is_running,
+            'max_messages': self.max_messages,
+            'policy': self.policy,
+            'droppable_levels': sorted(self.droppable_levels),
+            'avg_batch_lines': round(stats['written'] / batches, 2) if batches else 0.0,
+            'avg_write_ms': round(total_write_ms / batches, 3) if batches else 0.0
+        })
+        return stats
+    
+    def _evict_oldest_droppable(self) -> bool:
+        """
+        丢弃队列中最早的可丢弃消息（调用方需持有锁）
+        
+        Returns:
+            bool: 是否丢弃了一条消息
+        """
+        if not self._droppable_count:
+            return False
+        for index, (_, droppable) in enumerate(self._queue):
+            if droppable:
+                del self._queue[index]
+                self._droppable_count -= 1
+                self._record_drop('evicted')
+                return True
+        return False
+    
+    def _record_drop(self, kind: str) -> None:
+        """记录一次丢弃（调用方需持有锁）"""
+        self._stats['dropped'] += 1
+        self._dropped_by_kind[kind] = self._dropped_by_kind.get(kind, 0) + 1
+    
+    def _take_batch(self) -> Optional[str]:
+        """
+        等待并取出一批行
+        
+        Returns:
+            str: 拼接好的文本（以换行结尾），写线程应退出时返回None
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._queue or self._stop)
+            if not self._queue:
+                return None
+            
+            lines = []
+            size = 0
+            while self._queue and size < self.DEFAULT_BATCH_BYTES:
+                line, droppable = self._queue.popleft()
+                if droppable:
+                    self._droppable_count -= 1
+                lines.append(line)
+                size += len(line) + 1
+            self._stats['written'] += len(lines)
+            self._stats['batches'] += 1
+        return '\n'.join(lines) + '\n'
+    
+    def _run(self) -> None:
+        """写线程主循环：写完队列中的所有消息后才退出"""
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            
+            started = time.perf_counter()
+            try:
+                self._stream.write(batch)
+                self._stream.flush()
+            except (OSError, ValueError):
+                # stdout已关闭（Electron退出），丢弃剩余输出
+                with self._condition:
+                    self._stats['write_errors'] += 1
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            
+            with self._condition:
+                self._stats['bytes'] += len(batch)
+                self._stats['total_write_ms'] += elapsed_ms
+
+
+class QueuedStdout:
+    """
+    替换sys.stdout的文本流：print()输出的文本按行交给StdoutWriter，不直接写管道
+    
+    每个线程单独缓存未结束的行，避免不同线程的输出在同一行内交错。
+    以[ERROR]开头的行不丢弃，其余普通文本行在队列满时可以丢弃
+    """
+    
+    def __init__(self, writer: StdoutWriter, original: TextIO):
+        """
+        初始化
+        
+        Args:
+            writer: 写线程
+            original: 原始stdout（提供encoding等属性）
+        """
+        self._writer = writer
+        self._original = original
+        self._local = threading.local()
+    
+    def write(self, text: str) -> int:
+        """
+        写入文本，完整的行立即入队
+        
+        Args:
+            text: 文本
+        
+        Returns:
+            int: 写入的字符数
+        """
+        pending = getattr(self._local, 'pending', '') + text
+        if '\n' in pending:
+            *lines, pending = pending.split('\n')
+            for line in lines:
+                self._writer.emit_line(line, droppable=not line.startswith('[ERROR]'), kind='text')
+        self._local.pending = pending
+        return len(text)
+    
+    def flush(self) -> None:
+        """写线程负责flush，这里不需要做任何事"""
+    
+    def isatty(self) -> bool:
+        """与原始stdout一致"""
+        return self._original.isatty()
+    
+    def __getattr__(self, name: str) -> Any:
+        """其余属性（encoding、fileno等）转发给原始stdout"""
+        return getattr(self._original, name)
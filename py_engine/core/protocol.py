@@ -0,0 +1,166 @@
+"""
+通信协议 - Electron与Python引擎之间基于stdio的行协议
+每行一个JSON消息。Electron发送的命令可以带id字段，引擎对每条命令恰好回复一行
+type为"response"的消息，原样带回id，前端据此把回复与命令对应起来，无需等待上一条命令的回复即可继续发送
+"""
+from typing import Dict, Any, Optional
+import json
+import sys
+import threading
+import time
+
+from .output_writer import StdoutWriter, QueuedStdout
+
+
+# 协议版本，随ready消息发送给前端
+PROTOCOL_VERSION = 1
+
+# 回复消息的类型
+RESPONSE_TYPE = "response"
+
+# 多个线程（命令处理、识别线程、脚本线程）都会输出消息，整行写出时加锁避免交错
+_output_lock = threading.Lock()
+
+# 安装后所有输出由写线程异步写出（install_output_writer）
+_writer: Optional[StdoutWriter] = None
+
+
+def _json_default(value: Any) -> Any:
+    """
+    json.dumps无法直接序列化的值（numpy标量和数组、集合等）的转换
+    
+    Args:
+        value: 待序列化的值
+    
+    Returns:
+        Any: 可序列化的值
+    """
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+def encode_message(message: Dict[str, Any]) -> str:
+    """
+    把消息编码为一行JSON
+    
+    Args:
+        message: 消息字典
+    
+    Returns:
+        str: 不含换行符的JSON文本
+    """
+    return json.dumps(message, default=_json_default)
+
+
+def emit(message: Dict[str, Any]) -> None:
+    """
+    向Electron输出一条消息
+    
+    Args:
+        message: 消息字典
+    """
+    line = encode_message(message)
+    writer = _writer
+    if writer is not None:
+        data = message.get('data')
+        level = data.get('level') if isinstance(data, dict) else None
+        kind = f"log:{level}" if message.get('type') == 'log' else str(message.get('type'))
+        writer.emit_line(line, writer.is_droppable(message), kind)
+        return
+    with _output_lock:
+        print(line, flush=True)
+
+
+def install_output_writer(**options) -> StdoutWriter:
+    """
+    启动异步写线程，并把sys.stdout替换为按行入队的流（print()也不再阻塞调用线程）
+    
+    Args:
+        **options: StdoutWriter参数 max_messages、policy、droppable_levels
+    
+    Returns:
+        StdoutWriter: 写线程
+    """
+    global _writer
+    if _writer is None:
+        writer = StdoutWriter(sys.stdout, **options)
+        writer.start()
+        sys.stdout = QueuedStdout(writer, sys.stdout)
+        _writer = writer
+    return _writer
+
+
+def uninstall_output_writer(timeout: float = 2.0) -> None:
+    """
+    写出剩余输出，停止写线程并恢复sys.stdout
+    
+    Args:
+        timeout: 最长等待时间（秒）
+    """
+    global _writer
+    writer, _writer = _writer, None
+    if writer is None:
+        return
+    if isinstance(sys.stdout, QueuedStdout):
+        sys.stdout = sys.stdout._original
+    writer.close(timeout)
+
+
+def get_output_writer() -> Optional[StdoutWriter]:
+    """
+    获取当前的写线程
+    
+    Returns:
+        StdoutWriter: 未安装时返回None
+    """
+    return _writer
+
+
+def build_response(cmd_id: Optional[Any], action: Optional[str], result: Dict[str, Any],
+                   received_at: float, started_at: float, finished_at: float) -> Dict[str, Any]:
+    """
+    构造命令的回复消息
+    
+    Args:
+        cmd_id: 命令的id（命令未带id时为None）
+        action: 命令名称
+        result: 命令处理结果
+        received_at: 收到命令的时间（time.perf_counter()）
+        started_at: 开始处理的时间（time.perf_counter()）
+        finished_at: 处理完成的时间（time.perf_counter()）
+    
+    Returns:
+        Dict[str, Any]: 回复消息
+    """
+    return {
+        "type": RESPONSE_TYPE,
+        "id": cmd_id,
+        "action": action,
+        "success": bool(result.get('success', False)),
+        "data": result,
+        "timing": {
+            "queue_ms": round((started_at - received_at) * 1000, 3),
+            "duration_ms": round((finished_at - started_at) * 1000, 3)
+        },
+        "timestamp": time.time()
+    }
+
+
+def build_ready_message(engine_info: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    构造引擎就绪消息（引擎开始读取命令前发送一次）
+    
+    Args:
+        engine_info: 引擎名称、版本等信息
+    
+    Returns:
+        Dict[str, Any]: 就绪消息
+    """
+    return {
+        "type": "ready",
+        "data": dict(engine_info, protocol=PROTOCOL_VERSION),
+        "timestamp": time.time()
+    }
@@ -0,0 +1,220 @@
+"""
+显示几何模块
+缓存屏幕尺寸、窗口位置和最近一帧的尺寸，截图坐标到屏幕坐标的转换只做算术运算。
+缓存由截图路径随每帧通过廉价的窗口查询更新，点击路径上不再截图或查询屏幕
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from engine_log import get_logger
+
+logger = get_logger('display_geometry')
+
+
+class DisplayGeometry:
+    """
+    显示几何模型
+    
+    query返回 (screen_size, window_rect)：
+    screen_size - 逻辑屏幕尺寸 (width, height)，鼠标坐标所在的坐标系，未知时为None
+    window_rect - 截图区域在屏幕上的位置 (left, top, width, height)，未知时为None
+    """
+    
+    REFRESH_INTERVAL = 1.0      # 没有新帧时缓存的最长有效时间（秒），超过后转换前重新查询
+    HIDPI_RATIO = 1.5           # 截图宽度超过逻辑屏幕宽度的该倍数时视为HiDPI截图
+    MACOS_GUESS_SCALE = 2.0     # macOS没有帧尺寸时推测的Retina缩放比例
+    MACOS_MAX_RATIO = 3         # macOS坐标允许超出逻辑屏幕的倍数
+    
+    def __init__(self, platform: str, query: Callable[[], Tuple[Optional[Tuple[int, int]], Optional[Tuple[int, int, int, int]]]],
+                 refresh_interval: float = REFRESH_INTERVAL):
+        """
+        初始化显示几何模型
+        
+        Args:
+            platform: 平台名称（'windows'、'macos'、'linux'、'cross_platform'）
+            query: 查询屏幕尺寸和窗口位置的函数
+            refresh_interval: 没有新帧时缓存的最长有效时间（秒）
+        """
+        self.platform = platform
+        self.refresh_interval = refresh_interval
+        self._query = query
+        self._lock = threading.Lock()
+        
+        self.screen_size: Optional[Tuple[int, int]] = None
+        self.window_rect: Optional[Tuple[int, int, int, int]] = None
+        self.frame_size: Optional[Tuple[int, int]] = None
+        self.scale_factor = 1.0
+        
+        self._refreshed_at: Optional[float] = None
+        self._stats = {'refreshes': 0, 'changes': 0, 'conversions': 0}
+    
+    def refresh(self) -> bool:
+        """
+        重新查询屏幕尺寸和窗口位置
+        
+        Returns:
+            bool: 几何信息是否发生变化（窗口移动、缩放或显示器变化）
+        """
+        try:
+            screen_size, window_rect = self._query()
+        except Exception as e:
+            logger.warn("Display geometry query failed: %s", e, interval=5)
+            screen_size, window_rect = self.screen_size, self.window_rect
+        
+        with self._lock:
+            changed = (screen_size, window_rect) != (self.screen_size, self.window_rect)
+            if changed and self._refreshed_at is not None:
+                logger.info("Display geometry changed: screen %s -> %s, window %s -> %s",
+                            self.screen_size, screen_size, self.window_rect, window_rect)
+                self._stats['changes'] += 1
+            self.screen_size, self.window_rect = screen_size, window_rect
+            self._refreshed_at = time.monotonic()
+            self._stats['refreshes'] += 1
+            return changed
+    
+    def invalidate(self) -> None:
+        """使缓存失效，下一次使用时重新查询（切换窗口后调用）"""
+        with self._lock:
+            self._refreshed_at = None
+    
+    def observe_frame(self, frame_size: Tuple[int, int]) -> None:
+        """
+        记录新帧的尺寸并检查窗口位置
+        
+        由截图路径随每帧调用（窗口查询只是一次系统调用，远低于截图本身的开销），
+        窗口移动、缩放或显示器变化在下一帧即被发现，点击路径直接使用缓存
+        
+        Args:
+            frame_size: 帧尺寸 (width, height)
+        """
+        with self._lock:
+            self.frame_size = frame_size
+        self.refresh()
+    
+    def to_screen(self, rel_x, rel_y) -> Tuple[int, int]:
+        """
+        把截图内的坐标转换为屏幕坐标
+        
+        Args:
+            rel_x: 截图内的X坐标
+            rel_y: 截图内的Y坐标
+        
+        Returns:
+            tuple: (screen_x, screen_y) 屏幕坐标
+        """
+        if self._expired():
+            self.refresh()
+        
+        with self._lock:
+            screen_size, window_rect, frame_size = self.screen_size, self.window_rect, self.frame_size
+            self._stats['conversions'] += 1
+        
+        if self.platform == 'macos':
+            screen_x, screen_y = self._to_screen_macos(rel_x, rel_y, screen_size, frame_size)
+        elif self.platform == 'windows':
+            screen_x, screen_y = self._to_screen_windows(rel_x, rel_y, screen_size, window_rect)
+        else:
+            # 截图区域的左上角即窗口位置（整屏截图时为(0, 0)）
+            left, top = window_rect[:2] if window_rect else (0, 0)
+            screen_x, screen_y = rel_x + left, rel_y + top
+        
+        return self._clamp(screen_x, screen_y, screen_size)
+    
+    def _to_screen_macos(self, rel_x, rel_y, screen_size, frame_size):
+        """
+        macOS坐标转换：pyautogui截取整个屏幕，HiDPI下截图为物理像素，需要缩放回逻辑坐标
+        
+        Args:
+            rel_x: 截图内的X坐标
+            rel_y: 截图内的Y坐标
+            screen_size: 逻辑屏幕尺寸
+            frame_size: 最近一帧的尺寸
+        
+        Returns:
+            tuple: (screen_x, screen_y)
+        """
+        if screen_size is None:
+            return rel_x, rel_y
+        
+        screen_width, screen_height = screen_size
+        if frame_size is not None:
+            frame_width, frame_height = frame_size
+            if frame_width > screen_width * self.HIDPI_RATIO:
+                return rel_x * screen_width / frame_width, rel_y * screen_height / frame_height
+            return rel_x, rel_y
+        
+        # 还没有帧尺寸：坐标明显超出逻辑屏幕时按Retina推测
+        if rel_x > screen_width * self.HIDPI_RATIO or rel_y > screen_height * self.HIDPI_RATIO:
+            return rel_x / self.MACOS_GUESS_SCALE, rel_y / self.MACOS_GUESS_SCALE
+        return rel_x, rel_y
+    
+    @staticmethod
+    def _to_screen_windows(rel_x, rel_y, screen_size, window_rect):
+        """
+        Windows坐标转换：加上窗口偏移；窗口大于逻辑屏幕时（DPI缩放）按比例缩放
+        
+        Args:
+            rel_x: 截图内的X坐标
+            rel_y: 截图内的Y坐标
+            screen_size: 逻辑屏幕尺寸
+            window_rect: 窗口位置
+        
+        Returns:
+            tuple: (screen_x, screen_y)
+        """
+        if window_rect is None:
+            return rel_x, rel_y
+        
+        window_x, window_y, window_width, window_height = window_rect
+        if screen_size is not None and (window_width > screen_size[0] or window_height > screen_size[1]):
+            return rel_x * screen_size[0] / window_width, rel_y * screen_size[1] / window_height
+        return window_x + rel_x, window_y + rel_y
+    
+    def _clamp(self, screen_x, screen_y, screen_size) -> Tuple[int, int]:
+        """
+        把坐标限制在合理范围内
+        
+        macOS HiDPI下有效的鼠标坐标可能超出逻辑屏幕尺寸，只限制在逻辑屏幕的若干倍以内
+        
+        Args:
+            screen_x: 屏幕X坐标
+            screen_y: 屏幕Y坐标
+            screen_size: 逻辑屏幕尺寸，None不限制
+        
+        Returns:
+            tuple: (screen_x, screen_y) 整数坐标
+        """
+        if screen_size is not None:
+            if self.platform == 'macos':
+                max_x, max_y = screen_size[0] * self.MACOS_MAX_RATIO, screen_size[1] * self.MACOS_MAX_RATIO
+            else:
+                max_x, max_y = screen_size[0] - 1, screen_size[1] - 1
+            
+            clamped_x, clamped_y = max(0, min(screen_x, max_x)), max(0, min(screen_y, max_y))
+            if (clamped_x, clamped_y) != (screen_x, screen_y):
+                logger.warn("坐标超出屏幕范围，已调整: (%.1f, %.1f) -> (%.1f, %.1f)", screen_x, screen_y, clamped_x, clamped_y, interval=5)
+            screen_x, screen_y = clamped_x, clamped_y
+        
+        return int(screen_x), int(screen_y)
+    
+    def _expired(self) -> bool:
+        """缓存是否需要刷新"""
+        refreshed_at = self._refreshed_at
+        return refreshed_at is None or time.monotonic() - refreshed_at > self.refresh_interval
+    
+    def get_info(self) -> Dict[str, Any]:
+        """
+        获取当前几何信息
+        
+        Returns:
+            Dict[str, Any]: 屏幕尺寸、窗口位置、帧尺寸、缩放因子和刷新统计
+        """
+        with self._lock:
+            return {
+                "screen_size": self.screen_size,
+                "window_rect": self.window_rect,
+                "frame_size": self.frame_size,
+                "scale_factor": self.scale_factor,
+                **self._stats
+            }
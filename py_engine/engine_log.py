@@ -0,0 +1,307 @@
+"""
+引擎日志模块
+分级、可按模块在运行时调整级别的日志：
+- 级别过滤在格式化之前完成，被过滤的日志只有一次整数比较的开销（参数按 % 格式延迟格式化）
+- 同一条日志（key，默认为消息模板）可以按最小间隔限频，期间被抑制的条数附在下一次输出中
+- 连续重复的相同内容在去重窗口内只输出一次
+输出格式与原有print一致：[LEVEL] message
+"""
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+# 日志级别（OK为带[OK]前缀的INFO）
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'OK': 20, 'WARN': 30, 'ERROR': 40, 'OFF': 100}
+LEVEL_NAMES = ('DEBUG', 'INFO', 'WARN', 'ERROR', 'OFF')
+
+
+def level_number(level: str) -> int:
+    """
+    日志级别名称转换为数值
+    
+    Args:
+        level: 级别名称（不区分大小写，WARNING等同WARN）
+    
+    Returns:
+        int: 级别数值
+    """
+    name = str(level).upper()
+    if name == 'WARNING':
+        name = 'WARN'
+    if name not in LEVELS:
+        raise ValueError(f"未知的日志级别: {level}，可用: {', '.join(LEVEL_NAMES)}")
+    return LEVELS[name]
+
+
+class _KeyState:
+    """单个限频/去重key的状态"""
+    
+    __slots__ = ('last_emit', 'last_text', 'suppressed')
+    
+    def __init__(self):
+        self.last_emit = 0.0
+        self.last_text = None
+        self.suppressed = 0
+
+
+class LogManager:
+    """
+    日志管理器 - 保存默认级别、各模块级别和限频状态
+    
+    模块级别按名称前缀继承：设置'image_recognition'同时作用于'image_recognition.match'
+    """
+    
+    DEFAULT_LEVEL = 'INFO'
+    DEFAULT_DEDUP_WINDOW = 2.0   # 相同内容在该时间内重复出现时只输出一次（秒）
+    MAX_KEYS = 4096              # 限频状态的最大key数，超过时清空
+    
+    def __init__(self, default_level: str = DEFAULT_LEVEL, dedup_window: float = DEFAULT_DEDUP_WINDOW):
+        """
+        初始化日志管理器
+        
+        Args:
+            default_level: 未单独设置的模块使用的级别
+            dedup_window: 去重窗口（秒），0表示不去重
+        """
+        self._lock = threading.Lock()
+        self._default = level_number(default_level)
+        self._default_name = str(default_level).upper()
+        self._module_levels: Dict[str, str] = {}
+        self._loggers: Dict[str, 'EngineLogger'] = {}
+        self._states: Dict[Any, _KeyState] = {}
+        self.dedup_window = float(dedup_window)
+        self.version = 0  # 级别变化时递增，日志器据此重新计算生效级别
+        self._stats = {'emitted': 0, 'suppressed': 0}
+    
+    def get_logger(self, name: str) -> 'EngineLogger':
+        """
+        获取模块的日志器（同名返回同一个实例）
+        
+        Args:
+            name: 模块名称
+        
+        Returns:
+            EngineLogger: 日志器
+        """
+        with self._lock:
+            logger = self._loggers.get(name)
+            if logger is None:
+                logger = self._loggers[name] = EngineLogger(name, self)
+            return logger
+    
+    def set_level(self, level: Optional[str], module: Optional[str] = None) -> None:
+        """
+        设置日志级别
+        
+        Args:
+            level: 级别名称；module不为None时传None表示清除该模块的单独设置
+            module: 模块名称，None表示默认级别
+        """
+        with self._lock:
+            if module is None:
+                self._default = level_number(level or self.DEFAULT_LEVEL)
+                self._default_name = str(level or self.DEFAULT_LEVEL).upper()
+            elif level is None:
+                self._module_levels.pop(module, None)
+            else:
+                level_number(level)
+                self._module_levels[module] = str(level).upper()
+            self.version += 1
+    
+    def effective_level(self, name: str) -> int:
+        """
+        计算模块的生效级别（最长前缀匹配的模块设置，没有时为默认级别）
+        
+        Args:
+            name: 模块名称
+        
+        Returns:
+            int: 级别数值
+        """
+        with self._lock:
+            candidate = name
+            while candidate:
+                if candidate in self._module_levels:
+                    return level_number(self._module_levels[candidate])
+                candidate = candidate.rpartition('.')[0]
+            return self._default
+    
+    def should_emit(self, key: Any, text: Optional[str], interval: Optional[float], now: float):
+        """
+        限频和去重判断
+        
+        Args:
+            key: 限频key
+            text: 格式化后的内容（None表示只做限频判断）
+            interval: 最小输出间隔（秒），None不限频
+            now: 当前时间（time.monotonic()）
+        
+        Returns:
+            int: 允许输出时返回此前被抑制的条数（>=0），应抑制时返回-1
+        """
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                if len(self._states) >= self.MAX_KEYS:
+                    self._states.clear()
+                state = self._states[key] = _KeyState()
+            
+            elapsed = now - state.last_emit
+            suppress = (interval is not None and elapsed < interval) or (
+                text is not None and text == state.last_text and elapsed < self.dedup_window)
+            if suppress:
+                state.suppressed += 1
+                self._stats['suppressed'] += 1
+                return -1
+            
+            if text is not None:
+                suppressed = state.suppressed
+                state.suppressed = 0
+                state.last_emit = now
+                state.last_text = text
+                self._stats['emitted'] += 1
+                return suppressed
+            return 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取日志配置和统计
+        
+        Returns:
+            Dict[str, Any]: 默认级别、各模块级别、已注册的模块、输出和抑制的条数
+        """
+        with self._lock:
+            return {
+                'default_level': self._default_name,
+                'module_levels': dict(self._module_levels),
+                'modules': sorted(self._loggers),
+                'dedup_window': self.dedup_window,
+                'emitted': self._stats['emitted'],
+                'suppressed': self._stats['suppressed']
+            }
+
+
+class EngineLogger:
+    """
+    模块日志器
+    
+    用法：logger.debug("Frame %d captured: %s", frame_id, shape)
+    参数只在日志会被输出时才格式化；interval为同一key的最小输出间隔（秒）
+    """
+    
+    def __init__(self, name: str, manager: LogManager):
+        """
+        初始化模块日志器
+        
+        Args:
+            name: 模块名称
+            manager: 日志管理器
+        """
+        self.name = name
+        self._manager = manager
+        self._version = -1
+        self._level = 0
+    
+    def is_enabled(self, level: str) -> bool:
+        """
+        判断该级别的日志是否会输出（构造参数代价较高时先判断）
+        
+        Args:
+            level: 级别名称
+        
+        Returns:
+            bool: 是否输出
+        """
+        return LEVELS.get(level, 20) >= self._effective_level()
+    
+    def allow(self, key: Any, interval: Optional[float]) -> int:
+        """
+        限频判断（供不经过本日志器输出的日志使用，如服务发送给前端的日志消息）
+        
+        Args:
+            key: 限频key
+            interval: 同一key的最小输出间隔（秒）
+        
+        Returns:
+            int: 允许输出时返回此前被抑制的条数（>=0），应抑制时返回-1
+        """
+        return self._manager.should_emit((self.name, key), str(key), interval, time.monotonic())
+    
+    def debug(self, message: str, *args, key: Any = None, interval: Optional[float] = None) -> None:
+        """输出DEBUG日志"""
+        self.log('DEBUG', message, *args, key=key, interval=interval)
+    
+    def info(self, message: str, *args, key: Any = None, interval: Optional[float] = None) -> None:
+        """输出INFO日志"""
+        self.log('INFO', message, *args, key=key, interval=interval)
+    
+    def ok(self, message: str, *args, key: Any = None, interval: Optional[float] = None) -> None:
+        """输出成功信息（INFO级别，[OK]前缀）"""
+        self.log('OK', message, *args, key=key, interval=interval)
+    
+    def warn(self, message: str, *args, key: Any = None, interval: Optional[float] = None) -> None:
+        """输出WARN日志"""
+        self.log('WARN', message, *args, key=key, interval=interval)
+    
+    def error(self, message: str, *args, key: Any = None, interval: Optional[float] = None) -> None:
+        """输出ERROR日志"""
+        self.log('ERROR', message, *args, key=key, interval=interval)
+    
+    def log(self, level: str, message: str, *args, key: Any = None, interval: Optional[float] = None) -> None:
+        """
+        输出日志
+        
+        Args:
+            level: 级别名称
+            message: 消息（有args时按 % 格式化）
+            *args: 格式化参数
+            key: 限频和去重的key，默认为模块名、级别和消息模板
+            interval: 同一key的最小输出间隔（秒），None不限频
+        """
+        if LEVELS.get(level, 20) < self._effective_level():
+            return
+        
+        manager = self._manager
+        now = time.monotonic()
+        key = (self.name, level, message) if key is None else (self.name, key)
+        # 限频在格式化之前判断，被限频的日志不做格式化
+        if interval is not None and manager.should_emit(key, None, interval, now) < 0:
+            return
+        
+        try:
+            text = message % args if args else message
+        except (TypeError, ValueError):
+            text = f"{message} {args}"
+        
+        suppressed = manager.should_emit(key, text, interval, now)
+        if suppressed < 0:
+            return
+        if suppressed:
+            text = f"{text} (已抑制 {suppressed} 条相同日志)"
+        print(f"[{level}] {text}")
+    
+    def _effective_level(self) -> int:
+        """生效级别（级别设置变化后重新计算）"""
+        manager = self._manager
+        if self._version != manager.version:
+            self._level = manager.effective_level(self.name)
+            self._version = manager.version
+        return self._level
+
+
+# 引擎共享的日志管理器
+log_manager = LogManager()
+
+
+def get_logger(name: str) -> EngineLogger:
+    """
+    获取模块的日志器
+    
+    Args:
+        name: 模块名称
+    
+    Returns:
+        EngineLogger: 日志器
+    """
+    return log_manager.get_logger(name)
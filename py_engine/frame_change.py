@@ -0,0 +1,156 @@
+"""
+帧变化检测模块
+比较相邻两帧的降采样灰度缩略图，判断画面是否变化并给出变化区域（脏矩形）。
+画面静止时（如停留在菜单）识别循环可以复用上一次的识别结果，不再重复匹配
+"""
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class FrameChangeDetector:
+    """
+    帧变化检测器
+    
+    把每帧缩小为每个单元格一个像素的灰度缩略图（单元格内取平均，抵消噪点和轻微抖动），
+    与基准帧的缩略图逐格比较：亮度差超过pixel_tolerance的格子记为变化格，
+    变化格占比超过area_tolerance时认为画面发生了变化。
+    变化格经膨胀合并后取连通域的外接矩形，换算回原图坐标得到脏矩形
+    """
+    
+    DEFAULT_CELL_SIZE = 16            # 缩略图单元格边长（原图像素）
+    DEFAULT_PIXEL_TOLERANCE = 6.0     # 单元格平均亮度的允许差值（0-255）
+    DEFAULT_AREA_TOLERANCE = 0.0      # 允许变化的单元格比例，超过才算画面变化
+    
+    def __init__(self, cell_size: int = DEFAULT_CELL_SIZE, pixel_tolerance: float = DEFAULT_PIXEL_TOLERANCE,
+                 area_tolerance: float = DEFAULT_AREA_TOLERANCE):
+        """
+        初始化帧变化检测器
+        
+        Args:
+            cell_size: 缩略图单元格边长（像素），越大越快但脏矩形越粗
+            pixel_tolerance: 单元格平均亮度的允许差值
+            area_tolerance: 允许变化的单元格比例（0-1）
+        """
+        self.cell_size = max(1, int(cell_size))
+        self.pixel_tolerance = float(pixel_tolerance)
+        self.area_tolerance = float(area_tolerance)
+        
+        self._lock = threading.Lock()
+        self._previous: Optional[np.ndarray] = None   # 基准帧的缩略图
+        self._previous_shape = None                    # 基准帧的原图尺寸
+        self._stats = {'frames': 0, 'changed': 0, 'unchanged': 0}
+    
+    def detect(self, image: np.ndarray) -> Tuple[bool, Optional[List[Tuple[int, int, int, int]]]]:
+        """
+        检测当前帧相对基准帧的变化
+        
+        只有判定为变化时才更新基准帧，缓慢的渐变会逐步累积直到超过容差，不会一直被忽略
+        
+        Args:
+            image: BGR或灰度图像
+        
+        Returns:
+            tuple: (changed, dirty_rects)
+                changed: bool - 画面是否变化
+                dirty_rects: list - 变化区域 [(left, top, right, bottom), ...]（原图像素坐标），
+                             None表示整帧都应视为变化（首帧或尺寸变化）
+        """
+        thumbnail = self._thumbnail(image)
+        
+        with self._lock:
+            previous = self._previous
+            self._stats['frames'] += 1
+            
+            if previous is None or self._previous_shape != image.shape[:2]:
+                self._previous = thumbnail
+                self._previous_shape = image.shape[:2]
+                self._stats['changed'] += 1
+                return True, None
+            
+            dirty = cv2.absdiff(thumbnail, previous) > self.pixel_tolerance
+            changed = np.count_nonzero(dirty) > self.area_tolerance * dirty.size
+            if changed:
+                self._previous = thumbnail
+            self._stats['changed' if changed else 'unchanged'] += 1
+        
+        if not changed:
+            return False, []
+        return True, self._dirty_rects(dirty, image.shape[:2])
+    
+    def reset(self) -> None:
+        """清除基准帧，下一帧视为整帧变化（切换帧来源或窗口后调用）"""
+        with self._lock:
+            self._previous = None
+            self._previous_shape = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取检测统计
+        
+        Returns:
+            Dict[str, Any]: {'frames', 'changed', 'unchanged'}
+        """
+        with self._lock:
+            return dict(self._stats)
+    
+    def _thumbnail(self, image: np.ndarray) -> np.ndarray:
+        """
+        生成单元格平均亮度缩略图
+        
+        Args:
+            image: BGR或灰度图像
+        
+        Returns:
+            numpy.ndarray: float32灰度缩略图
+        """
+        cell = self.cell_size
+        height, width = image.shape[:2]
+        rows, cols = max(1, height // cell), max(1, width // cell)
+        
+        # 整数倍缩小时INTER_AREA走快速路径；不足一格的右侧和底部边缘单独贴边取样，作为额外的一列和一行
+        thumbnail = cv2.resize(image[:rows * cell, :cols * cell], (cols, rows), interpolation=cv2.INTER_AREA)
+        if width > cols * cell:
+            right = cv2.resize(image[:rows * cell, width - cell:], (1, rows), interpolation=cv2.INTER_AREA)
+            thumbnail = np.concatenate([thumbnail, right], axis=1)
+        if height > rows * cell:
+            bottom = cv2.resize(image[height - cell:, :cols * cell], (cols, 1), interpolation=cv2.INTER_AREA)
+            if width > cols * cell:
+                corner = cv2.resize(image[height - cell:, width - cell:], (1, 1), interpolation=cv2.INTER_AREA)
+                bottom = np.concatenate([bottom, corner], axis=1)
+            thumbnail = np.concatenate([thumbnail, bottom], axis=0)
+        
+        # 先缩小再转灰度，转换只作用于缩略图
+        if thumbnail.ndim == 3:
+            thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+        return thumbnail.astype(np.float32)
+    
+    def _dirty_rects(self, dirty: np.ndarray, frame_shape) -> List[Tuple[int, int, int, int]]:
+        """
+        把变化格合并为脏矩形
+        
+        Args:
+            dirty: 变化格的布尔矩阵
+            frame_shape: 原图尺寸
+        
+        Returns:
+            list: [(left, top, right, bottom), ...] 原图像素坐标
+        """
+        frame_height, frame_width = frame_shape[:2]
+        # 膨胀一格，把相邻的变化格合并，同时覆盖跨越格子边界的变化
+        mask = cv2.dilate(dirty.astype(np.uint8), np.ones((3, 3), np.uint8))
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        
+        # 贴边取样的最后一行/列覆盖的是紧靠边缘的一格，起点不超过边缘减一格
+        cell = self.cell_size
+        rects = []
+        for x, y, width, height, _ in stats[1:count]:
+            rects.append((
+                int(max(0, min(x * cell, frame_width - cell))),
+                int(max(0, min(y * cell, frame_height - cell))),
+                int(min(frame_width, (x + width) * cell)),
+                int(min(frame_height, (y + height) * cell))
+            ))
+        return rects
@@ -0,0 +1,346 @@
+"""
+预览帧通道模块
+把截图线程的最新帧缩小（并按需编码为JPEG）后写入共享内存环形文件，stdio上只发送
+很小的JSON通知（槽位、帧序号、尺寸、长度），前端按通知从文件中读取图像数据。
+通道只读取截图线程已有的帧，不额外截图，也不做Base64编码
+
+环形文件布局（小端）：
+- 文件头（HEADER_SIZE字节）：magic、版本、槽位数、每个槽位的数据容量
+- 槽位：槽位头（SLOT_HEADER_SIZE字节）+ 数据区
+  槽位头：seq(u64) frame_id(u64) timestamp(f64) width(u32) height(u32) channels(u32) encoding(u32) length(u32)
+  写入前seq置为奇数，写完置为下一个偶数；读取方读完数据后seq仍等于通知中的seq才说明数据完整
+"""
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from engine_log import get_logger
+
+logger = get_logger('frame_channel')
+
+
+# 环形文件格式
+MAGIC = b'DNAFRAME'
+VERSION = 1
+HEADER_SIZE = 64
+SLOT_HEADER_SIZE = 48
+_FILE_HEADER = struct.Struct('<8sIIII')    # magic, version, slot_count, slot_capacity, slot_header_size
+_SLOT_HEADER = struct.Struct('<QQdIIIII')  # seq, frame_id, timestamp, width, height, channels, encoding, length
+
+# 图像编码
+ENCODINGS = {'jpeg': 1, 'rgba': 2}
+
+
+class FrameChannel:
+    """
+    预览帧通道
+    
+    发布线程按预览帧率读取最新帧（get_frame不应触发截图），帧序号未变化时跳过；
+    每个新帧写入下一个槽位后调用notify发送通知。帧率、JPEG质量、最大边长和编码可以在运行时调整，
+    最大边长变化需要更大的槽位时重新创建环形文件（新文件名，通知中的path随之变化）
+    """
+    
+    DEFAULT_FPS = 5.0          # 预览帧率
+    DEFAULT_QUALITY = 70       # JPEG质量（1-100）
+    DEFAULT_MAX_SIDE = 640     # 预览图像的最大边长（像素）
+    DEFAULT_SLOTS = 3          # 槽位数：前端读取一个槽位时，发布线程写入其他槽位
+    MAX_FPS = 30.0
+    
+    def __init__(self, get_frame: Callable[[], Optional[Any]], notify: Callable[[Dict[str, Any]], None],
+                 fps: float = DEFAULT_FPS, quality: int = DEFAULT_QUALITY, max_side: int = DEFAULT_MAX_SIDE,
+                 encoding: str = 'jpeg', slots: int = DEFAULT_SLOTS, directory: Optional[str] = None):
+        """
+        初始化预览帧通道
+        
+        Args:
+            get_frame: 获取最新帧（Frame）的函数，没有帧时返回None
+            notify: 发送帧通知的函数
+            fps: 预览帧率
+            quality: JPEG质量
+            max_side: 预览图像的最大边长
+            encoding: 'jpeg'或'rgba'（未压缩，可直接用于canvas）
+            slots: 槽位数
+            directory: 环形文件所在目录，None时优先使用/dev/shm
+        """
+        self._get_frame = get_frame
+        self._notify = notify
+        self.slots = max(2, int(slots))
+        self.directory = directory or ('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir())
+        
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        
+        self.fps = self.DEFAULT_FPS
+        self.quality = self.DEFAULT_QUALITY
+        self.max_side = self.DEFAULT_MAX_SIDE
+        self.encoding = 'jpeg'
+        self.configure(fps=fps, quality=quality, max_side=max_side, encoding=encoding)
+        
+        self.path: Optional[str] = None
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._capacity = 0
+        self._generation = 0
+        self._next_slot = 0
+        self._seqs = []
+        self._last_frame_id = None
+        self._stats = {'published': 0, 'oversized': 0, 'errors': 0, 'bytes': 0, 'total_encode_ms': 0.0}
+    
+    @property
+    def is_running(self) -> bool:
+        """发布线程是否在运行"""
+        return self._thread is not None and self._thread.is_alive()
+    
+    def configure(self, fps: Optional[float] = None, quality: Optional[int] = None,
+                  max_side: Optional[int] = None, encoding: Optional[str] = None) -> None:
+        """
+        调整预览参数（运行中立即生效）
+        
+        Args:
+            fps: 预览帧率
+            quality: JPEG质量（1-100）
+            max_side: 预览图像的最大边长
+            encoding: 'jpeg'或'rgba'
+        """
+        if encoding is not None and encoding not in ENCODINGS:
+            raise ValueError(f"不支持的预览编码: {encoding}")
+        with self._lock:
+            if fps is not None:
+                self.fps = min(self.MAX_FPS, max(0.1, float(fps)))
+            if quality is not None:
+                self.quality = min(100, max(1, int(quality)))
+            if max_side is not None:
+                self.max_side = max(64, int(max_side))
+            if encoding is not None:
+                self.encoding = encoding
+    
+    def start(self) -> bool:
+        """
+        启动发布线程
+        
+        Returns:
+            bool: 是否启动成功
+        """
+        if self.is_running:
+            return True
+        try:
+            with self._lock:
+                self._ensure_ring()
+        except (OSError, ValueError) as e:
+            logger.error("Failed to create frame channel: %s", e)
+            return False
+        
+        self._last_frame_id = None
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="FrameChannel", daemon=True)
+        self._thread.start()
+        return True
+    
+    def stop(self) -> None:
+        """停止发布线程（环形文件保留，close()时删除）"""
+        self._stop_event.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=2.0)
+        self._thread = None
+    
+    def close(self) -> None:
+        """停止发布并删除环形文件"""
+        self.stop()
+        with self._lock:
+            self._release_ring()
+    
+    def publish(self, frame) -> Optional[Dict[str, Any]]:
+        """
+        立即发布一帧（如capture_window命令的截图）
+        
+        Args:
+            frame: Frame
+        
+        Returns:
+            Dict[str, Any]: 帧通知，失败返回None
+        """
+        try:
+            with self._lock:
+                self._ensure_ring()
+                return self._write(frame)
+        except Exception as e:
+            self._stats['errors'] += 1
+            logger.error("Frame channel publish failed: %s", e, interval=5)
+            return None
+    
+    def get_info(self) -> Dict[str, Any]:
+        """
+        获取通道配置和统计
+        
+        Returns:
+            Dict[str, Any]: 文件路径、槽位布局、预览参数和发布统计
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            published = stats['published']
+            total_encode_ms = stats.pop('total_encode_ms')
+            stats.update({
+                'running': self.is_running,
+                'path': self.path,
+                'slots': self.slots,
+                'slot_capacity': self._capacity,
+                'header_size': HEADER_SIZE,
+                'slot_header_size': SLOT_HEADER_SIZE,
+                'fps': self.fps,
+                'quality': self.quality,
+                'max_side': self.max_side,
+                'encoding': self.encoding,
+                'avg_encode_ms': round(total_encode_ms / published, 3) if published else 0.0
+            })
+            return stats
+    
+    def _run(self) -> None:
+        """发布线程主循环"""
+        while not self._stop_event.is_set():
+            started = time.perf_counter()
+            try:
+                frame = self._get_frame()
+                if frame is not None and frame.frame_id != self._last_frame_id:
+                    with self._lock:
+                        self._ensure_ring()
+                        notification = self._write(frame)
+                    self._last_frame_id = frame.frame_id
+                    if notification is not None:
+                        self._notify(notification)
+            except Exception as e:
+                self._stats['errors'] += 1
+                logger.error("Frame channel error: %s", e, interval=5)
+            
+            interval = 1.0 / self.fps
+            self._stop_event.wait(max(0.0, interval - (time.perf_counter() - started)))
+    
+    def _ensure_ring(self) -> None:
+        """按当前最大边长确保环形文件存在且槽位足够大（调用方需持有锁）"""
+        capacity = self.max_side * self.max_side * 4
+        if self._mmap is not None and capacity <= self._capacity:
+            return
+        
+        self._release_ring()
+        self._generation += 1
+        path = os.path.join(self.directory, f"dna_frame_channel_{os.getpid()}_{self._generation}.bin")
+        size = HEADER_SIZE + self.slots * (SLOT_HEADER_SIZE + capacity)
+        
+        file = open(path, 'w+b')
+        try:
+            file.truncate(size)
+            ring = mmap.mmap(file.fileno(), size)
+        except Exception:
+            file.close()
+            os.remove(path)
+            raise
+        _FILE_HEADER.pack_into(ring, 0, MAGIC, VERSION, self.slots, capacity, SLOT_HEADER_SIZE)
+        
+        self.path = path
+        self._file = file
+        self._mmap = ring
+        self._capacity = capacity
+        self._next_slot = 0
+        self._seqs = [0] * self.slots
+    
+    def _release_ring(self) -> None:
+        """关闭并删除环形文件（调用方需持有锁）"""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+        self._capacity = 0
+    
+    def _encode(self, frame) -> Tuple[Optional[np.ndarray], Tuple[int, int]]:
+        """
+        把帧缩小到最大边长以内并编码（调用方需持有锁）
+        
+        Args:
+            frame: Frame
+        
+        Returns:
+            tuple: (data, (height, width)) 编码后的数据（JPEG字节或RGBA像素，失败为None）和预览尺寸
+        """
+        image = frame.image
+        height, width = image.shape[:2]
+        scale = min(1.0, self.max_side / float(max(height, width)))
+        if scale < 1.0:
+            size = (max(1, int(width * scale)), max(1, int(height * scale)))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        
+        if self.encoding == 'jpeg':
+            ok, data = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            return (data if ok else None), image.shape[:2]
+        
+        code = cv2.COLOR_GRAY2RGBA if image.ndim == 2 else cv2.COLOR_BGR2RGBA
+        return cv2.cvtColor(image, code), image.shape[:2]
+    
+    def _write(self, frame) -> Optional[Dict[str, Any]]:
+        """
+        把一帧写入下一个槽位（调用方需持有锁）
+        
+        Args:
+            frame: Frame
+        
+        Returns:
+            Dict[str, Any]: 帧通知，编码失败或超出槽位容量时返回None
+        """
+        started = time.perf_counter()
+        data, (height, width) = self._encode(frame)
+        encode_ms = (time.perf_counter() - started) * 1000
+        if data is None:
+            self._stats['errors'] += 1
+            return None
+        if data.nbytes > self._capacity:
+            self._stats['oversized'] += 1
+            return None
+        
+        channels = 4 if self.encoding == 'rgba' else (1 if frame.image.ndim == 2 else 3)
+        
+        slot = self._next_slot
+        self._next_slot = (slot + 1) % self.slots
+        offset = HEADER_SIZE + slot * (SLOT_HEADER_SIZE + self._capacity)
+        data_offset = offset + SLOT_HEADER_SIZE
+        
+        # seqlock：写入期间seq为奇数
+        seq = self._seqs[slot] + 1
+        struct.pack_into('<Q', self._mmap, offset, seq)
+        self._mmap[data_offset:data_offset + data.nbytes] = data.tobytes()
+        seq += 1
+        _SLOT_HEADER.pack_into(self._mmap, offset, seq, frame.frame_id, frame.captured_at, width, height,
+                               channels, ENCODINGS[self.encoding], data.nbytes)
+        self._seqs[slot] = seq
+        
+        self._stats['published'] += 1
+        self._stats['bytes'] += data.nbytes
+        self._stats['total_encode_ms'] += encode_ms
+        return {
+            'path': self.path,
+            'slot': slot,
+            'seq': seq,
+            'offset': data_offset,
+            'length': int(data.nbytes),
+            'frame_id': frame.frame_id,
+            'width': int(width),
+            'height': int(height),
+            'channels': channels,
+            'encoding': self.encoding,
+            'source_size': [int(frame.image.shape[1]), int(frame.image.shape[0])],
+            'encode_ms': round(encode_ms, 3)
+        }
@@ -0,0 +1,445 @@
+"""
+帧来源模块
+为窗口截图提供统一的帧来源接口：
+- LiveFrameSource: 实时截图（包装WindowCapture的平台截图实现）
+- ReplayFrameSource: 从PNG目录或视频文件回放，用于离线测量识别吞吐量和复现线上问题
+
+帧来源按截图的原生通道顺序返回图像（如Windows的BGRA），由消费者通过Frame.to_format()
+或convert_image()一次转换为需要的格式
+"""
+import glob
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from engine_log import get_logger
+
+logger = get_logger('frame_source')
+
+
+# 消费者可以请求的帧格式：BGR彩色、灰度、1/2分辨率灰度
+FRAME_FORMATS = ('bgr', 'gray', 'gray_half')
+
+# 原生格式到目标格式的颜色转换
+_COLOR_CONVERSIONS = {
+    ('bgra', 'bgr'): cv2.COLOR_BGRA2BGR,
+    ('bgra', 'gray'): cv2.COLOR_BGRA2GRAY,
+    ('rgba', 'bgr'): cv2.COLOR_RGBA2BGR,
+    ('rgba', 'gray'): cv2.COLOR_RGBA2GRAY,
+    ('rgb', 'bgr'): cv2.COLOR_RGB2BGR,
+    ('rgb', 'gray'): cv2.COLOR_RGB2GRAY,
+    ('bgr', 'gray'): cv2.COLOR_BGR2GRAY,
+    ('gray', 'bgr'): cv2.COLOR_GRAY2BGR,
+}
+
+
+def converted_shape(shape, dst_format: str):
+    """
+    计算图像转换为目标格式后的尺寸
+    
+    Args:
+        shape: 原图尺寸
+        dst_format: 目标格式
+    
+    Returns:
+        tuple: 转换后的数组尺寸
+    """
+    height, width = shape[:2]
+    if dst_format == 'gray_half':
+        return (max(1, height // 2), max(1, width // 2))
+    if dst_format == 'gray':
+        return (height, width)
+    return (height, width, 3)
+
+
+def convert_image(image: np.ndarray, src_format: str, dst_format: str, dst: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    把图像从原生格式转换为目标格式，转换一步完成并可以直接写入预分配的缓冲区
+    
+    Args:
+        image: 原图
+        src_format: 原图格式（'bgr'、'bgra'、'rgb'、'rgba'、'gray'、'gray_half'）
+        dst_format: 目标格式（FRAME_FORMATS之一）
+        dst: 可选的输出缓冲区，尺寸需为converted_shape()
+    
+    Returns:
+        numpy.ndarray: 转换后的图像（传入dst时即dst；格式相同且未传入dst时为原图）
+    """
+    if src_format == dst_format:
+        if dst is None:
+            return image
+        np.copyto(dst, image)
+        return dst
+    
+    if dst_format == 'gray_half':
+        if src_format == 'gray_half':
+            raise ValueError("gray_half cannot be converted further")
+        # 先在原生格式上缩小再转灰度，颜色转换只作用于1/4的像素；裁成偶数尺寸使INTER_AREA走整数倍快速路径
+        height, width = image.shape[:2]
+        even = image[:max(2, height - height % 2), :max(2, width - width % 2)]
+        half = cv2.resize(even, (max(1, even.shape[1] // 2), max(1, even.shape[0] // 2)), interpolation=cv2.INTER_AREA)
+        return convert_image(half, src_format, 'gray', dst)
+    
+    code = _COLOR_CONVERSIONS.get((src_format, dst_format))
+    if code is None:
+        raise ValueError(f"Unsupported frame conversion: {src_format} -> {dst_format}")
+    return cv2.cvtColor(image, code, dst=dst)
+
+
+class Frame:
+    """
+    单帧截图 - 图像数据和帧元信息
+    
+    同一个Frame的image始终是同一个数组对象，图像识别以数组身份缓存帧预处理结果；
+    to_format()的转换结果同样按格式缓存在帧上，每帧每种格式只转换一次
+    """
+    
+    __slots__ = ('image', 'frame_id', 'timestamp', 'source', 'format', 'captured_at', '_converted')
+    
+    def __init__(self, image: np.ndarray, frame_id: int, timestamp: float, source: str = '', fmt: str = 'bgr',
+                 captured_at: Optional[float] = None):
+        """
+        初始化帧
+        
+        Args:
+            image: 图像
+            frame_id: 帧序号，同一来源内单调递增
+            timestamp: 帧时间戳（秒）。实时截图为time.monotonic()，回放为录制时的原始时间戳
+            source: 帧来源名称
+            fmt: 图像格式（'bgr'、'bgra'、'rgb'、'rgba'、'gray'、'gray_half'）
+            captured_at: 帧进入流水线的时间（time.monotonic()），None表示当前时间；
+                         回放帧的timestamp是录制时间，计算帧的新旧程度应使用captured_at
+        """
+        self.image = image
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.source = source
+        self.format = fmt
+        self.captured_at = time.monotonic() if captured_at is None else captured_at
+        self._converted = None
+    
+    @property
+    def shape(self):
+        """图像尺寸"""
+        return self.image.shape
+    
+    def to_format(self, fmt: str) -> 'Frame':
+        """
+        获取该帧的指定格式版本
+        
+        Args:
+            fmt: 目标格式（FRAME_FORMATS之一）
+        
+        Returns:
+            Frame: 帧序号和时间戳相同的帧，格式相同时返回自身
+        """
+        if fmt == self.format:
+            return self
+        
+        converted = self._converted if self._converted is not None else {}
+        frame = converted.get(fmt)
+        if frame is None:
+            image = convert_image(self.image, self.format, fmt)
+            frame = Frame(image, self.frame_id, self.timestamp, self.source, fmt, self.captured_at)
+            converted[fmt] = frame
+            self._converted = converted
+        return frame
+
+
+class FrameSource(ABC):
+    """
+    帧来源基类 - 所有帧来源都应实现read()
+    """
+    
+    def __init__(self, name: str):
+        """
+        初始化帧来源
+        
+        Args:
+            name: 来源名称
+        """
+        self.name = name
+        self.frames_read = 0
+    
+    @abstractmethod
+    def read(self) -> Optional[Frame]:
+        """
+        读取下一帧
+        
+        Returns:
+            Frame: 帧数据，失败或回放结束时返回None
+        """
+        pass
+    
+    def close(self) -> None:
+        """释放来源占用的资源"""
+        pass
+    
+    def get_info(self) -> Dict[str, Any]:
+        """
+        获取来源信息
+        
+        Returns:
+            Dict[str, Any]: 来源信息
+        """
+        return {"type": self.name, "frames_read": self.frames_read}
+
+
+class LiveFrameSource(FrameSource):
+    """
+    实时截图来源 - 每次read()调用一次平台截图函数
+    """
+    
+    def __init__(self, grab: Callable[[], Optional[Tuple[np.ndarray, str]]]):
+        """
+        初始化实时截图来源
+        
+        Args:
+            grab: 截图函数，返回(原生格式的图像, 格式名称)，失败返回None
+        """
+        super().__init__("live")
+        self._grab = grab
+        self._lock = threading.Lock()
+    
+    def read(self) -> Optional[Frame]:
+        """
+        截取一帧
+        
+        Returns:
+            Frame: 帧数据，截图失败返回None
+        """
+        grabbed = self._grab()
+        if grabbed is None:
+            return None
+        
+        image, fmt = grabbed
+        with self._lock:
+            self.frames_read += 1
+            frame_id = self.frames_read
+        now = time.monotonic()
+        return Frame(image, frame_id, now, self.name, fmt, now)
+
+
+class ReplayFrameSource(FrameSource):
+    """
+    回放来源 - 按顺序回放PNG目录或视频文件中的帧
+    
+    目录回放：按文件名排序读取*.png/*.jpg，目录中的timestamps.json（{文件名: 秒}）
+    提供原始时间戳，缺失时按nominal_fps生成等间隔时间戳。
+    视频回放：原始时间戳取自视频的帧时间（CAP_PROP_POS_MSEC）。
+    
+    回放速率：fps为None时按原始时间戳的间隔回放，0为尽可能快，大于0为固定帧率。
+    无论以何种速率回放，Frame.timestamp都是原始时间戳
+    """
+    
+    IMAGE_PATTERNS = ('*.png', '*.jpg', '*.jpeg', '*.bmp')
+    TIMESTAMPS_FILE = 'timestamps.json'
+    
+    def __init__(self, path: str, fps: Optional[float] = None, loop: bool = False,
+                 preload: bool = False, nominal_fps: float = 30.0):
+        """
+        初始化回放来源
+        
+        Args:
+            path: PNG目录或视频文件路径
+            fps: 回放速率，None按原始时间戳，0尽可能快，大于0为固定帧率
+            loop: 回放结束后是否从头循环（循环时时间戳继续递增）
+            preload: 是否预先解码所有帧（仅目录），使测量结果不包含解码耗时
+            nominal_fps: 目录没有时间戳文件时假定的录制帧率
+        """
+        super().__init__("replay")
+        self.path = path
+        self.fps = fps
+        self.loop = loop
+        self.nominal_fps = nominal_fps
+        self.exhausted = False
+        self.unreadable = 0           # 无法解码而跳过的图片数
+        
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._position = 0            # 下一帧的索引
+        self._loops = 0               # 已完成的循环次数
+        self._start_wall = None       # 回放开始的墙钟时间
+        self._first_timestamp = None  # 回放开始帧的原始时间戳
+        self._capture = None          # 视频读取器
+        self._files: List[str] = []
+        self._timestamps: List[float] = []
+        self._images: Optional[List[np.ndarray]] = None
+        
+        if os.path.isdir(path):
+            self._open_directory(preload)
+        elif os.path.isfile(path):
+            self._open_video()
+        else:
+            raise FileNotFoundError(f"回放路径不存在: {path}")
+    
+    def _open_directory(self, preload: bool) -> None:
+        """
+        打开图片目录
+        
+        Args:
+            preload: 是否预先解码所有帧
+        """
+        files = sorted({f for pattern in self.IMAGE_PATTERNS for f in glob.glob(os.path.join(self.path, pattern))})
+        if not files:
+            raise ValueError(f"回放目录中没有图片: {self.path}")
+        
+        recorded = {}
+        timestamps_path = os.path.join(self.path, self.TIMESTAMPS_FILE)
+        if os.path.exists(timestamps_path):
+            with open(timestamps_path, 'r', encoding='utf-8') as f:
+                recorded = json.load(f)
+        
+        self._files = files
+        self._timestamps = [
+            float(recorded.get(os.path.basename(f), i / self.nominal_fps)) for i, f in enumerate(files)
+        ]
+        if preload:
+            self._images = [cv2.imread(f, cv2.IMREAD_COLOR) for f in files]
+    
+    def _open_video(self) -> None:
+        """打开视频文件"""
+        self._capture = cv2.VideoCapture(self.path)
+        if not self._capture.isOpened():
+            raise ValueError(f"无法打开回放视频: {self.path}")
+    
+    @property
+    def frame_count(self) -> int:
+        """回放来源的总帧数（视频为容器中记录的帧数）"""
+        if self._capture is not None:
+            return int(self._capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        return len(self._files)
+    
+    def read(self) -> Optional[Frame]:
+        """
+        读取下一帧，按回放速率等待
+        
+        Returns:
+            Frame: 帧数据，回放结束返回None
+        """
+        with self._lock:
+            if self.exhausted:
+                return None
+            
+            image, timestamp = self._read_next()
+            if image is None and self.loop and self._position > 0:
+                self._rewind()
+                image, timestamp = self._read_next()
+            if image is None:
+                self.exhausted = True
+                return None
+            
+            due = self._due_time(timestamp)
+            self.frames_read += 1
+            frame = Frame(image, self.frames_read, timestamp, self.name)
+        
+        # 在锁外等待，低帧率回放时close()和get_info()不会被阻塞一整个帧间隔
+        delay = due - time.monotonic() if due is not None else 0.0
+        if delay > 0 and self._closed.wait(delay):
+            return None
+        return frame
+    
+    def _read_next(self):
+        """
+        读取下一帧的图像和原始时间戳
+        
+        Returns:
+            tuple: (image, timestamp)，没有更多帧时image为None
+        """
+        # 循环回放时在原始时间戳上累加已回放的时长，保证时间戳单调递增
+        offset = self._loops * self._duration() if self._loops else 0.0
+        
+        if self._capture is not None:
+            ok, image = self._capture.read()
+            if not ok:
+                return None, None
+            timestamp = self._capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            self._position += 1
+            return image, timestamp + offset
+        
+        # 无法解码的图片跳过并计数，不当作回放结束
+        while self._position < len(self._files):
+            index = self._position
+            self._position += 1
+            image = self._images[index] if self._images is not None else cv2.imread(self._files[index], cv2.IMREAD_COLOR)
+            if image is not None:
+                return image, self._timestamps[index] + offset
+            self.unreadable += 1
+            logger.warn("Skipping unreadable replay frame: %s", self._files[index], interval=5)
+        return None, None
+    
+    def _duration(self) -> float:
+        """
+        一次完整回放的时长（用于循环回放的时间戳偏移）
+        
+        Returns:
+            float: 时长（秒），包含最后一帧的间隔
+        """
+        if self._capture is not None:
+            fps = self._capture.get(cv2.CAP_PROP_FPS) or self.nominal_fps
+            return self.frame_count / fps
+        interval = (self._timestamps[-1] - self._timestamps[0]) / max(len(self._timestamps) - 1, 1)
+        return self._timestamps[-1] - self._timestamps[0] + (interval or 1.0 / self.nominal_fps)
+    
+    def _rewind(self) -> None:
+        """回到第一帧"""
+        self._loops += 1
+        self._position = 0
+        if self._capture is not None:
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    
+    def _due_time(self, timestamp: float) -> Optional[float]:
+        """
+        按回放速率计算该帧的播放时间（调用方需持有锁）
+        
+        Args:
+            timestamp: 帧的原始时间戳
+        
+        Returns:
+            float: 播放时间（time.monotonic()），无需等待时返回None
+        """
+        if self.fps == 0:
+            return None
+        
+        if self._start_wall is None:
+            self._start_wall = time.monotonic()
+            self._first_timestamp = timestamp
+            return None
+        
+        if self.fps is None:
+            return self._start_wall + (timestamp - self._first_timestamp)
+        return self._start_wall + self.frames_read / self.fps
+    
+    def close(self) -> None:
+        """释放视频读取器（正在等待播放时间的read()立即返回None）"""
+        self._closed.set()
+        with self._lock:
+            if self._capture is not None:
+                self._capture.release()
+                self._capture = None
+            self.exhausted = True
+    
+    def get_info(self) -> Dict[str, Any]:
+        """
+        获取回放信息
+        
+        Returns:
+            Dict[str, Any]: 回放信息
+        """
+        info = super().get_info()
+        info.update({
+            "path": self.path,
+            "frame_count": self.frame_count,
+            "position": self._position,
+            "fps": self.fps,
+            "loop": self.loop,
+            "exhausted": self.exhausted,
+            "unreadable": self.unreadable
+        })
+        return info
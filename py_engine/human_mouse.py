@@ -9,6 +9,11 @@ import math
 import numpy as np
 import platform
 
+from engine_log import get_logger
+
+logger = get_logger('human_mouse')
+
+
 class HumanMouse:
     """人性化鼠标控制类"""
     
@@ -20,11 +25,11 @@ class HumanMouse:
         
         # 获取屏幕尺寸
         self.screen_width, self.screen_height = pyautogui.size()
-        print(f"[INFO] Screen size: {self.screen_width}x{self.screen_height}")
+        logger.info("Screen size: %sx%s", self.screen_width, self.screen_height)
         
         # 检测操作系统
         self.platform = platform.system()
-        print(f"[INFO] Platform: {self.platform}")
+        logger.info("Platform: %s", self.platform)
     
     def click(self, x, y, button='left', duration=0.1):
         """
@@ -41,9 +46,9 @@ class HumanMouse:
             bool: 是否点击成功
         """
         try:
-            print(f"[INFO] 准备精确点击位置: ({x}, {y})")
-            print(f"[INFO] 屏幕尺寸: {self.screen_width}x{self.screen_height}")
-            print(f"[INFO] 操作系统: {self.platform}")
+            logger.debug("准备精确点击位置: (%s, %s)", x, y)
+            logger.debug("屏幕尺寸: %sx%s", self.screen_width, self.screen_height)
+            logger.debug("操作系统: %s", self.platform)
             
             # 根据平台进行不同的坐标验证
             if self.platform == 'Darwin':  # macOS
@@ -53,37 +58,37 @@ class HumanMouse:
                 max_reasonable_y = self.screen_height * 3
                 
                 if not (0 <= x <= max_reasonable_x and 0 <= y <= max_reasonable_y):
-                    print(f"[WARN] macOS坐标超出合理范围: ({x}, {y})")
-                    print(f"[WARN] 合理范围: 0-{max_reasonable_x} x 0-{max_reasonable_y}")
+                    logger.warn("macOS坐标超出合理范围: (%s, %s)", x, y, interval=5)
+                    logger.warn("合理范围: 0-%s x 0-%s", max_reasonable_x, max_reasonable_y, interval=5)
                     # 对于macOS，我们仍然尝试点击，因为可能是HiDPI环境
-                    print(f"[INFO] macOS HiDPI环境，尝试直接点击坐标: ({x}, {y})")
+                    logger.debug("macOS HiDPI环境，尝试直接点击坐标: (%s, %s)", x, y)
                 else:
-                    print(f"[INFO] macOS坐标在合理范围内: ({x}, {y})")
+                    logger.debug("macOS坐标在合理范围内: (%s, %s)", x, y)
             else:
                 # 非macOS平台，使用严格的屏幕范围检查
                 if not (0 <= x <= self.screen_width and 0 <= y <= self.screen_height):
-                    print(f"[WARN] 坐标超出屏幕范围: ({x}, {y}), 屏幕: {self.screen_width}x{self.screen_height}")
+                    logger.warn("坐标超出屏幕范围: (%s, %s), 屏幕: %sx%s", x, y, self.screen_width, self.screen_height, interval=5)
                     # 自动调整坐标到屏幕范围内
                     x = max(0, min(x, self.screen_width - 1))
                     y = max(0, min(y, self.screen_height - 1))
-                    print(f"[INFO] 坐标已调整到屏幕范围内: ({x}, {y})")
+                    logger.debug("坐标已调整到屏幕范围内: (%s, %s)", x, y)
             
             # 获取当前鼠标位置
             current_x, current_y = pyautogui.position()
-            print(f"[INFO] 当前鼠标位置: ({current_x}, {current_y})")
+            logger.debug("当前鼠标位置: (%s, %s)", current_x, current_y)
             
             # 计算移动距离
             distance = math.sqrt((x - current_x) ** 2 + (y - current_y) ** 2)
-            print(f"[INFO] 需要移动距离: {distance:.1f} 像素")
+            logger.debug("需要移动距离: %.1f 像素", distance)
             
             # 根据平台选择不同的点击策略
             if self.platform == 'Darwin':  # macOS
-                print(f"[INFO] macOS平台：使用HiDPI优化的点击策略")
+                logger.debug("macOS平台：使用HiDPI优化的点击策略")
                 
                 # macOS HiDPI环境下的特殊处理
                 try:
                     # 第一步：尝试直接移动到目标位置
-                    print(f"[DEBUG] 第一步：直接移动到目标位置")
+                    logger.debug("第一步：直接移动到目标位置")
                     pyautogui.moveTo(x, y, duration=0.3)
                     time.sleep(0.1)
                     
@@ -91,11 +96,11 @@ class HumanMouse:
                     actual_x, actual_y = pyautogui.position()
                     error_x = abs(actual_x - x)
                     error_y = abs(actual_y - y)
-                    print(f"[DEBUG] 移动后位置: ({actual_x}, {actual_y}), 误差: ({error_x}, {error_y})")
+                    logger.debug("移动后位置: (%s, %s), 误差: (%s, %s)", actual_x, actual_y, error_x, error_y)
                     
                     # 如果误差较大，尝试分步移动
                     if error_x > 5 or error_y > 5:
-                        print(f"[DEBUG] 误差较大，尝试分步移动")
+                        logger.debug("误差较大，尝试分步移动")
                         # 分两步移动：先移动到中间位置，再移动到目标位置
                         mid_x = (current_x + x) / 2
                         mid_y = (current_y + y) / 2
@@ -109,61 +114,62 @@ class HumanMouse:
                         actual_x, actual_y = pyautogui.position()
                         error_x = abs(actual_x - x)
                         error_y = abs(actual_y - y)
-                        print(f"[DEBUG] 分步移动后位置: ({actual_x}, {actual_y}), 误差: ({error_x}, {error_y})")
+                        logger.debug("分步移动后位置: (%s, %s), 误差: (%s, %s)", actual_x, actual_y, error_x, error_y)
                     
                     # 执行点击
-                    print(f"[DEBUG] 执行点击...")
+                    logger.debug("执行点击...")
                     pyautogui.click(x, y, button=button, duration=duration)
-                    print(f"[OK] macOS HiDPI点击完成: ({x}, {y})")
+                    logger.ok("macOS HiDPI点击完成: (%s, %s)", x, y)
                     
                 except Exception as mac_error:
-                    print(f"[WARN] macOS HiDPI点击策略失败: {mac_error}")
+                    logger.warn("macOS HiDPI点击策略失败: %s", mac_error, interval=5)
                     # 回退到基础点击方法
-                    print(f"[INFO] 回退到基础点击方法")
+                    logger.info("回退到基础点击方法")
                     pyautogui.click(x, y, button=button, duration=duration)
                 
             else:  # Windows和其他平台
-                print(f"[INFO] {self.platform}平台：使用标准点击策略")
+                logger.debug("%s平台：使用标准点击策略", self.platform)
                 # 使用更直接的移动方式确保精确性
                 pyautogui.moveTo(x, y, duration=0.3)
                 
                 # 验证移动结果
                 actual_x, actual_y = pyautogui.position()
-                print(f"[INFO] 移动后实际位置: ({actual_x}, {actual_y})")
+                logger.debug("移动后实际位置: (%s, %s)", actual_x, actual_y)
                 
                 # 计算位置误差
                 error_x = abs(actual_x - x)
                 error_y = abs(actual_y - y)
-                print(f"[INFO] 位置误差: X={error_x}, Y={error_y}")
+                logger.debug("位置误差: X=%s, Y=%s", error_x, error_y)
                 
                 # 如果误差较大，尝试多次精确移动
                 max_attempts = 3
                 attempt = 0
                 while (error_x > 2 or error_y > 2) and attempt < max_attempts:
                     attempt += 1
-                    print(f"[WARN] 位置误差过大，尝试第{attempt}次精确移动...")
+                    logger.debug("位置误差过大，尝试第%s次精确移动...", attempt)
                     pyautogui.moveTo(x, y, duration=0.1)
                     actual_x, actual_y = pyautogui.position()
                     error_x = abs(actual_x - x)
                     error_y = abs(actual_y - y)
-                    print(f"[INFO] 第{attempt}次移动后位置: ({actual_x}, {actual_y}), 误差: X={error_x}, Y={error_y}")
+                    logger.debug("第%s次移动后位置: (%s, %s), 误差: X=%s, Y=%s", attempt, actual_x, actual_y, error_x, error_y)
                 
                 # 执行点击
-                print(f"[INFO] 执行{button}键点击...")
+                logger.debug("执行%s键点击...", button)
                 pyautogui.click(button=button, duration=duration)
             
             # 点击后验证
             time.sleep(0.1)
             after_click_x, after_click_y = pyautogui.position()
-            print(f"[INFO] 点击后鼠标位置: ({after_click_x}, {after_click_y})")
+            logger.debug("点击后鼠标位置: (%s, %s)", after_click_x, after_click_y)
             
-            print(f"[OK] 精确点击完成: 目标({x}, {y})")
+            logger.ok("精确点击完成: 目标(%s, %s)", x, y)
             return True
             
         except Exception as e:
-            print(f"[ERROR] 精确点击失败: {e}")
-            import traceback
-            print(f"[DEBUG] 错误详情: {traceback.format_exc()}")
+            logger.error("精确点击失败: %s", e)
+            if logger.is_enabled('DEBUG'):
+                import traceback
+                logger.debug("错误详情: %s", traceback.format_exc())
             return False
     
     def move_to(self, x, y, duration=0.5):
@@ -199,7 +205,7 @@ class HumanMouse:
                 pyautogui.moveTo(point_x, point_y, duration=time_per_point)
                 
         except Exception as e:
-            print(f"[WARN] 人性化移动失败，使用直接移动: {e}")
+            logger.warn("人性化移动失败，使用直接移动: %s", e, interval=5)
             # 如果人性化移动失败，使用直接移动
             pyautogui.moveTo(x, y, duration=duration)
     
@@ -291,14 +297,14 @@ class HumanMouse:
             bool: 是否按键成功
         """
         try:
-            print(f"[INFO] 按下按键: {key}")
+            logger.debug("按下按键: %s", key)
             pyautogui.press(key)
             time.sleep(0.1)
-            print(f"[OK] 按键完成: {key}")
+            logger.ok("按键完成: %s", key)
             return True
             
         except Exception as e:
-            print(f"[ERROR] 按键失败: {e}")
+            logger.error("按键失败: %s", e)
             return False
     
     def get_mouse_position(self):
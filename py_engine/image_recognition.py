@@ -9,24 +9,288 @@ import os
 import threading
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Tuple, Optional, Any
 
+from frame_source import Frame
+from frame_change import FrameChangeDetector
+from match_result import AgeHistogram, MatchResult
+from engine_log import get_logger
+from template_cache import TemplateCache
+
+logger = get_logger('image_recognition')
+
+# scipy为可选依赖，仅用于大模板的频域相关
+try:
+    import scipy.fft as scipy_fft
+except ImportError:
+    logger.warn("scipy not available, FFT correlation backend disabled")
+    scipy_fft = None
+
+# 模板编译缓存的默认目录
+DEFAULT_TEMPLATE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'templates')
+
+
+class TemplateData:
+    """
+    模板数据 - 缓存模板原图及其派生数据
+    
+    预处理结果和多尺度变体在加载模板时一次性生成，
+    匹配时直接复用，避免每次匹配重复做灰度化、模糊和缩放
+    """
+    
+    def __init__(self, name, image, mask=None):
+        """
+        初始化模板数据
+        
+        Args:
+            name: 模板名称
+            image: 模板原图（BGR）
+            mask: 由alpha通道生成的掩码（非零为有效像素），完全不透明的模板为None
+        """
+        self.name = name
+        self.image = image        # 模板原图
+        self.mask = mask          # 原尺寸掩码
+        self.base_scale = 1.0     # 基准变体相对原图的缩放比例（校准后为UI缩放比例）
+        self.processed = None     # 预处理后的基准尺寸模板
+        self.processed_mask = mask  # 基准尺寸模板对应的掩码
+        self.scaled = []          # [(scale, processed_template, mask), ...] 按尝试顺序排列的缩放变体
+        self.pyramid_factor = 1   # 金字塔粗搜索的降采样倍数（1表示模板过小，不支持粗搜索）
+        self.coarse = {}          # {scale: (降采样后的预处理模板, 掩码)}，用于金字塔粗搜索
+        self.spectra = {}         # {变体键: {fft_shape: 频谱数据}}，频域相关使用的模板频谱缓存
+        
+        # 预过滤签名
+        self.color_hist = None    # 有效像素的颜色直方图（归一化，灰度模板为None）
+        self.min_area = 0         # 所有变体中最小的有效像素数
+        self.thumb_factor = 1     # 缩略图相对原分辨率的降采样倍数（1表示模板过小，不做缩略图检查）
+        self.thumbs = {}          # {scale: (缩略图模板, 掩码)}
+        
+        # 搜索区域
+        self.search_region = None    # 声明的搜索区域 (x, y, width, height)，相对截图宽高的比例
+        self.hit_box = None          # 历史命中中心点的包围盒 (min_x, min_y, max_x, max_y)
+        self.hit_frame_shape = None  # 包围盒对应的截图尺寸，尺寸变化后失效
+        self.region_misses = 0       # 在搜索区域内连续未命中的次数
+        
+        # 来源
+        self.source_path = None      # 模板源文件路径
+        self.cache_key = None        # 模板编译缓存键，未使用缓存时为None
+    
+    def variants(self):
+        """
+        获取所有尺度的预处理模板
+        
+        Returns:
+            list: [(scale, processed_template, mask), ...] 基准尺寸在前，scale相对基准尺寸
+        """
+        return [(1.0, self.processed, self.processed_mask)] + self.scaled
+    
+    def spectrum_cache(self, key):
+        """
+        获取某个变体的模板频谱缓存
+        
+        Args:
+            key: 变体键，原分辨率变体为scale，粗搜索变体为('coarse', scale)
+            
+        Returns:
+            dict: {fft_shape: 频谱数据}
+        """
+        return self.spectra.setdefault(key, {})
+
+
+class CalibrationProfiles:
+    """
+    分辨率校准档案 - 按窗口尺寸保存校准得到的UI缩放比例
+    
+    档案以JSON文件保存，键为"宽x高"，同一尺寸的窗口无需重复校准
+    """
+    
+    def __init__(self, path):
+        """
+        初始化校准档案
+        
+        Args:
+            path: 档案文件路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._profiles = self._load()
+    
+    @staticmethod
+    def key(width, height):
+        """
+        生成窗口尺寸对应的档案键
+        
+        Args:
+            width: 窗口宽度
+            height: 窗口高度
+            
+        Returns:
+            str: 档案键
+        """
+        return f"{int(width)}x{int(height)}"
+    
+    def get(self, width, height):
+        """
+        获取指定窗口尺寸的校准结果
+        
+        Args:
+            width: 窗口宽度
+            height: 窗口高度
+            
+        Returns:
+            dict: {'scale', 'anchor', 'confidence', 'timestamp'}，未校准返回None
+        """
+        with self._lock:
+            profile = self._profiles.get(self.key(width, height))
+            return dict(profile) if profile else None
+    
+    def save(self, width, height, scale, anchor, confidence):
+        """
+        保存校准结果并写入档案文件
+        
+        Args:
+            width: 窗口宽度
+            height: 窗口高度
+            scale: UI缩放比例
+            anchor: 校准使用的锚点模板名称
+            confidence: 锚点匹配置信度
+        """
+        with self._lock:
+            self._profiles[self.key(width, height)] = {
+                'scale': float(scale),
+                'anchor': anchor,
+                'confidence': float(confidence),
+                'timestamp': time.time()
+            }
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, 'w', encoding='utf-8') as f:
+                    json.dump(self._profiles, f, ensure_ascii=False, indent=2)
+            except Exception as e:
+                logger.warn("Failed to save calibration profiles: %s", e)
+    
+    def _load(self):
+        """
+        从文件读取档案
+        
+        Returns:
+            dict: 档案内容，文件不存在或损坏时为空
+        """
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                profiles = json.load(f)
+            return profiles if isinstance(profiles, dict) else {}
+        except Exception as e:
+            logger.warn("Failed to load calibration profiles: %s", e)
+            return {}
+
 
 class ImageRecognition:
     """图像识别类，支持多后端"""
     
-    def __init__(self, backend='cpu'):
+    # 多尺度匹配的缩放比例，优先尝试接近原始尺寸的缩放
+    MULTI_SCALES = [0.8, 0.9, 1.1, 1.2, 0.7, 1.3, 0.6, 1.4, 0.5, 1.5]
+    # 缩放后模板的最小边长，过小的模板匹配结果不可靠
+    MIN_TEMPLATE_SIZE = 15
+    # alpha值不低于该值的像素参与匹配
+    ALPHA_MASK_THRESHOLD = 128
+    # 裁剪到不透明区域后，有效像素比例不低于该值的模板不使用掩码
+    # （带掩码的matchTemplate约为不带掩码的3倍耗时，少量透明边缘对匹配分数影响很小）
+    MASK_OPAQUE_RATIO = 0.95
+    
+    # 频域相关参数：模板面积占搜索图像面积的比例达到阈值时改用FFT
+    FFT_AREA_RATIO = 0.1
+    FFT_MIN_TEMPLATE_AREA = 64 * 64
+    
+    # 金字塔粗到精搜索参数
+    PYRAMID_FACTORS = [4, 2]          # 可选的降采样倍数，优先使用更粗的层级
+    PYRAMID_MIN_COARSE_SIZE = 6       # 降采样后模板的最小边长
+    PYRAMID_MIN_COARSE_PIXELS = 48    # 降采样后模板的最少有效像素数
+    PYRAMID_MASK_COVERAGE = 64        # 粗层级掩码保留的最低覆盖率（0-255），细线条降采样后只覆盖部分像素
+    PYRAMID_MASK_DILATE = 1           # 粗层级掩码的膨胀次数，使细线条在粗层级上仍有足够的有效像素
+    PYRAMID_PEAKS_PER_SCALE = 3       # 每个尺度在粗层级上保留的候选峰值数
+    PYRAMID_MAX_REFINE = 5            # 最多在原分辨率上精修的候选数
+    PYRAMID_COARSE_MARGIN = 0.25      # 粗层级得分允许低于阈值的余量（降采样会损失细节）
+    
+    # 搜索区域参数
+    REGION_MAX_MISSES = 5             # 搜索区域内连续未命中多少次后回退到一次全帧搜索
+    LEARNED_REGION_MARGIN = 32        # 学习到的搜索区域在命中包围盒外扩展的像素
+    REVERIFY_MARGIN = 16              # 重新验证过期结果时在命中框外扩展的像素
+    
+    # 预过滤参数：在完整匹配之前用廉价的签名排除不可能出现的模板
+    PREFILTER_STAGES = ('stats', 'color', 'thumbnail')  # 按代价从低到高依次执行
+    PREFILTER_MIN_STD = 2.0           # 搜索区域灰度标准差低于该值视为纯色画面（加载/黑屏），任何模板都无法匹配
+    PREFILTER_COLOR_BINS = 8          # 颜色直方图每个通道的分箱数
+    PREFILTER_MIN_COLOR_CONTAINMENT = 0.7  # 模板颜色在搜索区域中的最低覆盖率
+    PREFILTER_THUMB_FACTORS = [8, 4]  # 缩略图可选的降采样倍数
+    PREFILTER_THUMB_MIN_SIZE = 6      # 缩略图模板的最小边长
+    PREFILTER_THUMB_MIN_PIXELS = 48   # 缩略图模板的最少有效像素数（有效像素过少时相关得分没有区分度）
+    PREFILTER_THUMB_MARGIN = 0.35     # 缩略图得分允许低于阈值的余量
+    
+    # 模板处理流程版本，修改预处理或派生数据的生成方式时递增，使旧的编译缓存失效
+    PIPELINE_VERSION = 3
+    
+    # 分辨率校准参数
+    CALIBRATION_SCALES = [round(0.5 + 0.05 * i, 2) for i in range(31)]  # 粗扫描的缩放比例 0.5-2.0
+    CALIBRATION_REFINE_STEP = 0.01    # 在最佳粗扫描比例附近精修的步长
+    CALIBRATION_MIN_CONFIDENCE = 0.8  # 锚点模板的最低置信度，低于该值视为校准失败
+    
+    def __init__(self, backend='cpu', search_mode='exhaustive', max_workers=None, learn_search_regions=True,
+                 prefilter=True, cache_dir=DEFAULT_TEMPLATE_CACHE_DIR):
         """
         初始化图像识别器
         
         Args:
             backend: 'cpu', 'cuda', 'opencl'
+            search_mode: 默认搜索模式 'exhaustive'（全分辨率多尺度）或 'pyramid'（粗到精）
+            max_workers: match_many使用的线程数，默认为CPU核心数
+            learn_search_regions: 是否根据历史命中自动学习模板的搜索区域
+            prefilter: 是否在完整匹配前执行预过滤
+            cache_dir: 模板编译缓存目录，None表示不使用磁盘缓存
         """
         self.backend = backend
         self.use_cuda = False
-        self.templates = {}  # 缓存加载的模板
+        self.search_mode = search_mode
+        self.learn_search_regions = learn_search_regions
+        self.use_fft = scipy_fft is not None  # 是否允许对大模板使用频域相关
+        self.ui_scale = None  # 校准得到的UI缩放比例，None表示未校准（每次匹配尝试所有缩放比例）
+        self.prefilter = prefilter
+        self.templates: Dict[str, TemplateData] = {}  # 缓存加载的模板及其派生数据
+        self.template_cache = TemplateCache(cache_dir) if cache_dir else None  # 模板编译的磁盘缓存
+        
+        # 帧预处理缓存 - 同一帧只预处理一次，供所有模板共享
+        self._frame_lock = threading.Lock()
+        self._cached_frame = None   # 缓存对应的截图对象（持有引用以保证身份比较有效）
+        self._cached_levels = {}    # {降采样倍数: 预处理后的截图}，1为原分辨率
+        self._cached_spectra = {}   # 当前帧（及其区域）的频谱和积分图缓存
+        self._cached_signatures = {}  # {(帧身份, 签名类型, 区域): (帧, 签名)} 预过滤签名缓存
+        self._last_frame_shape = None  # 最近一帧的尺寸，用于加载模板时预先计算频谱
+        
+        # 批量匹配线程池（OpenCV在matchTemplate期间释放GIL，多线程可以真正并行）
+        self.max_workers = max_workers or os.cpu_count() or 4
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        
+        # 预过滤统计 {stage: [检查次数, 排除次数, 累计耗时(秒)]}
+        self._prefilter_stats = {stage: [0, 0, 0.0] for stage in self.PREFILTER_STAGES}
+        self._prefilter_lock = threading.Lock()
+        
         self._init_backend()
         
+    @property
+    def frame_format(self):
+        """
+        匹配需要的截图格式
+        
+        匹配本身只使用灰度图；只有颜色预过滤需要彩色截图
+        
+        Returns:
+            str: 'bgr' 或 'gray'
+        """
+        return 'bgr' if self.prefilter and 'color' in self.PREFILTER_STAGES else 'gray'
+    
     def _init_backend(self):
         """初始化后端"""
         if self.backend == 'cuda':
@@ -53,13 +317,14 @@ class ImageRecognition:
         else:
             print("[OK] Using CPU backend")
     
-    def load_template(self, name, image_path):
+    def load_template(self, name, image_path, search_region=None):
         """
         加载模板图片
         
         Args:
             name: 模板名称
             image_path: 图片路径
+            search_region: 可选的搜索区域 (x, y, width, height)，相对截图宽高的比例（0-1）
             
         Returns:
             bool: 是否加载成功
@@ -68,76 +333,979 @@ class ImageRecognition:
             if not os.path.exists(image_path):
                 print(f"[ERROR] Template file not found: {image_path}")
                 return False
-                
-            template = cv2.imread(image_path)
-            if template is None:
-                print(f"[ERROR] Cannot read template: {image_path}")
+            
+            entry = self._load_compiled_template(name, image_path)
+            if entry is None:
                 return False
-                
-            self.templates[name] = template
-            print(f"[OK] Template loaded: {name} ({template.shape[1]}x{template.shape[0]})")
+            
+            self.templates[name] = entry
+            logger.ok("Template loaded: %s (%sx%s), %s scaled variants, %s, pyramid 1/%s%s",
+                      name, entry.image.shape[1], entry.image.shape[0], len(entry.scaled),
+                      'masked' if entry.mask is not None else 'opaque', entry.pyramid_factor,
+                      ', cached' if entry.cache_key else '')
+            if entry.pyramid_factor == 1:
+                logger.info("Template %s is too small for pyramid search, pyramid mode falls back to exhaustive search", name)
+            
+            if search_region is not None:
+                self.set_search_region(name, search_region)
             return True
             
-        except Exception as e:
-            print(f"[ERROR] Failed to load template: {e}")
-            return False
+        except Exception as e:
+            print(f"[ERROR] Failed to load template: {e}")
+            return False
+    
+    def _load_compiled_template(self, name, image_path):
+        """
+        获取模板的编译结果，优先使用磁盘缓存
+        
+        同名模板的源文件和处理参数都未变化时直接复用内存中的模板（保留学习到的搜索区域）
+        
+        Args:
+            name: 模板名称
+            image_path: 图片路径
+            
+        Returns:
+            TemplateData: 模板数据，读取失败返回None
+        """
+        key = None
+        entry = None
+        
+        if self.template_cache is not None:
+            key = self.template_cache.make_key(image_path, self._pipeline_signature())
+            current = self.templates.get(name)
+            if key is not None and current is not None and current.cache_key == key:
+                return current
+            
+            cached = self.template_cache.load(key) if key is not None else None
+            if cached is not None:
+                entry = self._entry_from_arrays(name, *cached)
+                self._precompute_spectra(entry)
+        
+        if entry is None:
+            # 保留alpha通道，透明像素不参与匹配
+            image = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+            if image is None:
+                print(f"[ERROR] Cannot read template: {image_path}")
+                return None
+            
+            template, mask = self._split_alpha(image)
+            entry = self._build_template_data(name, template, mask)
+            if key is not None and not self.template_cache.store(key, *self._entry_to_arrays(entry)):
+                key = None
+        
+        entry.source_path = image_path
+        entry.cache_key = key
+        return entry
+    
+    def _pipeline_signature(self):
+        """
+        生成模板处理流程签名，包含所有影响编译结果的参数
+        
+        Returns:
+            str: 签名字符串
+        """
+        return json.dumps({
+            'version': self.PIPELINE_VERSION,
+            'ui_scale': self.ui_scale,
+            'scales': self.MULTI_SCALES,
+            'min_size': self.MIN_TEMPLATE_SIZE,
+            'alpha': [self.ALPHA_MASK_THRESHOLD, self.MASK_OPAQUE_RATIO],
+            'pyramid': [self.PYRAMID_FACTORS, self.PYRAMID_MIN_COARSE_SIZE, self.PYRAMID_MIN_COARSE_PIXELS,
+                        self.PYRAMID_MASK_COVERAGE, self.PYRAMID_MASK_DILATE],
+            'thumb': [self.PREFILTER_THUMB_FACTORS, self.PREFILTER_THUMB_MIN_SIZE, self.PREFILTER_THUMB_MIN_PIXELS],
+            'color_bins': self.PREFILTER_COLOR_BINS
+        }, sort_keys=True)
+    
+    @staticmethod
+    def _entry_to_arrays(entry):
+        """
+        将模板数据拆分为数组和元数据，用于写入编译缓存
+        
+        Args:
+            entry: 模板数据
+            
+        Returns:
+            tuple: ({名称: 数组}, 元数据)
+        """
+        arrays = {'image': entry.image, 'processed': entry.processed}
+        for name, array in (('mask', entry.mask), ('processed_mask', entry.processed_mask),
+                            ('color_hist', entry.color_hist)):
+            if array is not None:
+                arrays[name] = array
+        
+        groups = {
+            'scaled': entry.scaled,
+            'coarse': [(scale, t, m) for scale, (t, m) in entry.coarse.items()],
+            'thumb': [(scale, t, m) for scale, (t, m) in entry.thumbs.items()]
+        }
+        meta = {
+            'base_scale': entry.base_scale,
+            'min_area': entry.min_area,
+            'pyramid_factor': entry.pyramid_factor,
+            'thumb_factor': entry.thumb_factor,
+            'groups': {group: [scale for scale, _, _ in variants] for group, variants in groups.items()}
+        }
+        for group, variants in groups.items():
+            for i, (_, template, mask) in enumerate(variants):
+                arrays[f"{group}_{i}"] = template
+                if mask is not None:
+                    arrays[f"{group}_mask_{i}"] = mask
+        
+        return arrays, meta
+    
+    @staticmethod
+    def _entry_from_arrays(name, arrays, meta):
+        """
+        从编译缓存的数组和元数据恢复模板数据
+        
+        Args:
+            name: 模板名称
+            arrays: {名称: 数组}（只读内存映射）
+            meta: 元数据
+            
+        Returns:
+            TemplateData: 模板数据
+        """
+        entry = TemplateData(name, arrays['image'], arrays.get('mask'))
+        entry.base_scale = meta['base_scale']
+        entry.processed = arrays['processed']
+        entry.processed_mask = arrays.get('processed_mask')
+        entry.color_hist = arrays.get('color_hist')
+        entry.min_area = meta['min_area']
+        entry.pyramid_factor = meta['pyramid_factor']
+        entry.thumb_factor = meta['thumb_factor']
+        
+        groups = {
+            group: [(scale, arrays[f"{group}_{i}"], arrays.get(f"{group}_mask_{i}")) for i, scale in enumerate(scales)]
+            for group, scales in meta['groups'].items()
+        }
+        entry.scaled = groups['scaled']
+        entry.coarse = {scale: (t, m) for scale, t, m in groups['coarse']}
+        entry.thumbs = {scale: (t, m) for scale, t, m in groups['thumb']}
+        return entry
+    
+    def _split_alpha(self, image):
+        """
+        拆分模板的颜色和alpha通道
+        
+        Args:
+            image: cv2.IMREAD_UNCHANGED读取的图像（灰度、BGR或BGRA）
+            
+        带透明像素的模板裁剪到不透明区域的外接矩形（匹配位置为不透明内容的中心），
+        裁剪后几乎完全不透明的模板不使用掩码，走更快的无掩码匹配
+        
+        Returns:
+            tuple: (BGR或灰度图像, 掩码)，没有透明像素时掩码为None
+        """
+        if image.dtype != np.uint8:
+            image = cv2.convertScaleAbs(image, alpha=255.0 / np.iinfo(image.dtype).max)
+        
+        if len(image.shape) == 3 and image.shape[2] == 4:
+            mask = np.where(image[:, :, 3] >= self.ALPHA_MASK_THRESHOLD, 255, 0).astype(np.uint8)
+            image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+            opaque = cv2.countNonZero(mask)
+            if opaque == 0:
+                return image, mask
+            
+            left, top, width, height = cv2.boundingRect(mask)
+            image = image[top:top + height, left:left + width].copy()
+            mask = mask[top:top + height, left:left + width].copy()
+            if opaque >= mask.size * self.MASK_OPAQUE_RATIO:
+                mask = None
+            return image, mask
+        
+        return image, None
+    
+    def _build_template_data(self, name, template, mask=None):
+        """
+        生成模板的预处理结果和多尺度变体
+        
+        Args:
+            name: 模板名称
+            template: 模板原图
+            mask: 模板掩码，None表示所有像素都有效
+            
+        Returns:
+            TemplateData: 模板数据
+        """
+        entry = TemplateData(name, template, mask)
+        base, base_mask = template, mask
+        
+        if self.ui_scale is not None:
+            # 已校准：模板预先缩放到UI比例，不再生成其他缩放变体
+            entry.base_scale = self.ui_scale
+            if abs(self.ui_scale - 1.0) > 1e-3:
+                size = (max(1, int(round(template.shape[1] * self.ui_scale))),
+                        max(1, int(round(template.shape[0] * self.ui_scale))))
+                interpolation = cv2.INTER_AREA if self.ui_scale < 1.0 else cv2.INTER_CUBIC
+                base = cv2.resize(template, size, interpolation=interpolation)
+                base_mask = self._resize_mask(mask, size)
+            scales = []
+        else:
+            scales = self.MULTI_SCALES
+        
+        entry.processed = self._preprocess_image(base)
+        entry.processed_mask = base_mask
+        
+        for scale in scales:
+            new_width = int(template.shape[1] * scale)
+            new_height = int(template.shape[0] * scale)
+            
+            # 跳过过小的尺寸（过大的尺寸取决于截图，在匹配时判断）
+            if new_width < self.MIN_TEMPLATE_SIZE or new_height < self.MIN_TEMPLATE_SIZE:
+                continue
+            
+            scaled_template = cv2.resize(template, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
+            scaled_mask = self._resize_mask(mask, (new_width, new_height))
+            entry.scaled.append((scale, self._preprocess_image(scaled_template), scaled_mask))
+        
+        self._precompute_spectra(entry)
+        
+        # 预过滤签名
+        self._build_prefilter_signatures(entry)
+        
+        # 金字塔粗搜索用的降采样模板
+        entry.pyramid_factor, entry.coarse = self._build_downscaled_variants(
+            entry, self.PYRAMID_FACTORS, self.PYRAMID_MIN_COARSE_SIZE, self.PYRAMID_MIN_COARSE_PIXELS, coarse_mask=True
+        )
+        
+        return entry
+    
+    def _precompute_spectra(self, entry):
+        """
+        已知截图尺寸时，预先计算全帧搜索所需的模板频谱
+        
+        Args:
+            entry: 模板数据
+        """
+        if self._last_frame_shape is None:
+            return
+        for scale, processed, variant_mask in entry.variants():
+            if self._should_use_fft(self._last_frame_shape, processed.shape):
+                self._template_spectrum(processed, variant_mask, self._fft_shape(self._last_frame_shape),
+                                        entry.spectrum_cache(scale))
+    
+    def _build_prefilter_signatures(self, entry):
+        """
+        生成模板的预过滤签名：颜色直方图、最小有效面积和缩略图
+        
+        Args:
+            entry: 已生成预处理变体的模板数据
+        """
+        entry.min_area = min(
+            cv2.countNonZero(mask) if mask is not None else t.shape[0] * t.shape[1]
+            for _, t, mask in entry.variants()
+        )
+        
+        if len(entry.image.shape) == 3:
+            bins = self.PREFILTER_COLOR_BINS
+            hist = cv2.calcHist([entry.image], [0, 1, 2], entry.mask, [bins] * 3, [0, 256] * 3)
+            entry.color_hist = hist / max(float(hist.sum()), 1.0)
+        
+        entry.thumb_factor, entry.thumbs = self._build_downscaled_variants(
+            entry, self.PREFILTER_THUMB_FACTORS, self.PREFILTER_THUMB_MIN_SIZE, self.PREFILTER_THUMB_MIN_PIXELS
+        )
+    
+    def _build_downscaled_variants(self, entry, factors, min_size, min_pixels, coarse_mask=False):
+        """
+        按最粗的可用倍数生成所有变体的降采样模板
+        
+        所有变体降采样后的边长和有效像素数都满足要求时才使用该倍数，
+        否则尝试下一个更细的倍数
+        
+        Args:
+            entry: 模板数据
+            factors: 可选的降采样倍数，从粗到细
+            min_size: 降采样模板的最小边长
+            min_pixels: 降采样模板的最少有效像素数
+            coarse_mask: 是否使用膨胀后的粗层级掩码（见_coarse_mask）
+            
+        Returns:
+            tuple: (factor, {scale: (降采样模板, 掩码)})，都不满足时为 (1, {})
+        """
+        for factor in factors:
+            downscaled = {}
+            for scale, processed, variant_mask in entry.variants():
+                small = self._downscale(processed, factor)
+                size = (small.shape[1], small.shape[0])
+                small_mask = self._coarse_mask(variant_mask, size) if coarse_mask else self._resize_mask(variant_mask, size)
+                pixels = cv2.countNonZero(small_mask) if small_mask is not None else small.size
+                if min(small.shape[:2]) < min_size or pixels < min_pixels:
+                    break
+                downscaled[scale] = (small, small_mask)
+            else:
+                return factor, downscaled
+        return 1, {}
+    
+    def _coarse_mask(self, mask, size):
+        """
+        生成粗层级掩码
+        
+        细线条的透明模板按0.5重新二值化后大部分笔画会消失，粗层级改为保留
+        被笔画部分覆盖的像素并膨胀一圈，只用于定位候选，精修时仍使用原掩码；
+        膨胀后几乎不透明时不再使用掩码（不带掩码的匹配更快）
+        
+        Args:
+            mask: 掩码，None表示无掩码
+            size: 目标尺寸 (width, height)
+            
+        Returns:
+            numpy.ndarray: 粗层级掩码，无需掩码时返回None
+        """
+        if mask is None:
+            return None
+        resized = cv2.resize(mask, size, interpolation=cv2.INTER_AREA)
+        coarse = np.where(resized >= self.PYRAMID_MASK_COVERAGE, 255, 0).astype(np.uint8)
+        if self.PYRAMID_MASK_DILATE:
+            coarse = cv2.dilate(coarse, np.ones((3, 3), np.uint8), iterations=self.PYRAMID_MASK_DILATE)
+        if cv2.countNonZero(coarse) >= coarse.size * self.MASK_OPAQUE_RATIO:
+            return None
+        return coarse
+    
+    @staticmethod
+    def _resize_mask(mask, size):
+        """
+        缩放掩码并重新二值化
+        
+        Args:
+            mask: 掩码，None表示无掩码
+            size: 目标尺寸 (width, height)
+            
+        Returns:
+            numpy.ndarray: 缩放后的掩码，输入为None时返回None
+        """
+        if mask is None:
+            return None
+        resized = cv2.resize(mask, size, interpolation=cv2.INTER_LINEAR)
+        return np.where(resized >= 128, 255, 0).astype(np.uint8)
+    
+    @staticmethod
+    def _downscale(image, factor):
+        """
+        按整数倍降采样图像
+        
+        Args:
+            image: 输入图像
+            factor: 降采样倍数
+            
+        Returns:
+            numpy.ndarray: 降采样后的图像
+        """
+        height, width = image.shape[:2]
+        return cv2.resize(image, (max(1, width // factor), max(1, height // factor)), interpolation=cv2.INTER_AREA)
+    
+    @staticmethod
+    def _frame_image(screenshot):
+        """
+        取出截图的图像数据，兼容Frame对象和numpy数组
+        
+        Args:
+            screenshot: numpy数组或Frame
+            
+        Returns:
+            numpy.ndarray: 图像
+        """
+        return screenshot.image if isinstance(screenshot, Frame) else screenshot
+    
+    def _get_processed_frame(self, screenshot, factor=1):
+        """
+        获取截图的预处理结果，同一帧的每个层级只计算一次
+        
+        缓存以截图对象的身份为键，调用方不应原地修改已传入的截图
+        
+        Args:
+            screenshot: 截图
+            factor: 降采样倍数，1为原分辨率
+            
+        Returns:
+            numpy.ndarray: 预处理后的截图
+        """
+        with self._frame_lock:
+            if self._cached_frame is not screenshot:
+                self._cached_levels = {1: self._preprocess_image(screenshot)}
+                self._cached_spectra = {}
+                self._cached_signatures = {}
+                self._cached_frame = screenshot
+                self._last_frame_shape = self._cached_levels[1].shape
+            if factor not in self._cached_levels:
+                self._cached_levels[factor] = self._downscale(self._cached_levels[1], factor)
+            return self._cached_levels[factor]
+    
+    def calibrate(self, screenshot, anchor_name):
+        """
+        根据锚点模板确定当前窗口的UI缩放比例
+        
+        先按CALIBRATION_SCALES粗扫描（模板足够大时在半分辨率上进行），
+        再在最佳比例附近按CALIBRATION_REFINE_STEP在原分辨率上精修
+        
+        Args:
+            screenshot: 截图，锚点需要在画面中可见
+            anchor_name: 锚点模板名称
+            
+        Returns:
+            tuple: (success, scale, confidence)
+        """
+        screenshot = self._frame_image(screenshot)
+        if anchor_name not in self.templates:
+            logger.error("Calibration anchor not loaded: %s", anchor_name)
+            return False, None, 0.0
+        
+        entry = self.templates[anchor_name]
+        
+        try:
+            # 1. 粗扫描
+            min_side = min(entry.image.shape[:2]) * min(self.CALIBRATION_SCALES)
+            factor = 2 if min_side / 2 >= self.MIN_TEMPLATE_SIZE else 1
+            coarse_frame = self._get_processed_frame(screenshot, factor)
+            coarse_scores = {
+                scale: self._calibration_score(coarse_frame, entry, scale / factor)
+                for scale in self.CALIBRATION_SCALES
+            }
+            best_scale = max(coarse_scores, key=coarse_scores.get)
+            
+            # 2. 在最佳比例附近精修
+            processed_screenshot = self._get_processed_frame(screenshot)
+            coarse_step = self.CALIBRATION_SCALES[1] - self.CALIBRATION_SCALES[0]
+            steps = int(round(coarse_step / self.CALIBRATION_REFINE_STEP))
+            best_confidence = -1.0
+            for i in range(-steps + 1, steps):
+                scale = round(best_scale + i * self.CALIBRATION_REFINE_STEP, 3)
+                confidence = self._calibration_score(processed_screenshot, entry, scale)
+                if confidence > best_confidence:
+                    best_confidence = confidence
+                    best_scale = scale
+            
+            success = best_confidence >= self.CALIBRATION_MIN_CONFIDENCE
+            logger.log('OK' if success else 'WARN', "Calibration with %s: scale %.2f, confidence %.3f",
+                       anchor_name, best_scale, best_confidence)
+            return success, best_scale, best_confidence
+            
+        except Exception as e:
+            logger.error("Calibration failed: %s", e)
+            return False, None, 0.0
+    
+    def _calibration_score(self, processed_screenshot, entry, scale):
+        """
+        计算锚点模板在指定缩放比例下的最佳匹配得分
+        
+        Args:
+            processed_screenshot: 预处理后的截图（可以是降采样层级）
+            entry: 锚点模板数据
+            scale: 模板原图的缩放比例
+            
+        Returns:
+            float: 最佳匹配得分，尺寸不合法时为-1
+        """
+        width = int(round(entry.image.shape[1] * scale))
+        height = int(round(entry.image.shape[0] * scale))
+        if (width < self.MIN_TEMPLATE_SIZE or height < self.MIN_TEMPLATE_SIZE or
+                width > processed_screenshot.shape[1] or height > processed_screenshot.shape[0]):
+            return -1.0
+        
+        interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+        template = self._preprocess_image(cv2.resize(entry.image, (width, height), interpolation=interpolation))
+        mask = self._resize_mask(entry.mask, (width, height))
+        result = self._correlate(processed_screenshot, template, mask)
+        return float(cv2.minMaxLoc(result)[1])
+    
+    def set_ui_scale(self, scale):
+        """
+        设置UI缩放比例，并按该比例重建所有已加载的模板
+        
+        设置后每个模板只保留一个预先缩放的变体，匹配时不再尝试其他缩放比例
+        
+        Args:
+            scale: 校准得到的缩放比例，None表示恢复未校准的多尺度搜索
+        """
+        self.ui_scale = None if scale is None else float(scale)
+        
+        for name, entry in list(self.templates.items()):
+            rebuilt = None
+            if entry.source_path is not None:
+                rebuilt = self._load_compiled_template(name, entry.source_path)
+            if rebuilt is None:
+                rebuilt = self._build_template_data(name, entry.image, entry.mask)
+            # 搜索区域以截图比例或像素坐标表示，与模板缩放无关，直接沿用
+            rebuilt.search_region = entry.search_region
+            rebuilt.hit_box = entry.hit_box
+            rebuilt.hit_frame_shape = entry.hit_frame_shape
+            self.templates[name] = rebuilt
+        
+        if self.ui_scale is None:
+            logger.info("UI scale cleared, %s templates use multi-scale search", len(self.templates))
+        else:
+            logger.ok("UI scale set to %.2f, %s templates rebuilt", self.ui_scale, len(self.templates))
+    
+    def match_template(self, screenshot, template_name, threshold=0.8, mode=None):
+        """
+        在截图中查找模板（支持多尺度匹配和图像预处理优化）
+        
+        Args:
+            screenshot: 截图（numpy数组或Frame）
+            template_name: 模板名称
+            threshold: 匹配阈值（0-1）
+            mode: 搜索模式 'exhaustive' 或 'pyramid'，默认使用 self.search_mode
+            
+        Returns:
+            MatchResult: 可解包为 (found, position, confidence)
+                found: bool - 是否找到
+                position: tuple - (x, y) 中心点坐标
+                confidence: float - 匹配置信度
+            并带有结果所在帧的frame_id和timestamp（传入numpy数组时frame_id为None，timestamp为调用时间）
+        """
+        frame_id, timestamp = self._frame_stamp(screenshot)
+        found, position, confidence = self._match_template(self._frame_image(screenshot), template_name, threshold, mode)
+        return MatchResult(found, position, confidence, frame_id, timestamp, template_name)
+    
+    def _match_template(self, screenshot, template_name, threshold, mode):
+        """
+        在截图中查找模板（match_template的实现，返回不带帧信息的结果）
+        
+        Args:
+            screenshot: 截图
+            template_name: 模板名称
+            threshold: 匹配阈值
+            mode: 搜索模式
+            
+        Returns:
+            tuple: (found, position, confidence)
+        """
+        if template_name not in self.templates:
+            print(f"[ERROR] Template not loaded: {template_name}")
+            return False, None, 0.0
+            
+        entry = self.templates[template_name]
+        frame_shape = self._get_processed_frame(screenshot).shape
+        
+        # 动态调整阈值 - 游戏界面识别建议使用更低的阈值
+        adjusted_threshold = self._adjusted_threshold(threshold)
+        logger.debug("Adjusted threshold from %.2f to %.2f for better game UI recognition", threshold, adjusted_threshold)
+        
+        # 优先只搜索模板的搜索区域（声明的或从历史命中学习的）
+        region = self._get_search_region(entry, frame_shape)
+        if region is not None:
+            found, position, confidence = self._search(screenshot, entry, adjusted_threshold, mode, region)
+            if found:
+                entry.region_misses = 0
+                self._record_hit(entry, position, frame_shape)
+                return True, position, confidence
+            
+            # 连续多次未命中时回退到全帧搜索，防止界面布局变化后一直找不到
+            entry.region_misses += 1
+            if entry.region_misses < self.REGION_MAX_MISSES:
+                return False, position, confidence
+            
+            logger.info("%d consecutive misses in search region %s, falling back to full frame: %s",
+                        entry.region_misses, region, template_name, interval=5)
+            entry.region_misses = 0
+        
+        found, position, confidence = self._search(screenshot, entry, adjusted_threshold, mode)
+        if found:
+            self._record_hit(entry, position, frame_shape)
+        return found, position, confidence
+    
+    @staticmethod
+    def _adjusted_threshold(threshold):
+        """游戏界面识别使用的实际阈值：降低10%，但不低于60%"""
+        return max(0.6, threshold - 0.1)
+    
+    @staticmethod
+    def _frame_stamp(screenshot):
+        """
+        取出截图的帧序号和截图时间
+        
+        Args:
+            screenshot: numpy数组或Frame
+            
+        Returns:
+            tuple: (frame_id, timestamp)，numpy数组没有帧信息，取 (None, 当前时间)
+        """
+        if isinstance(screenshot, Frame):
+            return screenshot.frame_id, screenshot.captured_at
+        return None, time.monotonic()
+    
+    def reverify(self, screenshot, result, threshold=0.8):
+        """
+        在新的截图中重新验证一个（可能已过期的）匹配结果
+        
+        只在上次命中框外扩REVERIFY_MARGIN的小区域内做全分辨率匹配，代价远低于完整识别；
+        上次未找到的结果无法缩小范围，按完整匹配处理
+        
+        Args:
+            screenshot: 新的截图（numpy数组或Frame）
+            result: 之前的MatchResult
+            threshold: 匹配阈值（0-1）
+            
+        Returns:
+            MatchResult: 新截图中的结果
+        """
+        name = result.template
+        entry = self.templates.get(name)
+        if entry is None or not result.found:
+            return self.match_template(screenshot, name, threshold)
+        
+        frame_id, timestamp = self._frame_stamp(screenshot)
+        image = self._frame_image(screenshot)
+        frame_height, frame_width = image.shape[:2]
+        
+        left, top, right, bottom = self.get_template_area(name, image.shape, result.position)
+        margin = self.REVERIFY_MARGIN
+        region = (max(0, left - margin), max(0, top - margin),
+                  min(frame_width, right + margin), min(frame_height, bottom + margin))
+        if region[2] <= region[0] or region[3] <= region[1]:
+            return MatchResult(False, None, 0.0, frame_id, timestamp, name)
+        
+        found, position, confidence = self._search(image, entry, self._adjusted_threshold(threshold), 'exhaustive', region)
+        return MatchResult(found, position, confidence, frame_id, timestamp, name)
+    
+    def set_search_region(self, template_name, region):
+        """
+        设置模板的搜索区域
+        
+        Args:
+            template_name: 模板名称
+            region: (x, y, width, height)，取值为相对于截图宽高的比例（0-1），None表示清除
+            
+        Returns:
+            bool: 是否设置成功
+        """
+        if template_name not in self.templates:
+            print(f"[ERROR] Template not loaded: {template_name}")
+            return False
+        
+        if region is not None:
+            if len(region) != 4 or not all(0.0 <= float(v) <= 1.0 for v in region):
+                logger.error("Invalid search region for %s: %s", template_name, region)
+                return False
+            region = tuple(float(v) for v in region)
+        
+        self.templates[template_name].search_region = region
+        self.templates[template_name].region_misses = 0
+        return True
+    
+    def _get_search_region(self, entry, frame_shape):
+        """
+        计算模板在当前截图中的搜索区域
+        
+        声明的搜索区域优先；否则在开启学习时使用历史命中的包围盒加边距
+        
+        Args:
+            entry: 模板数据
+            frame_shape: 截图尺寸
+            
+        Returns:
+            tuple: (left, top, right, bottom) 像素坐标，None表示搜索全帧
+        """
+        frame_height, frame_width = frame_shape[:2]
+        # 搜索区域至少要容纳最大的模板变体
+        max_height = max(t.shape[0] for _, t, _ in entry.variants())
+        max_width = max(t.shape[1] for _, t, _ in entry.variants())
+        
+        if entry.search_region is not None:
+            x, y, width, height = entry.search_region
+            left = int(x * frame_width)
+            top = int(y * frame_height)
+            right = int((x + width) * frame_width)
+            bottom = int((y + height) * frame_height)
+        elif self.learn_search_regions and entry.hit_box is not None and entry.hit_frame_shape == frame_shape[:2]:
+            min_x, min_y, max_x, max_y = entry.hit_box
+            margin = self.LEARNED_REGION_MARGIN
+            left = min_x - max_width // 2 - margin
+            top = min_y - max_height // 2 - margin
+            right = max_x + max_width // 2 + margin
+            bottom = max_y + max_height // 2 + margin
+        else:
+            return None
+        
+        # 区域过小时以中心向外扩展，并限制在截图范围内
+        if right - left < max_width:
+            center = (left + right) // 2
+            left, right = center - max_width // 2 - 1, center + max_width // 2 + 1
+        if bottom - top < max_height:
+            center = (top + bottom) // 2
+            top, bottom = center - max_height // 2 - 1, center + max_height // 2 + 1
+        left, top = max(0, left), max(0, top)
+        right, bottom = min(frame_width, right), min(frame_height, bottom)
+        
+        if left == 0 and top == 0 and right == frame_width and bottom == frame_height:
+            return None
+        return left, top, right, bottom
+    
+    def get_template_area(self, template_name, frame_shape, position=None):
+        """
+        获取模板结果所依赖的画面区域，用于判断画面局部变化后上次的结果是否仍然有效
+        
+        找到的模板取命中位置处最大变体的外接框；未找到的模板取当前的搜索区域
+        
+        Args:
+            template_name: 模板名称
+            frame_shape: 截图尺寸
+            position: 上次命中的中心点，None表示上次未找到
+            
+        Returns:
+            tuple: (left, top, right, bottom) 像素坐标，None表示依赖整帧
+        """
+        entry = self.templates.get(template_name)
+        if entry is None:
+            return None
+        
+        if position is None:
+            return self._get_search_region(entry, frame_shape)
+        
+        max_height = max(t.shape[0] for _, t, _ in entry.variants())
+        max_width = max(t.shape[1] for _, t, _ in entry.variants())
+        x, y = position
+        return (x - max_width // 2 - 1, y - max_height // 2 - 1,
+                x + max_width // 2 + 1, y + max_height // 2 + 1)
+    
+    @staticmethod
+    def _record_hit(entry, position, frame_shape):
+        """
+        记录一次命中，更新学习到的搜索区域
+        
+        Args:
+            entry: 模板数据
+            position: 命中的中心点坐标
+            frame_shape: 截图尺寸
+        """
+        x, y = position
+        if entry.hit_box is None or entry.hit_frame_shape != frame_shape[:2]:
+            entry.hit_box = (x, y, x, y)
+            entry.hit_frame_shape = frame_shape[:2]
+        else:
+            min_x, min_y, max_x, max_y = entry.hit_box
+            entry.hit_box = (min(min_x, x), min(min_y, y), max(max_x, x), max(max_y, y))
+    
+    def _search(self, screenshot, entry, threshold, mode=None, region=None):
+        """
+        在截图（或其中的区域）内搜索模板
+        
+        Args:
+            screenshot: 截图
+            entry: 模板数据
+            threshold: 匹配阈值
+            mode: 搜索模式
+            region: (left, top, right, bottom) 搜索区域，None表示全帧
+            
+        Returns:
+            tuple: (found, position, confidence)，坐标相对于整个截图
+        """
+        pyramid = (mode or self.search_mode) == 'pyramid' and entry.pyramid_factor > 1
+        
+        # 廉价签名判定模板不可能出现时，跳过完整匹配
+        # 金字塔搜索本身就是粗层级筛选，不再重复做缩略图检查
+        if self.prefilter and self._prefilter_reject(screenshot, entry, threshold, region, thumbnail=not pyramid):
+            return False, None, 0.0
+        
+        # 粗到精搜索：先在降采样层级上定位候选，再在原分辨率的小区域内精修
+        if pyramid:
+            return self._match_pyramid(screenshot, entry, threshold, region)
+        
+        processed_screenshot = self._get_processed_frame(screenshot)
+        left, top = 0, 0
+        if region is not None:
+            left, top, right, bottom = region
+            processed_screenshot = processed_screenshot[top:bottom, left:right]
+        
+        found, position, confidence = self._match_exhaustive(processed_screenshot, entry, threshold)
+        if position is not None:
+            position = (position[0] + left, position[1] + top)
+        return found, position, confidence
+    
+    def _prefilter_reject(self, screenshot, entry, threshold, region=None, thumbnail=True):
+        """
+        级联预过滤，按代价从低到高依次检查，任一阶段判定不可能匹配即排除
+        
+        各阶段只在确定模板不可能出现时排除，宁可放过也不误排：
+        stats - 搜索区域为纯色画面
+        color - 模板的颜色在搜索区域中不足（允许相邻颜色分箱的偏差）
+        thumbnail - 缩略图上所有尺度的相关得分都远低于阈值
+        
+        Args:
+            screenshot: 截图
+            entry: 模板数据
+            threshold: 匹配阈值
+            region: (left, top, right, bottom) 搜索区域，None表示全帧
+            thumbnail: 是否执行缩略图检查
+            
+        Returns:
+            bool: 是否排除该模板
+        """
+        for stage in self.PREFILTER_STAGES:
+            if stage == 'color' and (entry.color_hist is None or len(screenshot.shape) != 3):
+                continue
+            if stage == 'thumbnail' and (not thumbnail or entry.thumb_factor == 1):
+                continue
+            
+            start_time = time.perf_counter()
+            if stage == 'stats':
+                rejected = self._frame_signature(screenshot, 'std', region) < self.PREFILTER_MIN_STD
+            elif stage == 'color':
+                rejected = self._color_containment(screenshot, entry, region) < self.PREFILTER_MIN_COLOR_CONTAINMENT
+            else:
+                rejected = self._thumbnail_score(screenshot, entry, region) < threshold - self.PREFILTER_THUMB_MARGIN
+            elapsed = time.perf_counter() - start_time
+            
+            with self._prefilter_lock:
+                stats = self._prefilter_stats[stage]
+                stats[0] += 1
+                stats[1] += int(rejected)
+                stats[2] += elapsed
+            
+            if rejected:
+                return True
+        return False
+    
+    def _frame_signature(self, screenshot, kind, region=None):
+        """
+        获取当前帧（或其区域）的预过滤签名，同一帧同一区域只计算一次
+        
+        Args:
+            screenshot: 截图
+            kind: 'std' 灰度标准差，'color' 颜色直方图（按相邻分箱累加）
+            region: (left, top, right, bottom) 搜索区域，None表示全帧
+            
+        Returns:
+            float或numpy.ndarray: 签名
+        """
+        processed_screenshot = self._get_processed_frame(screenshot)
+        # 识别线程和脚本线程可能同时处理不同的帧，缓存键带上帧的身份，缓存值持有帧的引用
+        key = (id(screenshot), kind, region)
+        with self._frame_lock:
+            cached = self._cached_signatures.get(key)
+        if cached is not None and cached[0] is screenshot:
+            return cached[1]
+        
+        left, top, right, bottom = region if region is not None else (0, 0, screenshot.shape[1], screenshot.shape[0])
+        if kind == 'std':
+            signature = float(cv2.meanStdDev(processed_screenshot[top:bottom, left:right])[1][0, 0])
+        else:
+            bins = self.PREFILTER_COLOR_BINS
+            hist = cv2.calcHist([screenshot[top:bottom, left:right]], [0, 1, 2], None, [bins] * 3, [0, 256] * 3)
+            # 每个分箱累加相邻分箱的像素数，容忍模板与画面之间的轻微色偏
+            padded = np.pad(hist, 1)
+            signature = sum(
+                padded[i:i + bins, j:j + bins, k:k + bins]
+                for i in range(3) for j in range(3) for k in range(3)
+            )
+        
+        with self._frame_lock:
+            self._cached_signatures[key] = (screenshot, signature)
+        return signature
+    
+    def _color_containment(self, screenshot, entry, region=None):
+        """
+        计算模板颜色在搜索区域中的覆盖率
+        
+        模板出现时，其每个颜色分箱在画面中至少有对应数量的像素；
+        像素数按最小变体的面积估计，因此与缩放比例无关
+        
+        Args:
+            screenshot: 截图
+            entry: 模板数据
+            region: (left, top, right, bottom) 搜索区域，None表示全帧
+            
+        Returns:
+            float: 覆盖率（0-1）
+        """
+        frame_hist = self._frame_signature(screenshot, 'color', region)
+        available = frame_hist / max(entry.min_area, 1)
+        return float(np.minimum(entry.color_hist, available).sum())
     
-    def match_template(self, screenshot, template_name, threshold=0.8):
+    def _thumbnail_score(self, screenshot, entry, region=None):
         """
-        在截图中查找模板（支持多尺度匹配和图像预处理优化）
+        在缩略图层级上计算所有尺度变体的最佳相关得分
         
         Args:
-            screenshot: 截图（numpy数组）
-            template_name: 模板名称
-            threshold: 匹配阈值（0-1）
+            screenshot: 截图
+            entry: 模板数据
+            region: (left, top, right, bottom) 搜索区域，None表示全帧
             
         Returns:
-            tuple: (found, position, confidence)
-                found: bool - 是否找到
-                position: tuple - (x, y) 中心点坐标
-                confidence: float - 匹配置信度
+            float: 最佳得分，没有可匹配的变体时为-1
         """
-        if template_name not in self.templates:
-            print(f"[ERROR] Template not loaded: {template_name}")
-            return False, None, 0.0
-            
-        template = self.templates[template_name]
+        factor = entry.thumb_factor
+        thumb_screenshot = self._get_processed_frame(screenshot, factor)
+        if region is not None:
+            left, top, right, bottom = region
+            thumb_screenshot = thumb_screenshot[top // factor:-(-bottom // factor), left // factor:-(-right // factor)]
         
-        # 动态调整阈值 - 游戏界面识别建议使用更低的阈值
-        adjusted_threshold = max(0.6, threshold - 0.1)  # 降低10%，但不低于60%
-        print(f"[INFO] Adjusted threshold from {threshold:.2f} to {adjusted_threshold:.2f} for better game UI recognition")
+        best_score = -1.0
+        for thumb, mask in entry.thumbs.values():
+            if thumb.shape[0] > thumb_screenshot.shape[0] or thumb.shape[1] > thumb_screenshot.shape[1]:
+                continue
+            result = self._correlate(thumb_screenshot, thumb, mask)
+            best_score = max(best_score, float(cv2.minMaxLoc(result)[1]))
+        return best_score
+    
+    def get_prefilter_stats(self):
+        """
+        获取预过滤各阶段的统计
+        
+        Returns:
+            dict: {stage: {'checked', 'rejected', 'reject_rate', 'avg_ms'}}
+        """
+        with self._prefilter_lock:
+            return {
+                stage: {
+                    'checked': checked,
+                    'rejected': rejected,
+                    'reject_rate': rejected / checked if checked else 0.0,
+                    'avg_ms': seconds * 1000 / checked if checked else 0.0
+                }
+                for stage, (checked, rejected, seconds) in self._prefilter_stats.items()
+            }
+    
+    def reset_prefilter_stats(self):
+        """重置预过滤统计"""
+        with self._prefilter_lock:
+            self._prefilter_stats = {stage: [0, 0, 0.0] for stage in self.PREFILTER_STAGES}
+    
+    def _match_exhaustive(self, processed_screenshot, entry, threshold):
+        """
+        全分辨率多尺度搜索
         
+        Args:
+            processed_screenshot: 预处理后的截图（或其中的区域）
+            entry: 模板数据
+            threshold: 匹配阈值
+            
+        Returns:
+            tuple: (found, position, confidence)，坐标相对于processed_screenshot
+        """
         # 首先尝试原始尺寸匹配
-        found, position, confidence = self._match_single_scale_enhanced(screenshot, template, adjusted_threshold)
+        found, position, confidence = self._match_single_scale_enhanced(
+            processed_screenshot, entry.processed, threshold, entry.processed_mask, entry.spectrum_cache(1.0)
+        )
         if found:
-            print(f"[OK] Match found at original scale: {template_name} at {position}, confidence: {confidence:.3f}")
+            logger.debug("Match found at original scale: %s at %s, confidence: %.3f", entry.name, position, confidence)
             return True, position, confidence
         
-        print(f"[INFO] Original scale failed (confidence: {confidence:.3f}), trying enhanced multi-scale matching...")
+        # 已校准的模板只有一个尺度
+        if not entry.scaled:
+            return False, position, confidence
+        
+        logger.debug("Original scale failed (confidence: %.3f), trying enhanced multi-scale matching...", confidence)
         
-        # 优化的多尺度匹配 - 针对游戏界面优化
-        scales = [0.8, 0.9, 1.1, 1.2, 0.7, 1.3, 0.6, 1.4, 0.5, 1.5]  # 重新排序，优先尝试接近原始尺寸的缩放
+        # 优化的多尺度匹配 - 使用加载时预先生成的缩放变体
         best_confidence = confidence
         best_position = position
         best_scale = 1.0
         
-        for scale in scales:
+        for scale, scaled_template, scaled_mask in entry.scaled:
             try:
-                # 缩放模板
-                new_width = int(template.shape[1] * scale)
-                new_height = int(template.shape[0] * scale)
-                
-                # 跳过过大或过小的尺寸
-                if new_width < 15 or new_height < 15 or new_width > screenshot.shape[1] or new_height > screenshot.shape[0]:
+                # 跳过大于截图的尺寸
+                if scaled_template.shape[1] > processed_screenshot.shape[1] or scaled_template.shape[0] > processed_screenshot.shape[0]:
                     continue
                 
-                scaled_template = cv2.resize(template, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
-                found, position, confidence = self._match_single_scale_enhanced(screenshot, scaled_template, adjusted_threshold)
+                found, position, confidence = self._match_single_scale_enhanced(
+                    processed_screenshot, scaled_template, threshold, scaled_mask, entry.spectrum_cache(scale)
+                )
                 
-                print(f"[DEBUG] Scale {scale:.2f}: confidence={confidence:.3f}")
+                logger.debug("Scale %.2f: confidence=%.3f", scale, confidence)
                 
                 if found:
-                    print(f"[OK] Match found at scale {scale:.2f}: {template_name} at {position}, confidence: {confidence:.3f}")
+                    logger.debug("Match found at scale %.2f: %s at %s, confidence: %.3f", scale, entry.name, position, confidence)
                     return True, position, confidence
                 
                 # 记录最佳结果
@@ -147,33 +1315,218 @@ class ImageRecognition:
                     best_scale = scale
                     
             except Exception as e:
-                print(f"[WARN] Scale {scale:.2f} failed: {e}")
+                logger.warn("Scale %.2f failed: %s", scale, e, interval=5)
                 continue
         
-        # 如果多尺度匹配也失败，尝试更宽松的阈值
-        if best_confidence > 0.5:  # 如果最佳置信度超过50%，可能是阈值问题
-            relaxed_threshold = 0.5
-            print(f"[INFO] Trying relaxed threshold {relaxed_threshold:.2f} with best scale {best_scale:.2f}")
+        logger.debug("All matching attempts failed: %s, best confidence: %.3f at scale %.2f", entry.name, best_confidence, best_scale)
+        return False, best_position, best_confidence
+    
+    def match_many(self, screenshot, template_names, threshold=0.8, mode=None):
+        """
+        在同一截图中批量查找多个模板
+        
+        截图只预处理一次，各模板的匹配在线程池中并行执行
+        
+        Args:
+            screenshot: 截图（numpy数组或Frame）
+            template_names: 模板名称列表
+            threshold: 匹配阈值（0-1）
+            mode: 搜索模式，同match_template
             
+        Returns:
+            dict: {template_name: MatchResult}，顺序与template_names一致
+        """
+        frame_id, timestamp = self._frame_stamp(screenshot)
+        screenshot = self._frame_image(screenshot)
+        template_names = list(dict.fromkeys(template_names))
+        if not template_names:
+            return {}
+        
+        # 在分发任务前准备好共享的帧数据，避免各线程在缓存锁上排队等待
+        self._get_processed_frame(screenshot)
+        if (mode or self.search_mode) == 'pyramid':
+            factors = {self.templates[name].pyramid_factor for name in template_names if name in self.templates}
+            for factor in factors - {1}:
+                self._get_processed_frame(screenshot, factor)
+        
+        if len(template_names) == 1:
+            name = template_names[0]
+            found, position, confidence = self._match_template(screenshot, name, threshold, mode)
+            return {name: MatchResult(found, position, confidence, frame_id, timestamp, name)}
+        
+        executor = self._get_executor()
+        futures = {
+            name: executor.submit(self._match_template, screenshot, name, threshold, mode)
+            for name in template_names
+        }
+        
+        results = {}
+        for name, future in futures.items():
             try:
-                if best_scale != 1.0:
-                    new_width = int(template.shape[1] * best_scale)
-                    new_height = int(template.shape[0] * best_scale)
-                    scaled_template = cv2.resize(template, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
-                    found, position, confidence = self._match_single_scale_enhanced(screenshot, scaled_template, relaxed_threshold)
-                else:
-                    found, position, confidence = self._match_single_scale_enhanced(screenshot, template, relaxed_threshold)
+                found, position, confidence = future.result()
+            except Exception as e:
+                logger.error("Batch template matching failed: %s, %s", name, e, interval=5)
+                found, position, confidence = False, None, 0.0
+            results[name] = MatchResult(found, position, confidence, frame_id, timestamp, name)
+        return results
+    
+    def _get_executor(self):
+        """获取（必要时创建）批量匹配线程池"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="TemplateMatch"
+                )
+            return self._executor
+    
+    def shutdown(self):
+        """关闭批量匹配线程池"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+    
+    def _match_pyramid(self, screenshot, entry, threshold, region=None):
+        """
+        粗到精金字塔搜索
+        
+        在1/2或1/4分辨率上对所有尺度变体做一次匹配，收集候选峰值；
+        只对得分接近阈值的少数候选，在原分辨率的小区域内精修。
+        某个尺度的粗层级得分已达到阈值时立即精修，命中则不再搜索其余尺度
+        
+        Args:
+            screenshot: 截图
+            entry: 模板数据
+            threshold: 匹配阈值
+            region: (left, top, right, bottom) 搜索区域，None表示全帧
+            
+        Returns:
+            tuple: (found, position, confidence)，坐标相对于整个截图
+        """
+        factor = entry.pyramid_factor
+        processed_screenshot = self._get_processed_frame(screenshot)
+        coarse_screenshot = self._get_processed_frame(screenshot, factor)
+        
+        # 粗层级按降采样倍数对齐区域，精修时仍使用整帧坐标
+        coarse_left, coarse_top = 0, 0
+        frame_height, frame_width = processed_screenshot.shape[:2]
+        if region is not None:
+            left, top, right, bottom = region
+            coarse_left, coarse_top = left // factor, top // factor
+            coarse_screenshot = coarse_screenshot[coarse_top:bottom // factor, coarse_left:right // factor]
+            frame_width, frame_height = right - left, bottom - top
+        
+        # 1. 粗搜索 - 收集所有尺度的候选峰值
+        candidates = []
+        best_confidence = 0.0
+        best_position = None
+        for scale, processed_template, mask in entry.variants():
+            coarse_template, coarse_mask = entry.coarse[scale]
+            if (processed_template.shape[1] > frame_width or processed_template.shape[0] > frame_height
+                    or coarse_template.shape[1] > coarse_screenshot.shape[1]
+                    or coarse_template.shape[0] > coarse_screenshot.shape[0]):
+                continue
+            
+            result = self._correlate(coarse_screenshot, coarse_template, coarse_mask, entry.spectrum_cache(('coarse', scale)))
+            peaks = self._find_peaks(result, coarse_template.shape, self.PYRAMID_PEAKS_PER_SCALE)
+            for index, (score, (x, y)) in enumerate(peaks):
+                candidate = (score, (x + coarse_left) * factor, (y + coarse_top) * factor, scale, processed_template, mask)
+                if index > 0 or score < threshold:
+                    candidates.append(candidate)
+                    continue
                 
+                found, position, confidence = self._refine_pyramid_candidate(processed_screenshot, entry, candidate, factor, threshold)
                 if found:
-                    print(f"[OK] Match found with relaxed threshold: {template_name} at {position}, confidence: {confidence:.3f}")
                     return True, position, confidence
-            except Exception as e:
-                print(f"[WARN] Relaxed threshold matching failed: {e}")
+                if confidence > best_confidence:
+                    best_confidence, best_position = confidence, position
+        
+        if not candidates:
+            return False, best_position, best_confidence
+        
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        best_coarse = candidates[0][0]
+        
+        # 粗层级最佳得分都远低于阈值时直接判定未找到（模板不存在的常见情况）
+        candidates = [c for c in candidates if c[0] >= threshold - self.PYRAMID_COARSE_MARGIN]
+        if not candidates:
+            logger.debug("Pyramid coarse rejected: %s, best coarse confidence: %.3f", entry.name, best_coarse)
+            return False, best_position, max(best_confidence, best_coarse)
+        
+        # 2. 精修 - 在原分辨率上只搜索候选周围的小区域
+        for candidate in candidates[:self.PYRAMID_MAX_REFINE]:
+            found, position, confidence = self._refine_pyramid_candidate(processed_screenshot, entry, candidate, factor, threshold)
+            if found:
+                return True, position, confidence
+            
+            if confidence > best_confidence:
+                best_confidence = confidence
+                best_position = position
         
-        print(f"[WARN] All matching attempts failed: {template_name}, best confidence: {best_confidence:.3f} at scale {best_scale:.2f}")
-        print(f"[SUGGESTION] Consider lowering threshold below 0.5 or checking template image quality")
         return False, best_position, best_confidence
     
+    def _refine_pyramid_candidate(self, processed_screenshot, entry, candidate, factor, threshold):
+        """
+        在原分辨率上精修一个粗层级候选
+        
+        Args:
+            processed_screenshot: 预处理后的整帧截图
+            entry: 模板数据
+            candidate: (coarse_score, x, y, scale, processed_template, mask)，x/y为原分辨率左上角
+            factor: 降采样倍数
+            threshold: 匹配阈值
+            
+        Returns:
+            tuple: (found, position, confidence)，坐标相对于整个截图
+        """
+        coarse_score, x, y, scale, processed_template, mask = candidate
+        pad = factor * 2
+        full_height, full_width = processed_screenshot.shape[:2]
+        h, w = processed_template.shape[:2]
+        left = max(0, x - pad)
+        top = max(0, y - pad)
+        right = min(full_width, x + w + pad)
+        bottom = min(full_height, y + h + pad)
+        roi = processed_screenshot[top:bottom, left:right]
+        
+        found, position, confidence = self._match_single_scale_enhanced(
+            roi, processed_template, threshold, mask, entry.spectrum_cache(scale)
+        )
+        logger.debug("Pyramid refine scale %.2f: coarse=%.3f, fine=%.3f", scale, coarse_score, confidence)
+        
+        if position is not None:
+            position = (position[0] + left, position[1] + top)
+        if found:
+            logger.debug("Pyramid match found at scale %.2f: %s at %s, confidence: %.3f", scale, entry.name, position, confidence)
+        return found, position, confidence
+    
+    @staticmethod
+    def _find_peaks(result, template_shape, count):
+        """
+        在匹配结果图中查找若干个互不重叠的峰值
+        
+        Args:
+            result: matchTemplate的结果图（会被原地修改）
+            template_shape: 模板尺寸，用于抑制峰值邻域
+            count: 最多返回的峰值数
+            
+        Returns:
+            list: [(score, (x, y)), ...] 按得分降序排列，坐标为左上角
+        """
+        peaks = []
+        h, w = template_shape[:2]
+        for _ in range(count):
+            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            if not np.isfinite(max_val) or max_val <= -1.0:
+                break
+            peaks.append((float(max_val), max_loc))
+            
+            # 抑制该峰值附近半个模板范围内的结果，避免重复候选
+            x, y = max_loc
+            result[max(0, y - h // 2):y + h // 2 + 1, max(0, x - w // 2):x + w // 2 + 1] = -1.0
+        return peaks
+    
     def _match_single_scale(self, screenshot, template, threshold):
         """
         单一尺度的模板匹配
@@ -208,101 +1561,235 @@ class ImageRecognition:
                 center_x = match_top_left_x + w / 2.0
                 center_y = match_top_left_y + h / 2.0
                 
-                print(f"[DEBUG] 模板尺寸: {w}x{h}")
-                print(f"[DEBUG] 匹配区域左上角: ({match_top_left_x}, {match_top_left_y})")
-                print(f"[DEBUG] 计算的中心点: ({center_x}, {center_y})")
+                logger.debug("模板尺寸: %sx%s", w, h)
+                logger.debug("匹配区域左上角: (%s, %s)", match_top_left_x, match_top_left_y)
+                logger.debug("计算的中心点: (%s, %s)", center_x, center_y)
                 
                 return True, (int(center_x), int(center_y)), max_val
             else:
                 return False, None, max_val
                 
         except Exception as e:
-            print(f"[ERROR] Template matching failed: {e}")
+            logger.error("Template matching failed: %s", e, interval=5)
             return False, None, 0.0
 
-    def _match_single_scale_enhanced(self, screenshot, template, threshold):
+    def _match_single_scale_enhanced(self, processed_screenshot, processed_template, threshold, mask=None, spectra=None):
         """
-        增强的单一尺度模板匹配 - 包含图像预处理优化
+        增强的单一尺度模板匹配 - 输入为已预处理的图像
+        
+        使用单次带掩码的TM_CCOEFF_NORMED匹配，透明像素不参与计算
         
         Args:
-            screenshot: 截图
-            template: 模板图像
+            processed_screenshot: 预处理后的截图（见_get_processed_frame）
+            processed_template: 预处理后的模板（见_build_template_data）
             threshold: 匹配阈值
+            mask: 模板掩码，None表示所有像素都有效
+            spectra: 模板频谱缓存（见TemplateData.spectrum_cache），使用FFT时复用
             
         Returns:
             tuple: (found, position, confidence)
         """
         try:
-            # 图像预处理 - 提高匹配精度
-            processed_screenshot = self._preprocess_image(screenshot)
-            processed_template = self._preprocess_image(template)
-            
-            # 尝试多种匹配方法
-            methods = [
-                cv2.TM_CCOEFF_NORMED,    # 标准化相关系数匹配（推荐）
-                cv2.TM_CCORR_NORMED,     # 标准化相关匹配
-                cv2.TM_SQDIFF_NORMED     # 标准化平方差匹配（需要反转结果）
-            ]
-            
-            best_confidence = 0.0
-            best_position = None
-            best_method = None
-            
-            for i, method in enumerate(methods):
-                try:
-                    if self.backend == 'cuda' and self.use_cuda:
-                        # CUDA加速版本
-                        result = self._match_cuda_enhanced(processed_screenshot, processed_template, method)
-                    else:
-                        # CPU或OpenCL版本
-                        result = cv2.matchTemplate(processed_screenshot, processed_template, method)
-                    
-                    min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-                    
-                    # 对于TM_SQDIFF_NORMED，值越小越好，需要转换
-                    if method == cv2.TM_SQDIFF_NORMED:
-                        confidence = 1.0 - min_val
-                        loc = min_loc
-                    else:
-                        confidence = max_val
-                        loc = max_loc
-                    
-                    print(f"[DEBUG] Method {i+1}: confidence={confidence:.3f}")
-                    
-                    if confidence > best_confidence:
-                        best_confidence = confidence
-                        best_position = loc
-                        best_method = method
-                        
-                except Exception as e:
-                    print(f"[WARN] Matching method {i+1} failed: {e}")
-                    continue
+            result = self._correlate(processed_screenshot, processed_template, mask, spectra)
+            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
             
-            # 检查最佳结果是否满足阈值
-            if best_confidence >= threshold and best_position is not None:
+            if max_val >= threshold:
                 # 计算精确的中心点
-                h, w = template.shape[:2]
+                h, w = processed_template.shape[:2]
                 
                 # 匹配区域的左上角坐标
-                match_top_left_x = best_position[0]
-                match_top_left_y = best_position[1]
+                match_top_left_x = max_loc[0]
+                match_top_left_y = max_loc[1]
                 
                 # 计算几何中心点（使用浮点数确保精度）
                 center_x = match_top_left_x + w / 2.0
                 center_y = match_top_left_y + h / 2.0
                 
-                print(f"[DEBUG] 最佳匹配方法: {best_method}")
-                print(f"[DEBUG] 模板尺寸: {w}x{h}")
-                print(f"[DEBUG] 匹配区域左上角: ({match_top_left_x}, {match_top_left_y})")
-                print(f"[DEBUG] 计算的中心点: ({center_x}, {center_y})")
+                logger.debug("模板尺寸: %sx%s", w, h)
+                logger.debug("匹配区域左上角: (%s, %s)", match_top_left_x, match_top_left_y)
+                logger.debug("计算的中心点: (%s, %s)", center_x, center_y)
                 
-                return True, (int(center_x), int(center_y)), best_confidence
+                return True, (int(center_x), int(center_y)), max_val
             else:
-                return False, best_position, best_confidence
+                return False, max_loc, max_val
                 
         except Exception as e:
-            print(f"[ERROR] Enhanced template matching failed: {e}")
+            logger.error("Enhanced template matching failed: %s", e, interval=5)
             return False, None, 0.0
+    
+    def _correlate(self, processed_screenshot, processed_template, mask=None, spectra=None):
+        """
+        计算TM_CCOEFF_NORMED匹配结果图
+        
+        模板相对搜索图像足够大时使用频域相关（结果与TM_CCOEFF_NORMED一致），
+        否则使用cv2.matchTemplate
+        
+        Args:
+            processed_screenshot: 预处理后的截图
+            processed_template: 预处理后的模板
+            mask: 模板掩码，None表示所有像素都有效
+            spectra: 模板频谱缓存，None表示不缓存
+            
+        Returns:
+            numpy.ndarray: 匹配结果图，无效值（平坦区域的NaN/Inf）已置为0
+        """
+        if self.backend == 'cuda' and self.use_cuda and mask is None:
+            return self._match_cuda_enhanced(processed_screenshot, processed_template, cv2.TM_CCOEFF_NORMED)
+        
+        if self._should_use_fft(processed_screenshot.shape, processed_template.shape):
+            return self._correlate_fft(processed_screenshot, processed_template, mask, spectra)
+        
+        if mask is not None:
+            # CUDA模板匹配不支持掩码，带掩码时始终使用CPU/OpenCL
+            result = cv2.matchTemplate(processed_screenshot, processed_template, cv2.TM_CCOEFF_NORMED, mask=mask)
+            # 带掩码的标准化结果在纯色区域会出现除零，且存在微小的数值越界
+            np.nan_to_num(result, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+            np.clip(result, -1.0, 1.0, out=result)
+            return result
+        
+        return cv2.matchTemplate(processed_screenshot, processed_template, cv2.TM_CCOEFF_NORMED)
+    
+    def _should_use_fft(self, image_shape, template_shape):
+        """
+        判断是否使用频域相关
+        
+        Args:
+            image_shape: 搜索图像尺寸
+            template_shape: 模板尺寸
+            
+        Returns:
+            bool: 是否使用FFT
+        """
+        if not self.use_fft:
+            return False
+        template_area = template_shape[0] * template_shape[1]
+        image_area = image_shape[0] * image_shape[1]
+        return template_area >= self.FFT_MIN_TEMPLATE_AREA and template_area >= self.FFT_AREA_RATIO * image_area
+    
+    @staticmethod
+    def _fft_shape(image_shape):
+        """计算搜索图像对应的FFT尺寸（便于快速变换的长度）"""
+        return (scipy_fft.next_fast_len(image_shape[0], real=True),
+                scipy_fft.next_fast_len(image_shape[1], real=True))
+    
+    def _correlate_fft(self, image, template, mask=None, spectra=None):
+        """
+        频域计算TM_CCOEFF_NORMED（支持二值掩码）
+        
+        分子为图像与零均值模板的相关；分母中图像窗口的均值和方差
+        无掩码时由积分图求得，有掩码时由图像及其平方与掩码的相关求得
+        
+        Args:
+            image: 搜索图像（灰度）
+            template: 模板（灰度）
+            mask: 模板掩码，None表示所有像素都有效
+            spectra: 模板频谱缓存
+            
+        Returns:
+            numpy.ndarray: float32匹配结果图，尺寸与cv2.matchTemplate相同
+        """
+        image_height, image_width = image.shape[:2]
+        template_height, template_width = template.shape[:2]
+        fft_shape = self._fft_shape(image.shape)
+        valid = (slice(template_height - 1, image_height), slice(template_width - 1, image_width))
+        
+        template_spectrum, mask_spectrum, template_norm, count = self._template_spectrum(
+            template, mask, fft_shape, spectra
+        )
+        image_spectrum, squared_spectrum, integrals = self._image_spectrum(image, fft_shape, mask is not None)
+        
+        numerator = scipy_fft.irfft2(image_spectrum * template_spectrum, s=fft_shape, workers=-1)[valid]
+        
+        if mask is not None:
+            window_sum = scipy_fft.irfft2(image_spectrum * mask_spectrum, s=fft_shape, workers=-1)[valid]
+            window_sq_sum = scipy_fft.irfft2(squared_spectrum * mask_spectrum, s=fft_shape, workers=-1)[valid]
+        else:
+            window_sum = self._window_sums(integrals[0], template_height, template_width)
+            window_sq_sum = self._window_sums(integrals[1], template_height, template_width)
+        
+        variance = np.maximum(window_sq_sum - window_sum * window_sum / count, 0.0)
+        denominator = np.sqrt(variance) * template_norm
+        
+        result = np.zeros(numerator.shape, dtype=np.float32)
+        np.divide(numerator, denominator, out=result, where=denominator > 1e-6 * max(template_norm, 1.0),
+                  casting='unsafe')
+        np.clip(result, -1.0, 1.0, out=result)
+        return result
+    
+    @staticmethod
+    def _template_spectrum(template, mask, fft_shape, spectra=None):
+        """
+        计算（或从缓存读取）模板的频谱数据
+        
+        Args:
+            template: 模板（灰度）
+            mask: 模板掩码
+            fft_shape: FFT尺寸
+            spectra: 模板频谱缓存
+            
+        Returns:
+            tuple: (零均值模板频谱, 掩码频谱或None, 零均值模板范数, 有效像素数)
+        """
+        if spectra is not None and fft_shape in spectra:
+            return spectra[fft_shape]
+        
+        values = template.astype(np.float64)
+        if mask is not None:
+            weights = (mask > 0).astype(np.float64)
+            count = weights.sum()
+            zero_mean = (values - (values * weights).sum() / max(count, 1.0)) * weights
+            # 相关 = 与翻转后的核做卷积
+            mask_spectrum = scipy_fft.rfft2(weights[::-1, ::-1], s=fft_shape, workers=-1)
+        else:
+            count = float(values.size)
+            zero_mean = values - values.mean()
+            mask_spectrum = None
+        
+        data = (
+            scipy_fft.rfft2(zero_mean[::-1, ::-1], s=fft_shape, workers=-1),
+            mask_spectrum,
+            float(np.sqrt((zero_mean * zero_mean).sum())),
+            float(count)
+        )
+        if spectra is not None:
+            spectra[fft_shape] = data
+        return data
+    
+    def _image_spectrum(self, image, fft_shape, need_squared):
+        """
+        计算（或从当前帧缓存读取）搜索图像的频谱和积分图
+        
+        同一帧内的同一区域只计算一次，供所有大模板共享
+        
+        Args:
+            image: 搜索图像（灰度，可以是截图的区域视图）
+            fft_shape: FFT尺寸
+            need_squared: 是否需要图像平方的频谱（带掩码时使用）
+            
+        Returns:
+            tuple: (图像频谱, 平方频谱或None, (积分图, 平方积分图))
+        """
+        # 缓存值持有image引用，保证其数据地址在缓存有效期内不会被复用
+        key = (image.__array_interface__['data'][0], image.shape, image.strides, fft_shape)
+        with self._frame_lock:
+            cached = self._cached_spectra.get(key)
+        if cached is not None and (cached[2] is not None or not need_squared):
+            return cached[1], cached[2], cached[3]
+        
+        values = image.astype(np.float64)
+        image_spectrum = cached[1] if cached is not None else scipy_fft.rfft2(values, s=fft_shape, workers=-1)
+        squared_spectrum = scipy_fft.rfft2(values * values, s=fft_shape, workers=-1) if need_squared else None
+        integrals = cached[3] if cached is not None else cv2.integral2(image, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+        
+        with self._frame_lock:
+            self._cached_spectra[key] = (image, image_spectrum, squared_spectrum, integrals)
+        return image_spectrum, squared_spectrum, integrals
+    
+    @staticmethod
+    def _window_sums(integral, height, width):
+        """由积分图计算所有height×width窗口的和"""
+        return (integral[height:, width:] - integral[:-height, width:]
+                - integral[height:, :-width] + integral[:-height, :-width])
 
     def _preprocess_image(self, image):
         """
@@ -315,22 +1802,21 @@ class ImageRecognition:
             numpy.ndarray: 预处理后的图像
         """
         try:
-            # 如果是彩色图像，转换为灰度图
+            # 如果是彩色图像，转换为灰度图（灰度截图直接使用，模糊会生成新数组）
             if len(image.shape) == 3:
                 gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             else:
-                gray = image.copy()
+                gray = image
             
             # 应用高斯模糊减少噪声
+            # 注意：不做直方图均衡化。截图和模板各自做全局均衡化得到的灰度映射不同，
+            # 会破坏相关性；TM_CCOEFF_NORMED本身已按窗口归一化亮度和对比度
             blurred = cv2.GaussianBlur(gray, (3, 3), 0)
             
-            # 直方图均衡化 - 改善对比度
-            equalized = cv2.equalizeHist(blurred)
-            
-            return equalized
+            return blurred
             
         except Exception as e:
-            print(f"[WARN] Image preprocessing failed: {e}, using original image")
+            logger.warn("Image preprocessing failed: %s, using original image", e, interval=5)
             return image
 
     def _match_cuda_enhanced(self, screenshot, template, method):
@@ -355,7 +1841,7 @@ class ImageRecognition:
             return gpu_result.download()
             
         except Exception as e:
-            print(f"[WARN] CUDA enhanced matching failed: {e}, fallback to CPU")
+            logger.warn("CUDA enhanced matching failed: %s, fallback to CPU", e, interval=5)
             return cv2.matchTemplate(screenshot, template, method)
     
     def _match_cuda(self, screenshot, template):
@@ -378,47 +1864,127 @@ class ImageRecognition:
         # 下载结果
         return gpu_result.download()
     
-    def match_all(self, screenshot, template_name, threshold=0.8, max_results=10):
+    def match_all(self, screenshot, template_name, threshold=0.8, max_results=10, multi_scale=False, nms_overlap=0.3):
         """
-        查找所有匹配位置
+        查找所有匹配位置（每个目标只返回一次）
         
         Args:
             screenshot: 截图
             template_name: 模板名称
             threshold: 匹配阈值
             max_results: 最大结果数量
+            multi_scale: 是否同时搜索所有缩放变体
+            nms_overlap: 非极大值抑制的重叠阈值（IoU），超过该值的较低得分结果被抑制
             
         Returns:
-            list: [(x, y, confidence), ...] 匹配位置列表
+            list: [(x, y, confidence), ...] 互不重叠的匹配中心点，按置信度降序排列
         """
+        screenshot = self._frame_image(screenshot)
         if template_name not in self.templates:
             return []
             
-        template = self.templates[template_name]
+        entry = self.templates[template_name]
         
         try:
-            result = cv2.matchTemplate(screenshot, template, cv2.TM_CCOEFF_NORMED)
-            
-            # 找到所有超过阈值的位置
-            locations = np.where(result >= threshold)
-            matches = []
-            
-            h, w = template.shape[:2]
-            for pt in zip(*locations[::-1]):
-                center_x = pt[0] + w // 2
-                center_y = pt[1] + h // 2
-                confidence = result[pt[1], pt[0]]
-                matches.append((center_x, center_y, confidence))
+            processed_screenshot = self._get_processed_frame(screenshot)
+            frame_height, frame_width = processed_screenshot.shape[:2]
+            variants = entry.variants() if multi_scale else entry.variants()[:1]
+            
+            # 1. 收集各尺度的候选峰值 (score, left, top, width, height)
+            candidates = []
+            for scale, processed_template, mask in variants:
+                h, w = processed_template.shape[:2]
+                if w > frame_width or h > frame_height:
+                    continue
                 
-                if len(matches) >= max_results:
-                    break
+                result = self._correlate(processed_screenshot, processed_template, mask, entry.spectrum_cache(scale))
+                scores, xs, ys = self._local_peaks(result, threshold, (h, w), max_results * 4)
+                if scores.size:
+                    candidates.append(np.stack([
+                        scores, xs, ys,
+                        np.full(scores.shape, w, dtype=np.float32),
+                        np.full(scores.shape, h, dtype=np.float32)
+                    ], axis=1))
+            
+            if not candidates:
+                return []
+            
+            # 2. 跨尺度的非极大值抑制
+            boxes = np.concatenate(candidates)
+            keep = self._nms(boxes, nms_overlap, max_results)
             
-            return matches
+            return [
+                (int(left + w // 2), int(top + h // 2), float(score))
+                for score, left, top, w, h in boxes[keep]
+            ]
             
         except Exception as e:
-            print(f"[ERROR] Batch matching failed: {e}")
+            logger.error("Batch matching failed: %s", e, interval=5)
             return []
     
+    @staticmethod
+    def _local_peaks(result, threshold, template_shape, limit):
+        """
+        提取匹配结果图中超过阈值的局部极大值
+        
+        先用膨胀运算只保留邻域内的最大值（同一目标周围的一片高分像素只剩峰值），
+        再用argpartition取得分最高的若干个
+        
+        Args:
+            result: 匹配结果图
+            threshold: 匹配阈值
+            template_shape: 模板尺寸，决定局部邻域大小
+            limit: 最多返回的峰值数
+            
+        Returns:
+            tuple: (scores, xs, ys) 三个float32数组，未排序
+        """
+        h, w = template_shape[:2]
+        kernel = np.ones((max(3, (h // 2) | 1), max(3, (w // 2) | 1)), np.uint8)
+        dilated = cv2.dilate(result, kernel)
+        
+        peak_mask = (result >= threshold) & (result >= dilated)
+        ys, xs = np.nonzero(peak_mask)
+        scores = result[ys, xs]
+        
+        if scores.size > limit:
+            top = np.argpartition(scores, -limit)[-limit:]
+            ys, xs, scores = ys[top], xs[top], scores[top]
+        
+        return scores.astype(np.float32), xs.astype(np.float32), ys.astype(np.float32)
+    
+    @staticmethod
+    def _nms(boxes, overlap, limit):
+        """
+        贪心非极大值抑制
+        
+        Args:
+            boxes: N×5数组，每行为 (score, left, top, width, height)
+            overlap: IoU阈值
+            limit: 最多保留的结果数
+            
+        Returns:
+            list: 保留的行索引，按得分降序排列
+        """
+        lefts, tops = boxes[:, 1], boxes[:, 2]
+        rights, bottoms = lefts + boxes[:, 3], tops + boxes[:, 4]
+        areas = boxes[:, 3] * boxes[:, 4]
+        order = np.argsort(-boxes[:, 0], kind='stable')
+        
+        keep = []
+        while order.size and len(keep) < limit:
+            i = order[0]
+            keep.append(i)
+            rest = order[1:]
+            
+            inter_w = np.clip(np.minimum(rights[i], rights[rest]) - np.maximum(lefts[i], lefts[rest]), 0, None)
+            inter_h = np.clip(np.minimum(bottoms[i], bottoms[rest]) - np.maximum(tops[i], tops[rest]), 0, None)
+            inter = inter_w * inter_h
+            iou = inter / (areas[i] + areas[rest] - inter)
+            order = rest[iou <= overlap]
+        
+        return keep
+    
     def get_backend_info(self):
         """获取后端信息"""
         info = {
@@ -453,16 +2019,27 @@ class GlobalImageRecognitionSystem:
         self.is_running = False
         self.recognition_thread = None
         self.stop_event = threading.Event()
+        self.last_frame_id = None  # 上次识别的帧序号，同一帧不重复识别
+        
+        # 画面变化检测：画面未变化的区域复用上次的匹配结果
+        self.change_detector = FrameChangeDetector()
+        self.last_results = {}        # 上次的匹配结果 {template_name: MatchResult}
+        self.last_match_params = None  # 上次匹配的参数 (threshold, search_mode, frame_shape)
         
         # 配置参数
         self.config = {
             'dungeons': [],  # 启用的副本配置
-            'start_challenge': {'imagePath': 'static/dungeon/开始挑战.png'},
+            'start_challenge': {'imagePath': 'static/dungeon/开始挑战.png'},  # 可选 searchRegion: [x, y, w, h]（相对比例）
             'interval': 2000,  # 识别间隔（毫秒）
             'accuracy': 'normal',  # 识别精度
             'click_delay': 500,  # 点击延迟
+            'max_result_age_ms': 300,  # 点击前识别结果的最大年龄（毫秒），超过则在新帧中重新验证；None不检查
             'match_threshold': 0.65,  # 匹配阈值 (游戏界面推荐0.6-0.7)
+            'search_mode': 'exhaustive',  # 搜索模式: 'exhaustive'（全分辨率多尺度）或 'pyramid'（粗到精，需显式开启）
             'max_retries': 3,  # 最大重试次数
+            'change_detection': True,  # 画面未变化时复用上次的识别结果
+            'change_tolerance': FrameChangeDetector.DEFAULT_PIXEL_TOLERANCE,  # 单元格平均亮度的允许差值
+            'change_min_area': FrameChangeDetector.DEFAULT_AREA_TOLERANCE,  # 变化单元格比例超过该值才算画面变化
             'debug_mode': False  # 调试模式
         }
         
@@ -472,9 +2049,16 @@ class GlobalImageRecognitionSystem:
             'click_count': 0,
             'start_time': 0,
             'last_recognition_time': 0,
-            'current_dungeon': None
+            'current_dungeon': None,
+            'skipped_frames': 0,  # 无需重新匹配、完全复用上次结果的帧数
+            'reused_results': 0,  # 复用的模板结果数
+            'reverified_results': 0,  # 点击前因过期而重新验证的结果数
+            'stale_rejected': 0   # 重新验证后目标已消失、取消点击的次数
         }
         
+        # 从截图到点击的结果年龄分布
+        self.action_ages = AgeHistogram()
+        
         # 回调函数
         self.result_callback = None
         self.error_callback = None
@@ -489,6 +2073,12 @@ class GlobalImageRecognitionSystem:
         self.config.update(config)
         print(f"[INFO] Recognition config updated: {len(self.config.get('dungeons', []))} dungeons enabled")
         
+        # 配置变化后上次的结果不再可靠
+        self.change_detector.pixel_tolerance = float(self.config.get('change_tolerance'))
+        self.change_detector.area_tolerance = float(self.config.get('change_min_area'))
+        self.change_detector.reset()
+        self.last_results = {}
+        
         # 加载模板图片
         self._load_templates()
         
@@ -507,7 +2097,9 @@ class GlobalImageRecognitionSystem:
                     project_root = os.path.dirname(script_dir)
                     image_path = os.path.join(project_root, image_path)
                 
-                success = self.image_recognition.load_template(template_name, image_path)
+                success = self.image_recognition.load_template(
+                    template_name, image_path, dungeon.get('searchRegion')
+                )
                 if success:
                     print(f"[OK] Loaded dungeon template: {dungeon['name']} -> {template_name}")
                 else:
@@ -524,7 +2116,9 @@ class GlobalImageRecognitionSystem:
                     project_root = os.path.dirname(script_dir)
                     image_path = os.path.join(project_root, image_path)
                 
-                success = self.image_recognition.load_template('start_challenge', image_path)
+                success = self.image_recognition.load_template(
+                    'start_challenge', image_path, start_challenge.get('searchRegion')
+                )
                 if success:
                     print(f"[OK] Loaded start challenge template")
                 else:
@@ -559,8 +2153,15 @@ class GlobalImageRecognitionSystem:
                 'click_count': 0,
                 'start_time': time.time(),
                 'last_recognition_time': 0,
-                'current_dungeon': None
+                'current_dungeon': None,
+                'skipped_frames': 0,
+                'reused_results': 0,
+                'reverified_results': 0,
+                'stale_rejected': 0
             }
+            self.action_ages.reset()
+            self.change_detector.reset()
+            self.last_results = {}
             
             # 重置停止事件
             self.stop_event.clear()
@@ -613,6 +2214,7 @@ class GlobalImageRecognitionSystem:
             self.recognition_thread = None
             
             print("[INFO] Global image recognition system stopped")
+            self.image_recognition.shutdown()
             return True
             
         except Exception as e:
@@ -642,7 +2244,7 @@ class GlobalImageRecognitionSystem:
                         break  # 收到停止信号
                         
                 except Exception as e:
-                    print(f"[ERROR] Recognition loop error: {e}")
+                    logger.error("Recognition loop error: %s", e, interval=5)
                     if self.error_callback:
                         self.error_callback({
                             'message': str(e),
@@ -668,31 +2270,48 @@ class GlobalImageRecognitionSystem:
         执行一次图像识别
         """
         try:
-            # 获取游戏窗口截图
-            screenshot = self.window_capture.capture_window()
-            if screenshot is None:
-                print("[WARN] Failed to capture window screenshot")
+            # 获取比上次识别更新的帧（截图线程运行时不额外截图）
+            frame = self.window_capture.wait_next_frame(self.last_frame_id, fmt=self.image_recognition.frame_format)
+            if frame is None:
+                logger.warn("No new frame available for recognition", interval=5)
                 return
-                
-            print(f"[DEBUG] Screenshot captured: {screenshot.shape}")
+            
+            self.last_frame_id = frame.frame_id
+            screenshot = frame.image
+            logger.debug("Frame %s captured: %s", frame.frame_id, screenshot.shape)
             
             # 获取匹配阈值
             threshold = self.config.get('match_threshold', 0.8)
             
-            # 识别副本图片
+            # 一次并行匹配所有副本模板和开始挑战按钮（共享同一帧的预处理结果）
+            dungeons = self.config.get('dungeons', [])
+            template_names = [f"dungeon_{dungeon['key']}" for dungeon in dungeons] + ['start_challenge']
+            
+            # 画面未变化的模板复用上次结果，只重新匹配受变化区域影响的模板
+            results = self._reusable_results(frame, template_names, threshold)
+            pending = [name for name in template_names if name not in results]
+            if pending:
+                results.update(self.image_recognition.match_many(
+                    frame, pending, threshold, self.config.get('search_mode')
+                ))
+            else:
+                logger.debug("Frame unchanged, reusing previous recognition results")
+            self.last_results = results
+            
+            # 识别副本图片（按配置顺序取第一个找到的副本）
             dungeon_found = None
             dungeon_position = None
+            dungeon_result = None
             
-            for dungeon in self.config.get('dungeons', []):
-                template_name = f"dungeon_{dungeon['key']}"
-                found, position, confidence = self.image_recognition.match_template(
-                    screenshot, template_name, threshold
-                )
+            for dungeon in dungeons:
+                result = results[f"dungeon_{dungeon['key']}"]
+                found, position, confidence = result
                 
                 if found:
-                    print(f"[INFO] Found dungeon: {dungeon['name']} at {position} (confidence: {confidence:.3f})")
+                    logger.info("Found dungeon: %s at %s (confidence: %.3f)", dungeon['name'], position, confidence, interval=2)
                     dungeon_found = dungeon
                     dungeon_position = position
+                    dungeon_result = result
                     self.statistics['current_dungeon'] = dungeon['name']
                     break
             
@@ -700,25 +2319,24 @@ class GlobalImageRecognitionSystem:
             challenge_found = False
             challenge_position = None
             
-            found, position, confidence = self.image_recognition.match_template(
-                screenshot, 'start_challenge', threshold
-            )
+            challenge_result = results['start_challenge']
+            found, position, confidence = challenge_result
             
             if found:
-                print(f"[INFO] Found start challenge button at {position} (confidence: {confidence:.3f})")
+                logger.info("Found start challenge button at %s (confidence: %.3f)", position, confidence, interval=2)
                 challenge_found = True
                 challenge_position = position
             
             # 执行点击逻辑
             if dungeon_found and challenge_found:
-                print(f"[INFO] Both dungeon and challenge button found, executing click sequence...")
-                self._execute_click_sequence(dungeon_position, challenge_position, dungeon_found)
+                logger.info("Both dungeon and challenge button found, executing click sequence...")
+                self._execute_click_sequence(dungeon_result, challenge_result, dungeon_found)
             elif dungeon_found:
-                print(f"[INFO] Only dungeon found: {dungeon_found['name']}")
+                logger.debug("Only dungeon found: %s", dungeon_found['name'])
             elif challenge_found:
-                print(f"[INFO] Only challenge button found")
+                logger.debug("Only challenge button found")
             else:
-                print(f"[DEBUG] No targets found in current screenshot")
+                logger.debug("No targets found in current screenshot")
                 self.statistics['current_dungeon'] = None
             
             # 发送识别结果
@@ -731,55 +2349,157 @@ class GlobalImageRecognitionSystem:
                 })
                 
         except Exception as e:
-            print(f"[ERROR] Recognition failed: {e}")
+            logger.error("Recognition failed: %s", e, interval=5)
             if self.error_callback:
                 self.error_callback({
                     'message': str(e),
                     'critical': False
                 })
                 
-    def _execute_click_sequence(self, dungeon_position: Tuple[int, int], 
-                               challenge_position: Tuple[int, int], dungeon_info: Dict):
+    def _reusable_results(self, frame, template_names: List[str], threshold: float) -> Dict[str, MatchResult]:
+        """
+        根据画面变化检测找出可以复用上次结果的模板
+        
+        画面整体未变化时复用全部结果；局部变化时，模板所依赖的区域（命中框或搜索区域）
+        与所有脏矩形都不相交的结果仍然有效。复用的结果标记为来自当前帧
+        
+        Args:
+            frame: 当前帧
+            template_names: 本次需要匹配的模板
+            threshold: 匹配阈值
+            
+        Returns:
+            Dict[str, MatchResult]: 可以复用的结果 {template_name: MatchResult}
+        """
+        if not self.config.get('change_detection', True):
+            return {}
+        
+        screenshot = frame.image
+        changed, dirty_rects = self.change_detector.detect(screenshot)
+        
+        params = (threshold, self.config.get('search_mode'), screenshot.shape[:2])
+        if params != self.last_match_params:
+            self.last_match_params = params
+            return {}
+        if changed and dirty_rects is None:
+            return {}
+        
+        reused = {}
+        for name in template_names:
+            result = self.last_results.get(name)
+            if result is None:
+                continue
+            if changed:
+                found, position, _ = result
+                area = self.image_recognition.get_template_area(name, screenshot.shape, position if found else None)
+                if area is None or any(self._rects_overlap(area, rect) for rect in dirty_rects):
+                    continue
+            reused[name] = result.restamp(frame.frame_id, frame.captured_at)
+        
+        if len(reused) == len(template_names):
+            self.statistics['skipped_frames'] += 1
+        self.statistics['reused_results'] += len(reused)
+        return reused
+    
+    @staticmethod
+    def _rects_overlap(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> bool:
+        """
+        判断两个 (left, top, right, bottom) 矩形是否相交
+        
+        Args:
+            a: 矩形a
+            b: 矩形b
+            
+        Returns:
+            bool: 是否相交
+        """
+        return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+    
+    def _execute_click_sequence(self, dungeon_result: MatchResult, challenge_result: MatchResult,
+                               dungeon_info: Dict):
         """
         执行点击序列：先点击副本，再点击开始挑战
         
+        每次点击前检查结果年龄，超过max_result_age_ms的结果先在新帧中重新验证，目标已消失则中止
+        
         Args:
-            dungeon_position: 副本图片位置
-            challenge_position: 开始挑战按钮位置
+            dungeon_result: 副本图片的匹配结果
+            challenge_result: 开始挑战按钮的匹配结果
             dungeon_info: 副本信息
         """
         try:
             click_delay = self.config.get('click_delay', 500) / 1000.0  # 转换为秒
             
-            print(f"[INFO] Executing click sequence for {dungeon_info['name']} dungeon")
+            logger.info("Executing click sequence for %s dungeon", dungeon_info['name'])
             
             # 第一步：点击副本图片
-            print(f"[INFO] Step 1: Clicking dungeon at {dungeon_position}")
+            dungeon_result = self._ensure_fresh(dungeon_result)
+            if not dungeon_result.found:
+                logger.warn("Dungeon no longer visible, click sequence aborted")
+                return
+            dungeon_position = dungeon_result.position
+            logger.info("Step 1: Clicking dungeon at %s", dungeon_position)
+            self.action_ages.record(dungeon_result.age_ms())
             success = self.human_mouse.click(dungeon_position[0], dungeon_position[1])
             
             if success:
-                print(f"[OK] Dungeon clicked successfully")
+                logger.ok("Dungeon clicked successfully")
                 self.statistics['click_count'] += 1
                 
                 # 等待点击延迟
                 time.sleep(click_delay)
                 
-                # 第二步：点击开始挑战按钮
-                print(f"[INFO] Step 2: Clicking start challenge at {challenge_position}")
+                # 第二步：点击开始挑战按钮（等待后原结果通常已过期）
+                challenge_result = self._ensure_fresh(challenge_result)
+                if not challenge_result.found:
+                    logger.warn("Start challenge button no longer visible, click skipped")
+                    return
+                challenge_position = challenge_result.position
+                logger.info("Step 2: Clicking start challenge at %s", challenge_position)
+                self.action_ages.record(challenge_result.age_ms())
                 success = self.human_mouse.click(challenge_position[0], challenge_position[1])
                 
                 if success:
-                    print(f"[OK] Start challenge clicked successfully")
+                    logger.ok("Start challenge clicked successfully")
                     self.statistics['click_count'] += 1
-                    print(f"[SUCCESS] Click sequence completed for {dungeon_info['name']} dungeon")
+                    logger.ok("Click sequence completed for %s dungeon", dungeon_info['name'])
                 else:
-                    print(f"[ERROR] Failed to click start challenge button")
+                    logger.error("Failed to click start challenge button")
             else:
-                print(f"[ERROR] Failed to click dungeon")
+                logger.error("Failed to click dungeon")
                 
         except Exception as e:
-            print(f"[ERROR] Click sequence failed: {e}")
+            logger.error("Click sequence failed: %s", e)
+            
+    def _ensure_fresh(self, result: MatchResult) -> MatchResult:
+        """
+        保证点击使用的结果不超过max_result_age_ms
+        
+        过期的结果在比它更新的一帧中只对命中区域重新匹配，代价远低于一次完整识别
+        
+        Args:
+            result: 匹配结果
             
+        Returns:
+            MatchResult: 未过期时原样返回；否则返回重新验证的结果（没有新帧时视为未找到）
+        """
+        max_age_ms = self.config.get('max_result_age_ms')
+        if result.is_fresh(max_age_ms):
+            return result
+        
+        age_ms = result.age_ms()
+        self.statistics['reverified_results'] += 1
+        frame = self.window_capture.wait_next_frame(result.frame_id, fmt=self.image_recognition.frame_format)
+        if frame is None:
+            fresh = MatchResult(False, None, 0.0, result.frame_id, result.timestamp, result.template)
+        else:
+            fresh = self.image_recognition.reverify(frame, result, self.config.get('match_threshold', 0.8))
+        
+        if not fresh.found:
+            self.statistics['stale_rejected'] += 1
+        logger.debug("%s result was %.0fms old, re-verified: %s", result.template, age_ms, 'found' if fresh.found else 'gone')
+        return fresh
+    
     def get_status(self) -> Dict[str, Any]:
         """
         获取系统状态
@@ -798,7 +2518,13 @@ class GlobalImageRecognitionSystem:
             'click_count': self.statistics.get('click_count', 0),
             'running_time': running_time,
             'enabled_dungeons': len(self.config.get('dungeons', [])),
-            'last_recognition_time': self.statistics.get('last_recognition_time', 0)
+            'last_recognition_time': self.statistics.get('last_recognition_time', 0),
+            'skipped_frames': self.statistics.get('skipped_frames', 0),
+            'reused_results': self.statistics.get('reused_results', 0),
+            'reverified_results': self.statistics.get('reverified_results', 0),
+            'stale_rejected': self.statistics.get('stale_rejected', 0),
+            'action_age': self.action_ages.get_stats(),
+            'change_detection': self.change_detector.get_stats()
         }
         
     def set_callbacks(self, result_callback=None, error_callback=None):
@@ -22,10 +22,13 @@ if script_dir not in sys.path:
 # 导入核心组件
 from core.base_service import ServiceManager
 from core.command_handler import CommandRouter, SystemCommandHandler
+from core.dispatcher import CommandDispatcher
+from core.protocol import emit, build_response, build_ready_message, install_output_writer, uninstall_output_writer
 
 # 导入服务
 from services.window_service import WindowService, WindowCommandHandler
 from services.script_service import ScriptService, ScriptCommandHandler
+from services.recognition_service import RecognitionService, RecognitionCommandHandler
 
 # 导入现有模块（保持兼容性）
 from image_recognition import ImageRecognition, GlobalImageRecognitionSystem
@@ -100,15 +103,27 @@ class DNAAutomatorEngine:
     4. 全局错误处理
     """
     
+    # 命令通道配置：每个处理器的命令在自己的通道中按顺序执行，状态查询并发执行
+    COMMAND_LANES = {
+        'WindowCommandHandler': {'max_depth': 8},
+        'RecognitionCommandHandler': {'max_depth': 8},
+        'ScriptCommandHandler': {'max_depth': 8}
+    }
+    
     def __init__(self):
         """初始化DNA Automator引擎"""
         self.config_manager = ProjectConfigManager()
         self.service_manager = ServiceManager()
         self.command_router = CommandRouter()
+        self.dispatcher = CommandDispatcher(
+            self.execute_command, self._send_response, self.command_router.get_command_lane,
+            lanes=self.COMMAND_LANES
+        )
         
         # 服务实例
         self.window_service = None
         self.script_service = None
+        self.recognition_service = None
         
         # 兼容性支持（保留原有模块）
         self.image_recognition = None
@@ -181,6 +196,11 @@ class DNAAutomatorEngine:
                 print("[DNAEngine] 窗口服务启动失败", flush=True)
                 return False
             
+            # 启动图像识别服务
+            if not self.service_manager.start_service("RecognitionService"):
+                print("[DNAEngine] 图像识别服务启动失败", flush=True)
+                return False
+            
             # 启动脚本服务
             if not self.service_manager.start_service("ScriptService"):
                 print("[DNAEngine] 脚本服务启动失败", flush=True)
@@ -243,6 +263,39 @@ class DNAAutomatorEngine:
             
             return error_result
     
+    def execute_command(self, cmd: dict, received_at: float) -> dict:
+        """
+        处理命令并构造回复消息（每条命令恰好对应一条回复，带回命令的id）
+        
+        Args:
+            cmd: 命令字典
+            received_at: 收到命令的时间（time.perf_counter()）
+            
+        Returns:
+            dict: type为response的回复消息
+        """
+        cmd_id = cmd.get('id') if isinstance(cmd, dict) else None
+        action = cmd.get('action') if isinstance(cmd, dict) else None
+        
+        started_at = time.perf_counter()
+        result = self.process_command(cmd)
+        if not isinstance(result, dict):
+            result = {"success": False, "error": "命令处理结果格式错误", "error_type": "invalid_result"}
+        return build_response(cmd_id, action, result, received_at, started_at, time.perf_counter())
+    
+    def _send_response(self, response: dict) -> None:
+        """
+        发送命令回复（由调度器的工作线程调用）
+        
+        Args:
+            response: 回复消息
+        """
+        emit(response)
+        
+        # 如果命令处理失败，记录日志
+        if not response['success']:
+            print(f"[Main] 命令处理失败: {response['action'] or 'unknown'}, 错误: {response['data'].get('error', 'unknown')}", flush=True)
+    
     def get_engine_status(self) -> dict:
         """
         获取引擎状态
@@ -257,6 +310,7 @@ class DNAAutomatorEngine:
                 "version": self.config_manager.get_config().get("version", "0.1.0")
             },
             "services": self.service_manager.get_all_status(),
+            "dispatcher": self.dispatcher.get_stats(),
             "commands": {
                 "supported_commands": len(self.command_router.get_supported_commands()),
                 "handlers": list(self.command_router.get_handler_info().keys())
@@ -292,9 +346,15 @@ class DNAAutomatorEngine:
             self.window_service = WindowService()
             self.service_manager.register_service(self.window_service)
             
+            # 创建图像识别服务（共享兼容性模块中的图像识别器）
+            self.recognition_service = RecognitionService(self.image_recognition)
+            self.service_manager.register_service(self.recognition_service, dependencies=["WindowService"])
+            
             # 创建脚本服务
             self.script_service = ScriptService()
-            self.service_manager.register_service(self.script_service, dependencies=["WindowService"])
+            self.service_manager.register_service(
+                self.script_service, dependencies=["WindowService", "RecognitionService"]
+            )
             
             print("[DNAEngine] 服务创建完成", flush=True)
             
@@ -308,13 +368,17 @@ class DNAAutomatorEngine:
             print("[DNAEngine] 注册命令处理器...", flush=True)
             
             # 注册系统命令处理器
-            system_handler = SystemCommandHandler(self.service_manager)
+            system_handler = SystemCommandHandler(self.service_manager, self.dispatcher)
             self.command_router.register_handler(system_handler)
             
             # 注册窗口命令处理器
             window_handler = WindowCommandHandler(self.window_service)
             self.command_router.register_handler(window_handler)
             
+            # 注册图像识别命令处理器
+            recognition_handler = RecognitionCommandHandler(self.recognition_service)
+            self.command_router.register_handler(recognition_handler)
+            
             # 注册脚本命令处理器
             script_handler = ScriptCommandHandler(self.script_service)
             self.command_router.register_handler(script_handler)
@@ -330,10 +394,13 @@ class DNAAutomatorEngine:
         try:
             print("[DNAEngine] 设置服务依赖关系...", flush=True)
             
-            # 脚本服务依赖窗口服务
+            # 图像识别服务依赖窗口服务（窗口连接时执行分辨率校准）
+            self.recognition_service.set_dependencies(window_service=self.window_service)
+            
+            # 脚本服务依赖窗口服务和图像识别服务
             self.script_service.set_dependencies(
                 window_service=self.window_service,
-                recognition_service=None  # 图像识别服务暂时为None
+                recognition_service=self.recognition_service
             )
             
             print("[DNAEngine] 服务依赖关系设置完成", flush=True)
@@ -361,17 +428,17 @@ class DNAAutomatorEngine:
                 try:
                     # 检查窗口连接状态
                     if not self.window_service.is_window_connected:
-                        script_service.log("窗口未连接，跳过本次迭代", "WARN")
+                        script_service.log("窗口未连接，跳过本次迭代", "WARN", interval=10)
                         return False
                     
                     # 这里添加具体的游戏自动化逻辑
                     # 例如：图像识别、自动点击等
                     
-                    script_service.log(f"脚本迭代执行完成 (第{script_service.total_iterations}次)", "INFO")
+                    script_service.log(f"脚本迭代执行完成 (第{script_service.total_iterations}次)", "DEBUG")
                     return True
                     
                 except Exception as e:
-                    script_service.log(f"脚本逻辑执行失败: {str(e)}", "ERROR")
+                    script_service.log(f"脚本逻辑执行失败: {str(e)}", "ERROR", interval=5)
                     return False
             
             # 设置脚本逻辑
@@ -395,6 +462,9 @@ def main():
     """
     engine = None
     
+    # 所有输出由写线程异步写出，Electron读取变慢时不阻塞识别和脚本线程
+    install_output_writer()
+    
     try:
         # 创建引擎实例
         engine = DNAAutomatorEngine()
@@ -416,6 +486,10 @@ def main():
         print(f"[Main] Python版本: {sys.version}", flush=True)
         print(f"[Main] 脚本目录: {script_dir}", flush=True)
         print("[Main] 等待来自Electron的命令...", flush=True)
+        emit(build_ready_message({
+            "name": config.get('name', 'DNA Automator'),
+            "version": config.get('version', '0.1.0')
+        }))
         
         # 主循环 - 处理来自Electron的命令
         while True:
@@ -429,30 +503,27 @@ def main():
                 line = line.strip()
                 if not line:
                     continue
+                received_at = time.perf_counter()
                 
                 # 解析JSON命令
                 try:
                     command = json.loads(line)
                     
-                    # 处理命令
-                    result = engine.process_command(command)
-                    
-                    # 如果命令处理失败，记录日志
-                    if not result.get('success', False):
-                        print(f"[Main] 命令处理失败: {command.get('action', 'unknown')}, 错误: {result.get('error', 'unknown')}", flush=True)
-                    
                 except json.JSONDecodeError as e:
                     print(f"[Main] 收到无效JSON: {line}, 错误: {str(e)}", flush=True)
                     
-                    # 发送错误响应
-                    error_response = {
-                        "type": "error",
-                        "data": {
-                            "error": f"无效的JSON格式: {str(e)}",
-                            "received": line
-                        }
+                    # 无法取得id，回复的id为None
+                    error_result = {
+                        "success": False,
+                        "error": f"无效的JSON格式: {str(e)}",
+                        "error_type": "invalid_json",
+                        "received": line
                     }
-                    print(json.dumps(error_response), flush=True)
+                    emit(build_response(None, None, error_result, received_at, received_at, time.perf_counter()))
+                    continue
+                
+                # 交给调度器在工作线程中处理并回复，立即继续读取下一条命令
+                engine.dispatcher.submit(command, received_at)
                 
             except KeyboardInterrupt:
                 print("[Main] 收到键盘中断，正在退出...", flush=True)
@@ -472,9 +543,12 @@ def main():
         # 清理资源
         if engine:
             print("[Main] 正在清理资源...", flush=True)
+            if not engine.dispatcher.shutdown():
+                print("[Main] 等待命令执行完毕超时", flush=True)
             engine.stop()
         
         print("[Main] DNA Automator Python引擎已停止", flush=True)
+        uninstall_output_writer()
 
 
 if __name__ == "__main__":
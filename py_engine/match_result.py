@@ -0,0 +1,181 @@
+"""
+匹配结果模块
+- MatchResult: 带帧序号和截图时间的匹配结果，仍可按 (found, position, confidence) 解包
+- AgeHistogram: 从截图到执行动作的时间分布，既是延迟指标，也用于评估过期点击的风险
+"""
+import bisect
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence
+
+
+class MatchResult(tuple):
+    """
+    模板匹配结果
+    
+    继承tuple，原有的 found, position, confidence = result 写法不受影响；
+    额外记录结果来自哪一帧（frame_id）以及该帧进入流水线的时间（timestamp，time.monotonic()），
+    动作执行前可以据此判断结果是否已过期
+    """
+    
+    def __new__(cls, found: bool, position, confidence: float, frame_id: Optional[int] = None,
+                timestamp: Optional[float] = None, template: Optional[str] = None):
+        """
+        创建匹配结果
+        
+        Args:
+            found: 是否找到
+            position: (x, y) 中心点坐标
+            confidence: 匹配置信度
+            frame_id: 帧序号，直接传入numpy数组匹配时为None
+            timestamp: 截图时间（time.monotonic()），None表示当前时间
+            template: 模板名称
+        """
+        result = super().__new__(cls, (found, position, confidence))
+        result.frame_id = frame_id
+        result.timestamp = time.monotonic() if timestamp is None else timestamp
+        result.template = template
+        return result
+    
+    def __getnewargs__(self):
+        """支持复制和序列化"""
+        return tuple(self) + (self.frame_id, self.timestamp, self.template)
+    
+    @property
+    def found(self) -> bool:
+        """是否找到"""
+        return self[0]
+    
+    @property
+    def position(self):
+        """中心点坐标"""
+        return self[1]
+    
+    @property
+    def confidence(self) -> float:
+        """匹配置信度"""
+        return self[2]
+    
+    def age_ms(self, now: Optional[float] = None) -> float:
+        """
+        结果的年龄：从截图到现在经过的时间
+        
+        Args:
+            now: 当前时间（time.monotonic()），None取当前时间
+        
+        Returns:
+            float: 毫秒
+        """
+        return ((time.monotonic() if now is None else now) - self.timestamp) * 1000
+    
+    def is_fresh(self, max_age_ms: Optional[float]) -> bool:
+        """
+        结果是否足够新
+        
+        Args:
+            max_age_ms: 允许的最大年龄（毫秒），None不限制
+        
+        Returns:
+            bool: 是否未过期
+        """
+        return max_age_ms is None or self.age_ms() <= max_age_ms
+    
+    def restamp(self, frame_id: Optional[int], timestamp: float) -> 'MatchResult':
+        """
+        把结果标记为来自另一帧（该帧已确认结果依赖的区域没有变化）
+        
+        Args:
+            frame_id: 新的帧序号
+            timestamp: 新的截图时间
+        
+        Returns:
+            MatchResult: 内容相同、帧信息更新的结果
+        """
+        return MatchResult(self[0], self[1], self[2], frame_id, timestamp, self.template)
+
+
+class AgeHistogram:
+    """
+    年龄分布直方图
+    
+    按固定的毫秒分桶计数（最后一个桶收集超过最大边界的值），同时记录总数、均值和最大值
+    """
+    
+    DEFAULT_BOUNDS = (50, 100, 200, 300, 500, 1000, 2000)  # 分桶上界（毫秒）
+    
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BOUNDS):
+        """
+        初始化直方图
+        
+        Args:
+            bounds: 递增的分桶上界（毫秒）
+        """
+        self.bounds = tuple(bounds)
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def record(self, age_ms: float) -> None:
+        """
+        记录一次年龄
+        
+        Args:
+            age_ms: 毫秒
+        """
+        index = bisect.bisect_left(self.bounds, age_ms)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._total += age_ms
+            self._max = max(self._max, age_ms)
+    
+    def reset(self) -> None:
+        """清空统计"""
+        with getattr(self, '_lock', threading.Lock()):
+            self._counts = [0] * (len(self.bounds) + 1)
+            self._count = 0
+            self._total = 0.0
+            self._max = 0.0
+    
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        估算分位数（取所在桶的上界，落在最后一个桶时取最大值）
+        
+        Args:
+            fraction: 0-1之间的分位
+        
+        Returns:
+            float: 毫秒，没有数据时返回None
+        """
+        with self._lock:
+            counts, count, maximum = list(self._counts), self._count, self._max
+        if not count:
+            return None
+        
+        target = fraction * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            cumulative += bucket_count
+            if cumulative >= target and bucket_count:
+                return float(self.bounds[index]) if index < len(self.bounds) else maximum
+        return maximum
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取直方图数据
+        
+        Returns:
+            Dict[str, Any]: 各桶计数（键为"<=上界"或">最大边界"）、次数、均值、最大值和分位数
+        """
+        with self._lock:
+            counts, count, total, maximum = list(self._counts), self._count, self._total, self._max
+        
+        buckets = {f"<={bound}ms": counts[index] for index, bound in enumerate(self.bounds)}
+        buckets[f">{self.bounds[-1]}ms"] = counts[-1]
+        return {
+            'count': count,
+            'mean_ms': round(total / count, 1) if count else None,
+            'max_ms': round(maximum, 1) if count else None,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'buckets': buckets
+        }
@@ -4,10 +4,13 @@
 
 from .window_service import WindowService, WindowCommandHandler
 from .script_service import ScriptService, ScriptCommandHandler
+from .recognition_service import RecognitionService, RecognitionCommandHandler
 
 __all__ = [
     'WindowService',
     'WindowCommandHandler',
     'ScriptService', 
-    'ScriptCommandHandler'
+    'ScriptCommandHandler',
+    'RecognitionService',
+    'RecognitionCommandHandler'
 ]
\ No newline at end of file
@@ -0,0 +1,420 @@
+"""
+图像识别服务 - 负责图像识别器的管理和分辨率校准
+封装了UI缩放比例的校准、档案缓存等功能
+"""
+from typing import Dict, Any, Optional
+import os
+import threading
+
+from core.base_service import BaseService
+from core.command_handler import BaseCommandHandler
+from image_recognition import ImageRecognition, CalibrationProfiles
+from match_result import AgeHistogram, MatchResult
+
+
+# py_engine目录和项目根目录
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.dirname(ENGINE_DIR)
+
+
+class RecognitionService(BaseService):
+    """
+    图像识别服务 - 管理共享的图像识别器
+    
+    职责：
+    1. 持有引擎共享的ImageRecognition实例
+    2. 窗口连接时按窗口尺寸加载或执行分辨率校准
+    3. 校准档案的持久化
+    4. 脚本动作前的结果新鲜度检查和结果年龄统计
+    """
+    
+    # 默认配置
+    DEFAULT_CONFIG = {
+        'calibration_anchor': 'static/role-dungeon/开始挑战.png',     # 校准锚点模板（相对项目根目录）
+        'profile_path': os.path.join(ENGINE_DIR, 'cache', 'calibration_profiles.json'),
+        'calibrate_on_connect': True,                                 # 窗口连接时自动校准
+        'max_result_age_ms': 300                                      # 动作前识别结果的默认最大年龄（毫秒）
+    }
+    
+    # 校准锚点在识别器中的模板名称
+    ANCHOR_TEMPLATE = '__calibration_anchor__'
+    
+    def __init__(self, image_recognition: Optional[ImageRecognition] = None):
+        """
+        初始化图像识别服务
+        
+        Args:
+            image_recognition: 共享的图像识别器，None时自动创建
+        """
+        super().__init__("RecognitionService")
+        self.image_recognition = image_recognition or ImageRecognition(backend='cpu')
+        self.profiles: Optional[CalibrationProfiles] = None
+        
+        # 校准状态
+        self._calibration_lock = threading.Lock()
+        self.calibration: Optional[Dict[str, Any]] = None  # 当前生效的校准结果
+        
+        # 窗口不可用（最小化、被遮挡、关闭）时暂停识别
+        self.paused = False
+        self._calibrate_on_resume = False
+        
+        # 从截图到动作的结果年龄分布
+        self.action_ages = AgeHistogram()
+        
+        # 依赖的服务
+        self.window_service = None
+    
+    def initialize(self, config: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        初始化图像识别服务
+        
+        Args:
+            config: 服务配置
+        
+        Returns:
+            bool: 初始化是否成功
+        """
+        try:
+            self.log("正在初始化图像识别服务...", "INFO")
+            
+            self.set_config(dict(self.DEFAULT_CONFIG, **(config or {})))
+            self.profiles = CalibrationProfiles(self._config['profile_path'])
+            
+            self.is_initialized = True
+            self.log("图像识别服务初始化成功", "INFO")
+            return True
+        
+        except Exception as e:
+            self.handle_error(e, "图像识别服务初始化失败")
+            return False
+    
+    def start(self) -> bool:
+        """
+        启动图像识别服务
+        
+        Returns:
+            bool: 启动是否成功
+        """
+        if not self.is_initialized:
+            self.log("图像识别服务未初始化，无法启动", "ERROR")
+            return False
+        
+        self.is_running = True
+        self.log("图像识别服务已启动", "INFO")
+        return True
+    
+    def stop(self) -> bool:
+        """
+        停止图像识别服务
+        
+        Returns:
+            bool: 停止是否成功
+        """
+        try:
+            self.image_recognition.shutdown()
+            self.is_running = False
+            self.log("图像识别服务已停止", "INFO")
+            return True
+        
+        except Exception as e:
+            self.handle_error(e, "图像识别服务停止失败")
+            return False
+    
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取图像识别服务状态
+        
+        Returns:
+            Dict[str, Any]: 服务状态
+        """
+        return {
+            "service_name": self.service_name,
+            "is_initialized": self.is_initialized,
+            "is_running": self.is_running,
+            "paused": self.paused,
+            "action_age": self.action_ages.get_stats(),
+            "ui_scale": self.image_recognition.ui_scale,
+            "calibration": self.calibration,
+            "template_count": len(self.image_recognition.templates),
+            "template_cache": (self.image_recognition.template_cache.get_stats()
+                               if self.image_recognition.template_cache else None),
+            "prefilter": {
+                "enabled": self.image_recognition.prefilter,
+                "stages": self.image_recognition.get_prefilter_stats()
+            }
+        }
+    
+    def set_dependencies(self, window_service=None):
+        """
+        设置依赖的服务
+        
+        Args:
+            window_service: 窗口服务实例
+        """
+        self.window_service = window_service
+        if window_service is not None:
+            window_service.add_window_listener(self._on_window_event)
+            # 截图线程按识别器需要的格式存储帧，识别时无需再转换
+            window_service.set_capture_format(self.image_recognition.frame_format)
+        self.log("服务依赖已设置", "INFO")
+    
+    def calibrate(self, force: bool = False, anchor_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        校准当前窗口的UI缩放比例
+        
+        同一窗口尺寸已有校准档案时直接使用档案，force为True时重新校准
+        
+        Args:
+            force: 是否忽略已有档案重新校准
+            anchor_path: 锚点模板路径，None时使用配置的锚点
+        
+        Returns:
+            Dict[str, Any]: 校准结果
+        """
+        if not self.window_service:
+            return {"success": False, "error": "窗口服务不可用"}
+        if self.paused:
+            # 窗口恢复后再校准
+            self._calibrate_on_resume = True
+            return {"success": False, "error": "窗口不可用，识别已暂停"}
+        
+        with self._calibration_lock:
+            screenshot = self.window_service.capture_window(self.image_recognition.frame_format)
+            if screenshot is None:
+                return {"success": False, "error": "窗口截图失败"}
+            
+            height, width = screenshot.shape[:2]
+            
+            # 1. 优先使用已保存的档案
+            profile = None if force else self.profiles.get(width, height)
+            if profile:
+                self._apply_calibration(width, height, profile, 'profile')
+                return {"success": True, "source": "profile", "calibration": self.calibration}
+            
+            # 2. 用锚点模板执行校准
+            anchor_path = anchor_path or self._config['calibration_anchor']
+            if not os.path.isabs(anchor_path):
+                anchor_path = os.path.join(PROJECT_ROOT, anchor_path)
+            
+            # 锚点按原图加载，不受当前UI缩放比例影响
+            if not self.image_recognition.load_template(self.ANCHOR_TEMPLATE, anchor_path):
+                return {"success": False, "error": f"无法加载校准锚点: {anchor_path}"}
+            
+            try:
+                success, scale, confidence = self.image_recognition.calibrate(screenshot, self.ANCHOR_TEMPLATE)
+            finally:
+                self.image_recognition.templates.pop(self.ANCHOR_TEMPLATE, None)
+            
+            if not success:
+                self.log(f"分辨率校准失败（{width}x{height}），最佳置信度: {confidence:.3f}，继续使用多尺度搜索", "WARN")
+                return {"success": False, "error": "锚点未在画面中找到", "confidence": confidence}
+            
+            anchor = os.path.basename(anchor_path)
+            self.profiles.save(width, height, scale, anchor, confidence)
+            self._apply_calibration(width, height, self.profiles.get(width, height), 'calibrated')
+            return {"success": True, "source": "calibrated", "calibration": self.calibration}
+    
+    def match(self, template_name: str, threshold: float = 0.8) -> Optional[MatchResult]:
+        """
+        在当前帧中匹配模板（供脚本逻辑使用）
+        
+        Args:
+            template_name: 模板名称
+            threshold: 匹配阈值
+        
+        Returns:
+            MatchResult: 带帧序号和截图时间的结果，识别暂停或截图失败时返回None
+        """
+        if not self.window_service or self.paused:
+            return None
+        frame = self.window_service.capture_frame(self.image_recognition.frame_format)
+        if frame is None:
+            return None
+        return self.image_recognition.match_template(frame, template_name, threshold)
+    
+    def ensure_fresh(self, result: MatchResult, max_age_ms: Optional[float] = None,
+                     threshold: float = 0.8) -> MatchResult:
+        """
+        保证动作使用的结果不超过max_age_ms，过期时在更新的一帧中只对命中区域重新验证
+        
+        Args:
+            result: 匹配结果
+            max_age_ms: 最大年龄（毫秒），None使用配置的max_result_age_ms
+            threshold: 重新验证的匹配阈值
+        
+        Returns:
+            MatchResult: 未过期时原样返回；否则返回重新验证的结果（识别暂停或没有新帧时视为未找到）
+        """
+        if max_age_ms is None:
+            max_age_ms = self._config.get('max_result_age_ms')
+        if result.is_fresh(max_age_ms):
+            return result
+        
+        frame = None
+        if self.window_service and not self.paused:
+            frame = self.window_service.wait_next_frame(result.frame_id, self.image_recognition.frame_format)
+        if frame is None:
+            return MatchResult(False, None, 0.0, result.frame_id, result.timestamp, result.template)
+        return self.image_recognition.reverify(frame, result, threshold)
+    
+    def record_action(self, result: MatchResult) -> None:
+        """
+        记录一次基于该结果的动作，统计从截图到动作的年龄
+        
+        Args:
+            result: 动作使用的匹配结果
+        """
+        self.action_ages.record(result.age_ms())
+    
+    def set_ui_scale(self, scale: Optional[float]) -> None:
+        """
+        手动设置UI缩放比例
+        
+        Args:
+            scale: 缩放比例，None表示清除校准恢复多尺度搜索
+        """
+        with self._calibration_lock:
+            self.image_recognition.set_ui_scale(scale)
+            self.calibration = None if scale is None else {"scale": float(scale), "source": "manual"}
+    
+    def _apply_calibration(self, width: int, height: int, profile: Dict[str, Any], source: str) -> None:
+        """
+        应用校准结果并通知前端
+        
+        Args:
+            width: 窗口宽度
+            height: 窗口高度
+            profile: 校准档案
+            source: 校准结果来源（'profile'或'calibrated'）
+        """
+        self.image_recognition.set_ui_scale(profile['scale'])
+        self.calibration = dict(profile, window_size=CalibrationProfiles.key(width, height), source=source)
+        
+        self.log(f"UI缩放比例: {profile['scale']:.2f}（{self.calibration['window_size']}，来源: {source}）", "INFO")
+        self.send_response('calibration_updated', self.calibration)
+    
+    def _on_window_event(self, event: str, data: Dict[str, Any]) -> None:
+        """
+        窗口事件回调 - 窗口连接后在后台执行校准，避免阻塞set_window命令；
+        窗口不可用时暂停识别，恢复后补做暂停期间跳过的校准
+        
+        Args:
+            event: 事件名称
+            data: 事件数据
+        """
+        if event == 'connected':
+            self.paused = False
+            if self._config.get('calibrate_on_connect', True):
+                threading.Thread(target=self.calibrate, daemon=True).start()
+        elif event == 'state_changed':
+            self.paused = not data.get('usable', True)
+            self.log(f"窗口状态: {data.get('state')}，识别{'已暂停' if self.paused else '已恢复'}", "INFO")
+            if not self.paused and self._calibrate_on_resume:
+                self._calibrate_on_resume = False
+                threading.Thread(target=self.calibrate, daemon=True).start()
+        elif event == 'disconnected':
+            self.paused = False
+            self._calibrate_on_resume = False
+
+
+class RecognitionCommandHandler(BaseCommandHandler):
+    """
+    图像识别命令处理器 - 处理分辨率校准相关的命令
+    """
+    
+    def __init__(self, recognition_service: RecognitionService):
+        """
+        初始化图像识别命令处理器
+        
+        Args:
+            recognition_service: 图像识别服务实例
+        """
+        super().__init__("RecognitionCommandHandler")
+        self.recognition_service = recognition_service
+    
+    def get_supported_actions(self) -> list:
+        """获取支持的命令列表"""
+        return [
+            'calibrate_resolution',
+            'set_ui_scale',
+            'get_recognition_status'
+        ]
+    
+    def get_concurrent_actions(self) -> list:
+        """状态查询不排在慢命令之后，并发执行"""
+        return ['get_recognition_status']
+    
+    def handle_command(self, action: str, cmd: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        处理图像识别相关命令
+        
+        Args:
+            action: 命令名称
+            cmd: 命令参数
+        
+        Returns:
+            Dict[str, Any]: 处理结果
+        """
+        if action == 'calibrate_resolution':
+            return self._handle_calibrate_resolution(cmd)
+        elif action == 'set_ui_scale':
+            return self._handle_set_ui_scale(cmd)
+        elif action == 'get_recognition_status':
+            return self._handle_get_recognition_status(cmd)
+        else:
+            return {
+                "success": False,
+                "error": f"图像识别命令处理器不支持命令: {action}"
+            }
+    
+    def _handle_calibrate_resolution(self, cmd: Dict[str, Any]) -> Dict[str, Any]:
+        """处理分辨率校准命令"""
+        try:
+            return self.recognition_service.calibrate(
+                force=bool(cmd.get('force', False)),
+                anchor_path=cmd.get('anchor_path')
+            )
+        
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    def _handle_set_ui_scale(self, cmd: Dict[str, Any]) -> Dict[str, Any]:
+        """处理设置UI缩放比例命令"""
+        scale = cmd.get('scale')
+        
+        try:
+            if scale is not None and float(scale) <= 0:
+                return {
+                    "success": False,
+                    "error": "scale必须大于0"
+                }
+            
+            self.recognition_service.set_ui_scale(None if scale is None else float(scale))
+            
+            return {
+                "success": True,
+                "ui_scale": self.recognition_service.image_recognition.ui_scale
+            }
+        
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    def _handle_get_recognition_status(self, cmd: Dict[str, Any]) -> Dict[str, Any]:
+        """处理获取图像识别状态命令"""
+        try:
+            return {
+                "success": True,
+                "status": self.recognition_service.get_status()
+            }
+        
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
@@ -29,6 +29,9 @@ class ScriptService(BaseService):
         self.script_thread: Optional[threading.Thread] = None
         self.stop_event = threading.Event()
         self.pause_event = threading.Event()
+        # 窗口可用（未最小化、遮挡或关闭）时设置，不可用期间脚本迭代自动等待
+        self.window_ready = threading.Event()
+        self.window_ready.set()
         
         # 脚本状态
         self.script_running = False
@@ -132,6 +135,7 @@ class ScriptService(BaseService):
             "script_status": {
                 "running": self.script_running,
                 "paused": self.script_paused,
+                "waiting_for_window": self.script_running and not self.window_ready.is_set(),
                 "current_script": self.current_script_name,
                 "runtime_seconds": runtime,
                 "statistics": {
@@ -153,6 +157,8 @@ class ScriptService(BaseService):
         """
         self.window_service = window_service
         self.recognition_service = recognition_service
+        if window_service is not None:
+            window_service.add_window_listener(self._on_window_event)
         self.log("服务依赖已设置", "INFO")
     
     def set_script_logic(self, script_logic: Callable):
@@ -295,6 +301,19 @@ class ScriptService(BaseService):
             self.handle_error(e, "脚本恢复失败")
             return False
     
+    def _on_window_event(self, event: str, data: Dict[str, Any]) -> None:
+        """
+        窗口事件回调 - 窗口断开或不可用时脚本迭代自动等待，重新连接或恢复可用后继续
+        
+        Args:
+            event: 事件名称（connected、disconnected、state_changed）
+            data: 事件数据
+        """
+        if event == 'connected' or (event == 'state_changed' and data.get('usable')):
+            self.window_ready.set()
+        elif event in ('disconnected', 'state_changed'):
+            self.window_ready.clear()
+    
     def _reset_script_state(self):
         """重置脚本状态和统计"""
         self.stop_event.clear()
@@ -326,6 +345,17 @@ class ScriptService(BaseService):
                     
                     self.log("脚本已恢复执行", "INFO")
                 
+                # 窗口不可用时等待恢复，不在黑屏或过期的画面上空转
+                if not self.window_ready.is_set():
+                    self.log("窗口不可用，脚本等待窗口恢复...", "INFO")
+                    while not self.window_ready.is_set() and not self.stop_event.is_set():
+                        self.window_ready.wait(timeout=0.5)
+                    
+                    if self.stop_event.is_set():
+                        break
+                    
+                    self.log("窗口已恢复，脚本继续执行", "INFO")
+                
                 # 执行一次脚本迭代
                 try:
                     self.total_iterations += 1
@@ -385,6 +415,10 @@ class ScriptCommandHandler(BaseCommandHandler):
             'set_script_config'
         ]
     
+    def get_concurrent_actions(self) -> list:
+        """状态查询不排在慢命令之后，并发执行"""
+        return ['get_script_status']
+    
     def handle_command(self, action: str, cmd: Dict[str, Any]) -> Dict[str, Any]:
         """
         处理脚本相关命令
@@ -2,12 +2,16 @@
 窗口服务 - 负责游戏窗口的检测、连接、激活等功能
 封装了所有与窗口操作相关的逻辑
 """
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Tuple, Callable
+import threading
 import time
 
 from core.base_service import BaseService
 from core.command_handler import BaseCommandHandler
 from window_capture import WindowCapture
+from frame_channel import FrameChannel
+from frame_source import ReplayFrameSource
+from window_monitor import STATE_CLOSED, STATE_NORMAL, WindowStateMonitor
 
 
 class WindowService(BaseService):
@@ -19,8 +23,22 @@ class WindowService(BaseService):
     2. 窗口连接和设置
     3. 窗口激活和置顶
     4. 窗口状态管理
+    5. 截图线程的启停（窗口连接或回放时由截图线程统一截图）
+    6. 窗口状态监控（窗口最小化、被遮挡或关闭时暂停实时截图，恢复后继续）
+    7. 实时预览（截图线程的帧缩小编码后写入共享内存通道，只通过stdio发送通知）
     """
     
+    # 默认配置
+    DEFAULT_CONFIG = {
+        'capture_fps': 10.0,          # 截图线程帧率
+        'auto_select_backend': True,  # 首次连接窗口时通过计时测试自动选择截图后端
+        'state_probe_interval': 0.5,  # 窗口状态探测间隔（秒）
+        'pause_when_unusable': True,  # 窗口不可用时暂停实时截图
+        'preview_fps': FrameChannel.DEFAULT_FPS,          # 预览帧率
+        'preview_quality': FrameChannel.DEFAULT_QUALITY,  # 预览JPEG质量
+        'preview_max_side': FrameChannel.DEFAULT_MAX_SIDE  # 预览图像最大边长
+    }
+    
     def __init__(self):
         """初始化窗口服务"""
         super().__init__("WindowService")
@@ -28,6 +46,12 @@ class WindowService(BaseService):
         self.current_window_hwnd: Optional[int] = None
         self.current_window_title: Optional[str] = None
         self.is_window_connected = False
+        self.window_monitor: Optional[WindowStateMonitor] = None
+        self.frame_channel: Optional[FrameChannel] = None
+        self._benchmark_lock = threading.Lock()  # 同一时间只进行一次截图后端测试
+        
+        # 窗口事件监听器，回调签名为 listener(event, data)
+        self._window_listeners: List[Callable[[str, Dict[str, Any]], None]] = []
     
     def initialize(self, config: Optional[Dict[str, Any]] = None) -> bool:
         """
@@ -46,8 +70,17 @@ class WindowService(BaseService):
             self.window_capture = WindowCapture()
             
             # 设置配置
-            if config:
-                self.set_config(config)
+            self.set_config(dict(self.DEFAULT_CONFIG, **(config or {})))
+            self.window_capture.scheduler.set_fps(float(self._config['capture_fps']))
+            self.window_monitor = WindowStateMonitor(
+                self._probe_window_state, self._on_window_state_change,
+                interval=float(self._config['state_probe_interval'])
+            )
+            self.frame_channel = FrameChannel(
+                self._latest_preview_frame, lambda notification: self.send_response('preview_frame', notification),
+                fps=float(self._config['preview_fps']), quality=int(self._config['preview_quality']),
+                max_side=int(self._config['preview_max_side'])
+            )
             
             self.is_initialized = True
             self.log("窗口服务初始化成功", "INFO")
@@ -88,6 +121,13 @@ class WindowService(BaseService):
             # 如果有连接的窗口，先断开连接
             if self.is_window_connected:
                 self.disconnect_window()
+            if self.window_monitor:
+                self.window_monitor.stop()
+            if self.frame_channel:
+                self.frame_channel.close()
+            if self.window_capture:
+                self.window_capture.stop_capture()
+                self.window_capture.window_registry.stop()
             
             self.is_running = False
             self.log("窗口服务已停止", "INFO")
@@ -113,15 +153,22 @@ class WindowService(BaseService):
                 "hwnd": self.current_window_hwnd,
                 "title": self.current_window_title
             } if self.is_window_connected else None,
-            "platform": self.window_capture.platform if self.window_capture else None
+            "platform": self.window_capture.platform if self.window_capture else None,
+            "frame_source": self.window_capture.frame_source.get_info() if self.window_capture else None,
+            "capture": self.window_capture.scheduler.get_stats() if self.window_capture else None,
+            "window_registry": self.window_capture.window_registry.get_stats() if self.window_capture else None,
+            "capture_backend": self.window_capture.get_capture_backend_info() if self.window_capture else None,
+            "window_state": self.window_monitor.get_stats() if self.window_monitor and self.is_window_connected else None,
+            "preview": self.frame_channel.get_info() if self.frame_channel else None
         }
     
-    def find_windows(self, keyword: str = "") -> List[Tuple[int, str]]:
+    def find_windows(self, keyword: str = "", refresh: bool = False) -> List[Tuple[int, str]]:
         """
         查找窗口
         
         Args:
             keyword: 搜索关键词
+            refresh: 是否先重新枚举窗口（默认直接查询窗口注册表的索引）
             
         Returns:
             List[Tuple[int, str]]: 窗口列表 (hwnd, title)
@@ -134,12 +181,12 @@ class WindowService(BaseService):
             self.log(f"开始查找窗口，关键词: '{keyword}'", "INFO")
             start_time = time.time()
             
-            windows = self.window_capture.find_windows(keyword)
+            windows = self.window_capture.find_windows(keyword, refresh=refresh)
             
             end_time = time.time()
             duration = end_time - start_time
             
-            self.log(f"窗口查找完成，找到 {len(windows)} 个窗口，耗时: {duration:.2f}秒", "INFO")
+            self.log(f"窗口查找完成，找到 {len(windows)} 个窗口，耗时: {duration * 1000:.2f}毫秒", "INFO")
             
             # 记录找到的窗口
             for i, (hwnd, title) in enumerate(windows):
@@ -173,8 +220,22 @@ class WindowService(BaseService):
                 self.current_window_hwnd = hwnd
                 self.current_window_title = self.window_capture.window_title
                 self.is_window_connected = True
+                # 之前的窗口不可用时截图处于暂停状态，新窗口从正常状态开始
+                self.window_capture.resume_capture()
+                self.window_capture.start_capture()
+                if self.window_monitor:
+                    self.window_monitor.start()
+                # 截图后端的测试需要目标窗口，在首次连接时于后台线程进行，
+                # 每个后端要计时截图多次，不能占用窗口命令通道
+                if self._config.get('auto_select_backend') and self.window_capture.backend_benchmark is None:
+                    threading.Thread(target=self._auto_benchmark, args=(hwnd,),
+                                     name="CaptureBenchmark", daemon=True).start()
                 
                 self.log(f"窗口连接成功: {self.current_window_title}", "INFO")
+                self._notify_window_listeners('connected', {
+                    'hwnd': hwnd,
+                    'title': self.current_window_title
+                })
                 return True
             else:
                 self.log(f"窗口连接失败，句柄: {hwnd}", "ERROR")
@@ -202,6 +263,13 @@ class WindowService(BaseService):
                 self.current_window_hwnd = None
                 self.current_window_title = None
                 self.is_window_connected = False
+                if self.window_monitor:
+                    self.window_monitor.stop()
+                if self.window_capture and self.window_capture.is_live:
+                    self.window_capture.stop_capture()
+                if self.window_capture:
+                    self.window_capture.resume_capture()
+                self._notify_window_listeners('disconnected', {})
             
             return True
             
@@ -209,6 +277,99 @@ class WindowService(BaseService):
             self.handle_error(e, "断开窗口连接失败")
             return False
     
+    def add_window_listener(self, listener: Callable[[str, Dict[str, Any]], None]) -> None:
+        """
+        注册窗口事件监听器
+        
+        Args:
+            listener: 回调函数，参数为事件名称（'connected'、'disconnected'、'state_changed'）和事件数据
+        """
+        if listener not in self._window_listeners:
+            self._window_listeners.append(listener)
+    
+    def _notify_window_listeners(self, event: str, data: Dict[str, Any]) -> None:
+        """
+        通知所有窗口事件监听器，单个监听器出错不影响其他监听器
+        
+        Args:
+            event: 事件名称
+            data: 事件数据
+        """
+        for listener in list(self._window_listeners):
+            try:
+                listener(event, data)
+            except Exception as e:
+                self.handle_error(e, f"窗口事件监听器执行失败: {event}")
+    
+    def _probe_window_state(self) -> Optional[str]:
+        """
+        探测当前窗口状态（窗口状态监控的探测函数）
+        
+        窗口已关闭时按标题查找同名的新窗口（如游戏重启），找到则切换过去
+        
+        Returns:
+            str: 窗口状态，未连接窗口时返回None
+        """
+        if not self.is_window_connected or not self.window_capture:
+            return None
+        
+        state = self.window_capture.probe_window_state()
+        if state == STATE_CLOSED and self._reattach_window():
+            state = self.window_capture.probe_window_state()
+        return state
+    
+    def _reattach_window(self) -> bool:
+        """
+        切换到与当前窗口同名的新窗口
+        
+        Returns:
+            bool: 是否找到并切换
+        """
+        title = self.current_window_title
+        if not title:
+            return False
+        
+        for hwnd, window_title in self.window_capture.find_windows(title):
+            if window_title == title and hwnd != self.current_window_hwnd:
+                if not self.window_capture.set_window(hwnd):
+                    continue
+                self.log(f"窗口已重新出现，切换到新句柄: {hwnd}", "INFO")
+                self.current_window_hwnd = hwnd
+                self._notify_window_listeners('connected', {
+                    'hwnd': hwnd,
+                    'title': title,
+                    'reattached': True
+                })
+                return True
+        return False
+    
+    def _on_window_state_change(self, previous: str, state: str) -> None:
+        """
+        窗口状态变化回调：窗口不可用时暂停实时截图，恢复正常后继续，并通知前端和监听器
+        
+        Args:
+            previous: 之前的状态
+            state: 新状态
+        """
+        usable = state == STATE_NORMAL
+        self.log(f"窗口状态变化: {previous} -> {state}", "INFO" if usable else "WARN")
+        
+        if self._config.get('pause_when_unusable', True) and self.window_capture.is_live:
+            if usable:
+                self.window_capture.resume_capture()
+            else:
+                self.window_capture.pause_capture()
+        
+        data = {
+            'hwnd': self.current_window_hwnd,
+            'title': self.current_window_title,
+            'state': state,
+            'previous': previous,
+            'usable': usable
+        }
+        self.send_response('window_state', data)
+        self._notify_window_listeners('state_changed', data)
+    
     def activate_window(self) -> bool:
         """
         激活当前窗口（置顶）
@@ -263,32 +424,299 @@ class WindowService(BaseService):
             self.handle_error(e, "取消窗口置顶失败")
             return False
     
-    def capture_window(self):
+    def capture_window(self, fmt: str = 'bgr'):
         """
         捕获当前窗口截图
         
+        Args:
+            fmt: 截图格式，'bgr'、'gray'或'gray_half'
+        
         Returns:
             numpy.ndarray: 截图数据，失败返回None
         """
-        if not self.is_window_connected or not self.window_capture:
+        frame = self.capture_frame(fmt)
+        return frame.image if frame is not None else None
+    
+    def capture_frame(self, fmt: str = 'bgr'):
+        """
+        从当前帧来源读取一帧（实时截图需要已连接窗口，回放不需要）
+        
+        Args:
+            fmt: 截图格式，'bgr'、'gray'或'gray_half'
+        
+        Returns:
+            Frame: 帧数据（图像、帧序号、时间戳），失败返回None
+        """
+        if not self.window_capture or (self.window_capture.is_live and not self.is_window_connected):
             self.log("没有连接的窗口，无法截图", "ERROR")
             return None
         
         try:
-            screenshot = self.window_capture.capture()
+            frame = self.window_capture.capture_frame(fmt=fmt)
             
-            if screenshot is not None:
-                height, width = screenshot.shape[:2]
-                self.log(f"窗口截图成功，尺寸: {width}x{height}", "INFO")
+            if frame is not None:
+                height, width = frame.shape[:2]
+                self.log(f"窗口截图成功，尺寸: {width}x{height}，帧: {frame.frame_id}", "INFO")
             else:
                 self.log("窗口截图失败", "ERROR")
             
-            return screenshot
+            return frame
             
         except Exception as e:
             self.handle_error(e, "窗口截图失败")
             return None
     
+    def wait_next_frame(self, after_id: Optional[int] = None, fmt: str = 'bgr', timeout: float = 1.0):
+        """
+        等待比after_id更新的一帧（不记录日志，供识别和脚本在动作前重新取帧）
+        
+        Args:
+            after_id: 已使用过的帧序号，None表示下一帧
+            fmt: 截图格式，'bgr'、'gray'或'gray_half'
+            timeout: 最长等待时间（秒）
+        
+        Returns:
+            Frame: 新帧，没有可用的帧时返回None
+        """
+        if not self.window_capture or (self.window_capture.is_live and not self.is_window_connected):
+            return None
+        try:
+            return self.window_capture.wait_next_frame(after_id, timeout=timeout, fmt=fmt)
+        except Exception as e:
+            self.handle_error(e, "等待新帧失败")
+            return None
+    
+    def set_frame_source(self, source_type: str = 'live', path: Optional[str] = None, fps: Optional[float] = None,
+                         loop: bool = False, preload: bool = False) -> bool:
+        """
+        切换帧来源
+        
+        Args:
+            source_type: 'live' 实时截图，'replay' 回放PNG目录或视频文件
+            path: 回放路径
+            fps: 回放速率，None按原始时间戳，0尽可能快，大于0为固定帧率
+            loop: 回放结束后是否循环
+            preload: 是否预先解码所有回放帧
+            
+        Returns:
+            bool: 是否切换成功
+        """
+        if not self.window_capture:
+            self.log("窗口捕获未初始化", "ERROR")
+            return False
+        
+        try:
+            if source_type == 'live':
+                self.window_capture.set_frame_source(None)
+                # 实时截图只在窗口连接时运行截图线程
+                if not self.is_window_connected:
+                    self.window_capture.stop_capture()
+                elif (self.window_monitor and not self.window_monitor.usable
+                      and self._config.get('pause_when_unusable', True)):
+                    self.window_capture.pause_capture()
+            elif source_type == 'replay':
+                if not path:
+                    self.log("回放来源缺少路径", "ERROR")
+                    return False
+                self.window_capture.set_frame_source(ReplayFrameSource(path, fps=fps, loop=loop, preload=preload))
+                # 回放不依赖窗口状态
+                self.window_capture.resume_capture()
+                self.window_capture.start_capture()
+            else:
+                self.log(f"未知的帧来源类型: {source_type}", "ERROR")
+                return False
+            
+            self.log(f"帧来源已切换: {self.window_capture.frame_source.get_info()}", "INFO")
+            return True
+            
+        except Exception as e:
+            self.handle_error(e, f"切换帧来源失败: {source_type}")
+            return False
+    
+    def set_capture_format(self, fmt: str) -> bool:
+        """
+        设置截图线程的帧存储格式（通常由图像识别服务按识别器需要的格式设置）
+        
+        Args:
+            fmt: 'bgr'、'gray'或'gray_half'
+            
+        Returns:
+            bool: 是否设置成功
+        """
+        if not self.window_capture:
+            return False
+        
+        try:
+            self.window_capture.set_capture_format(fmt)
+            return True
+        except ValueError as e:
+            self.log(str(e), "ERROR")
+            return False
+    
+    def set_capture_fps(self, fps: float) -> bool:
+        """
+        设置截图线程帧率
+        
+        Args:
+            fps: 截图帧率（大于0）
+            
+        Returns:
+            bool: 是否设置成功
+        """
+        if not self.window_capture or fps <= 0:
+            return False
+        
+        self.window_capture.scheduler.set_fps(fps)
+        self._config['capture_fps'] = fps
+        self.log(f"截图帧率已设置为 {fps:.1f} fps", "INFO")
+        return True
+    
+    def start_preview(self, **options) -> Optional[Dict[str, Any]]:
+        """
+        启动实时预览（只读取截图线程已有的帧，不额外截图）
+        
+        Args:
+            **options: 预览参数 fps、quality、max_side、encoding
+            
+        Returns:
+            Dict[str, Any]: 预览通道信息（文件路径、槽位布局），启动失败返回None
+        """
+        if not self.frame_channel:
+            return None
+        
+        self.frame_channel.configure(**options)
+        if not self.frame_channel.start():
+            self.log("实时预览启动失败", "ERROR")
+            return None
+        
+        info = self.frame_channel.get_info()
+        self.log(f"实时预览已启动: {info['fps']:.1f} fps, 最大边长 {info['max_side']}, {info['encoding']}", "INFO")
+        return info
+    
+    def stop_preview(self) -> None:
+        """停止实时预览"""
+        if self.frame_channel and self.frame_channel.is_running:
+            self.frame_channel.stop()
+            self.log("实时预览已停止", "INFO")
+    
+    def set_preview_config(self, **options) -> Optional[Dict[str, Any]]:
+        """
+        调整预览参数（运行中立即生效）
+        
+        Args:
+            **options: 预览参数 fps、quality、max_side、encoding
+            
+        Returns:
+            Dict[str, Any]: 预览通道信息
+        """
+        if not self.frame_channel:
+            return None
+        
+        self.frame_channel.configure(**options)
+        return self.frame_channel.get_info()
+    
+    def publish_preview_frame(self, frame) -> Optional[Dict[str, Any]]:
+        """
+        把一帧写入预览通道并发送通知（如单次截图）
+        
+        Args:
+            frame: Frame
+            
+        Returns:
+            Dict[str, Any]: 帧通知，失败返回None
+        """
+        if not self.frame_channel or frame is None:
+            return None
+        
+        notification = self.frame_channel.publish(frame)
+        if notification is not None:
+            self.send_response('preview_frame', notification)
+        return notification
+    
+    def _latest_preview_frame(self):
+        """
+        预览通道取帧：只取截图线程的最新帧，截图线程未运行时不截图
+        
+        Returns:
+            Frame: 最新帧，没有时返回None
+        """
+        if not self.window_capture or not self.window_capture.scheduler.is_running:
+            return None
+        return self.window_capture.scheduler.latest()
+    
+    def _auto_benchmark(self, hwnd: int) -> None:
+        """
+        首次连接窗口后的截图后端测试（后台线程）
+        
+        Args:
+            hwnd: 发起测试时连接的窗口句柄，测试开始前窗口已断开或切换时跳过
+        """
+        with self._benchmark_lock:
+            if not self.is_window_connected or self.current_window_hwnd != hwnd:
+                return
+            if self.window_capture.backend_benchmark is not None:
+                return
+            report = self._run_benchmark(None, True)
+        if report is not None:
+            self.send_response('capture_benchmark_completed', {
+                'hwnd': hwnd,
+                'benchmark': report,
+                'capture_backend': self.window_capture.capture_backend
+            })
+    
+    def benchmark_capture_backends(self, frames: Optional[int] = None, apply: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        对可用的截图后端做计时测试并切换到最快的可用后端
+        
+        Args:
+            frames: 每个后端计时的截图次数，None使用默认值
+            apply: 是否切换到测试选出的后端
+            
+        Returns:
+            Dict[str, Any]: 测试报告，未连接窗口时返回None
+        """
+        with self._benchmark_lock:
+            return self._run_benchmark(frames, apply)
+    
+    def _run_benchmark(self, frames: Optional[int], apply: bool) -> Optional[Dict[str, Any]]:
+        """
+        执行截图后端测试（调用方需持有_benchmark_lock）
+        
+        Args:
+            frames: 每个后端计时的截图次数，None使用默认值
+            apply: 是否切换到测试选出的后端
+            
+        Returns:
+            Dict[str, Any]: 测试报告，未连接窗口或测试失败时返回None
+        """
+        if not self.window_capture or not self.is_window_connected:
+            self.log("未连接窗口，无法测试截图后端", "WARN")
+            return None
+        
+        try:
+            kwargs = {'frames': frames} if frames else {}
+            report = self.window_capture.benchmark_capture_backends(apply=apply, **kwargs)
+            if report is not None:
+                self.log(f"截图后端测试完成，选择: {report['selected']}（当前: {self.window_capture.capture_backend}）", "INFO")
+            return report
+        except Exception as e:
+            self.handle_error(e, "截图后端测试失败")
+            return None
+    
+    def set_capture_backend(self, name: str) -> bool:
+        """
+        手动指定截图后端
+        
+        Args:
+            name: 后端名称
+            
+        Returns:
+            bool: 是否设置成功
+        """
+        if not self.window_capture:
+            return False
+        return self.window_capture.set_capture_backend(name)
+    
     def get_window_info(self) -> Optional[Dict[str, Any]]:
         """
         获取当前窗口信息
@@ -307,7 +735,8 @@ class WindowService(BaseService):
                 "title": self.current_window_title,
                 "rect": window_rect,
                 "scale_factor": getattr(self.window_capture, 'scale_factor', 1.0),
-                "platform": self.window_capture.platform
+                "platform": self.window_capture.platform,
+                "geometry": self.window_capture.geometry.get_info()
             }
             
         except Exception as e:
@@ -339,9 +768,20 @@ class WindowCommandHandler(BaseCommandHandler):
             'deactivate_topmost',
             'get_window_status',
             'capture_window',
-            'disconnect_window'
+            'disconnect_window',
+            'set_frame_source',
+            'set_capture_fps',
+            'benchmark_capture',
+            'set_capture_backend',
+            'start_preview',
+            'stop_preview',
+            'set_preview_config'
         ]
     
+    def get_concurrent_actions(self) -> list:
+        """状态查询不排在慢命令之后，并发执行"""
+        return ['get_window_status']
+    
     def handle_command(self, action: str, cmd: Dict[str, Any]) -> Dict[str, Any]:
         """
         处理窗口相关命令
@@ -367,6 +807,20 @@ class WindowCommandHandler(BaseCommandHandler):
             return self._handle_capture_window(cmd)
         elif action == 'disconnect_window':
             return self._handle_disconnect_window(cmd)
+        elif action == 'set_frame_source':
+            return self._handle_set_frame_source(cmd)
+        elif action == 'set_capture_fps':
+            return self._handle_set_capture_fps(cmd)
+        elif action == 'benchmark_capture':
+            return self._handle_benchmark_capture(cmd)
+        elif action == 'set_capture_backend':
+            return self._handle_set_capture_backend(cmd)
+        elif action == 'start_preview':
+            return self._handle_start_preview(cmd)
+        elif action == 'stop_preview':
+            return self._handle_stop_preview(cmd)
+        elif action == 'set_preview_config':
+            return self._handle_set_preview_config(cmd)
         else:
             return {
                 "success": False,
@@ -376,9 +830,10 @@ class WindowCommandHandler(BaseCommandHandler):
     def _handle_detect_window(self, cmd: Dict[str, Any]) -> Dict[str, Any]:
         """处理窗口检测命令"""
         keyword = cmd.get('keyword', '')
+        refresh = bool(cmd.get('refresh', False))
         
         try:
-            windows = self.window_service.find_windows(keyword)
+            windows = self.window_service.find_windows(keyword, refresh=refresh)
             
             # 转换为前端需要的格式
             window_list = [{'hwnd': hwnd, 'title': title} for hwnd, title in windows]
@@ -536,9 +991,10 @@ class WindowCommandHandler(BaseCommandHandler):
     def _handle_capture_window(self, cmd: Dict[str, Any]) -> Dict[str, Any]:
         """处理窗口截图命令"""
         try:
-            screenshot = self.window_service.capture_window()
+            frame = self.window_service.capture_frame()
             
-            if screenshot is not None:
+            if frame is not None:
+                screenshot = frame.image
                 height, width = screenshot.shape[:2]
                 return {
                     "success": True,
@@ -546,7 +1002,9 @@ class WindowCommandHandler(BaseCommandHandler):
                         "width": width,
                         "height": height,
                         "channels": screenshot.shape[2] if len(screenshot.shape) > 2 else 1
-                    }
+                    },
+                    # preview为True时把截图写入预览通道，前端按通知读取图像
+                    "preview": self.window_service.publish_preview_frame(frame) if cmd.get('preview') else None
                 }
             else:
                 return {
@@ -574,4 +1032,155 @@ class WindowCommandHandler(BaseCommandHandler):
             return {
                 "success": False,
                 "error": str(e)
-            }
\ No newline at end of file
+            }
+    
+    def _handle_set_frame_source(self, cmd: Dict[str, Any]) -> Dict[str, Any]:
+        """处理切换帧来源命令"""
+        try:
+            fps = cmd.get('fps')
+            success = self.window_service.set_frame_source(
+                source_type=cmd.get('source', 'live'),
+                path=cmd.get('path'),
+                fps=None if fps is None else float(fps),
+                loop=bool(cmd.get('loop', False)),
+                preload=bool(cmd.get('preload', False))
+            )
+            
+            return {
+                "success": success,
+                "frame_source": self.window_service.window_capture.frame_source.get_info() if success else None,
+                "error": None if success else "帧来源切换失败"
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    def _handle_set_capture_fps(self, cmd: Dict[str, Any]) -> Dict[str, Any]:
+        """处理设置截图帧率命令"""
+        fps = cmd.get('fps')
+        
+        if fps is None:
+            return {
+                "success": False,
+                "error": "缺少fps参数"
+            }
+        
+        try:
+            success = self.window_service.set_capture_fps(float(fps))
+            
+            return {
+                "success": success,
+                "capture": self.window_service.window_capture.scheduler.get_stats() if success else None,
+                "error": None if success else "fps必须大于0"
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    def _handle_benchmark_capture(self, cmd: Dict[str, Any]) -> Dict[str, Any]:
+        """处理截图后端计时测试命令"""
+        try:
+            frames = cmd.get('frames')
+            report = self.window_service.benchmark_capture_backends(
+                frames=None if frames is None else int(frames),
+                apply=bool(cmd.get('apply', True))
+            )
+            
+            return {
+                "success": report is not None,
+                "benchmark": report,
+                "capture_backend": self.window_service.window_capture.capture_backend if report is not None else None,
+                "error": None if report is not None else "未连接窗口"
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    def _handle_set_capture_backend(self, cmd: Dict[str, Any]) -> Dict[str, Any]:
+        """处理设置截图后端命令"""
+        backend = cmd.get('backend')
+        
+        if not backend:
+            return {
+                "success": False,
+                "error": "缺少backend参数"
+            }
+        
+        try:
+            success = self.window_service.set_capture_backend(backend)
+            
+            return {
+                "success": success,
+                "capture_backend": self.window_service.window_capture.get_capture_backend_info() if success else None,
+                "error": None if success else f"不支持的截图后端: {backend}"
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    @staticmethod
+    def _preview_options(cmd: Dict[str, Any]) -> Dict[str, Any]:
+        """从命令中取出预览参数（fps、quality、max_side、encoding）"""
+        return {key: cmd[key] for key in ('fps', 'quality', 'max_side', 'encoding') if cmd.get(key) is not None}
+    
+    def _handle_start_preview(self, cmd: Dict[str, Any]) -> Dict[str, Any]:
+        """处理启动实时预览命令"""
+        try:
+            info = self.window_service.start_preview(**self._preview_options(cmd))
+            
+            return {
+                "success": info is not None,
+                "preview": info,
+                "error": None if info is not None else "实时预览启动失败"
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    def _handle_stop_preview(self, cmd: Dict[str, Any]) -> Dict[str, Any]:
+        """处理停止实时预览命令"""
+        try:
+            self.window_service.stop_preview()
+            
+            return {
+                "success": True
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    def _handle_set_preview_config(self, cmd: Dict[str, Any]) -> Dict[str, Any]:
+        """处理调整预览参数命令"""
+        try:
+            info = self.window_service.set_preview_config(**self._preview_options(cmd))
+            
+            return {
+                "success": info is not None,
+                "preview": info,
+                "error": None if info is not None else "预览通道不可用"
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+
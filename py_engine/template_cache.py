@@ -0,0 +1,149 @@
+"""
+模板编译缓存模块
+将模板的预处理结果、缩放变体和掩码保存为可内存映射的.npy文件，
+引擎重启后无需重新解码PNG和生成派生数据
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from engine_log import get_logger
+
+logger = get_logger('template_cache')
+
+
+class TemplateCache:
+    """
+    模板编译缓存
+    
+    每个模板对应缓存目录下的一个子目录，目录名由源文件内容哈希和处理流程签名决定：
+    源文件或处理参数任一变化都会得到新的键，旧缓存自然失效。
+    数组以.npy保存并以只读内存映射方式加载，多个引擎进程可以共享同一份页缓存
+    """
+    
+    MANIFEST_FILE = 'manifest.json'
+    
+    def __init__(self, cache_dir: str):
+        """
+        初始化模板缓存
+        
+        Args:
+            cache_dir: 缓存根目录，不存在时在首次写入时创建
+        """
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def make_key(self, source_path: str, pipeline_signature: str) -> Optional[str]:
+        """
+        计算模板的缓存键
+        
+        Args:
+            source_path: 模板源文件路径
+            pipeline_signature: 处理流程签名（版本号和影响派生数据的参数）
+        
+        Returns:
+            str: 缓存键，源文件无法读取时返回None
+        """
+        try:
+            digest = hashlib.sha1()
+            with open(source_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+            digest.update(pipeline_signature.encode('utf-8'))
+            return digest.hexdigest()
+        except OSError as e:
+            logger.warn("Cannot hash template source %s: %s", source_path, e)
+            return None
+    
+    def load(self, key: str) -> Optional[Tuple[Dict[str, np.ndarray], Dict]]:
+        """
+        读取缓存
+        
+        Args:
+            key: 缓存键
+        
+        Returns:
+            tuple: (数组字典, 元数据)，缓存不存在或损坏时返回None
+        """
+        entry_dir = os.path.join(self.cache_dir, key)
+        manifest_path = os.path.join(entry_dir, self.MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            self._count(hit=False)
+            return None
+        
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            arrays = {
+                name: np.load(os.path.join(entry_dir, f"{name}.npy"), mmap_mode='r')
+                for name in manifest['arrays']
+            }
+            self._count(hit=True)
+            return arrays, manifest['meta']
+        
+        except Exception as e:
+            logger.warn("Template cache entry %s is corrupted, rebuilding: %s", key, e)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            self._count(hit=False)
+            return None
+    
+    def store(self, key: str, arrays: Dict[str, np.ndarray], meta: Dict) -> bool:
+        """
+        写入缓存
+        
+        先写入临时目录再重命名，保证并发的读取方不会看到写了一半的缓存
+        
+        Args:
+            key: 缓存键
+            arrays: 数组字典，名称只能包含文件名允许的字符
+            meta: 可JSON序列化的元数据
+        
+        Returns:
+            bool: 是否写入成功
+        """
+        entry_dir = os.path.join(self.cache_dir, key)
+        if os.path.exists(entry_dir):
+            return True
+        
+        temp_dir = os.path.join(self.cache_dir, f".tmp-{key}-{uuid.uuid4().hex}")
+        try:
+            os.makedirs(temp_dir)
+            for name, array in arrays.items():
+                np.save(os.path.join(temp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+            with open(os.path.join(temp_dir, self.MANIFEST_FILE), 'w', encoding='utf-8') as f:
+                json.dump({'arrays': list(arrays), 'meta': meta}, f)
+            os.rename(temp_dir, entry_dir)
+            return True
+        
+        except Exception as e:
+            # 其他进程已经写入同一个键时重命名会失败，属于正常情况
+            if not os.path.exists(entry_dir):
+                logger.warn("Failed to write template cache %s: %s", key, e)
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            return os.path.exists(entry_dir)
+    
+    def get_stats(self) -> Dict[str, int]:
+        """
+        获取缓存命中统计
+        
+        Returns:
+            dict: {'hits', 'misses'}
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+    
+    def _count(self, hit: bool) -> None:
+        """记录一次命中或未命中"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
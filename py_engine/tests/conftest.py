@@ -0,0 +1,10 @@
+"""
+测试公共配置
+引擎模块之间使用顶层导入（如 from engine_log import get_logger），测试时把py_engine加入模块搜索路径
+"""
+import os
+import sys
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ENGINE_DIR not in sys.path:
+    sys.path.insert(0, ENGINE_DIR)
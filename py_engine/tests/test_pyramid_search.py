@@ -0,0 +1,91 @@
+"""
+金字塔搜索测试 - 使用static/role-dungeon中的真实元素图标（细线条的透明模板）
+"""
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from image_recognition import ImageRecognition
+
+
+ICON_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                        'static', 'role-dungeon')
+ELEMENT_ICONS = sorted(p for p in glob.glob(os.path.join(ICON_DIR, '*.png')) if '开始挑战' not in p)
+THRESHOLD = 0.8
+
+pytestmark = pytest.mark.skipif(not ELEMENT_ICONS, reason='缺少元素图标资源')
+
+
+def make_frame(icon_paths, seed=0):
+    """
+    生成1080p测试画面：模糊噪声背景上按alpha混合贴上图标
+    
+    Args:
+        icon_paths: 要贴上的图标路径
+        seed: 随机种子
+    
+    Returns:
+        tuple: (frame, {图标路径: 图标中心坐标})
+    """
+    rng = np.random.default_rng(seed)
+    frame = cv2.GaussianBlur(rng.integers(0, 255, (1080, 1920, 3), dtype=np.uint8), (9, 9), 0)
+    frame = cv2.addWeighted(frame, 0.6, np.full_like(frame, 60), 0.4, 0)
+    centers = {}
+    for index, path in enumerate(icon_paths):
+        icon = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        h, w = icon.shape[:2]
+        x, y = 300 + index * 220 + int(rng.integers(0, 40)), 500 + int(rng.integers(0, 200))
+        alpha = icon[:, :, 3:4].astype(np.float32) / 255
+        roi = frame[y:y + h, x:x + w].astype(np.float32)
+        frame[y:y + h, x:x + w] = (icon[:, :, :3] * alpha + roi * (1 - alpha)).astype(np.uint8)
+        # 模板加载时裁剪到不透明区域，匹配位置为不透明区域的中心
+        ys, xs = np.nonzero(icon[:, :, 3] >= 128)
+        centers[path] = (x + (xs.min() + xs.max() + 1) / 2, y + (ys.min() + ys.max() + 1) / 2)
+    return frame, centers
+
+
+@pytest.fixture(scope='module')
+def recognizer():
+    """加载所有元素图标的识别器（关闭预过滤和磁盘缓存，只测试匹配本身）"""
+    recognition = ImageRecognition(prefilter=False, cache_dir=None)
+    for path in ELEMENT_ICONS:
+        assert recognition.load_template(os.path.basename(path), path)
+    return recognition
+
+
+def test_element_icons_support_pyramid(recognizer):
+    """细线条的透明图标也能生成粗层级模板"""
+    for path in ELEMENT_ICONS:
+        assert recognizer.templates[os.path.basename(path)].pyramid_factor > 1, path
+
+
+def test_pyramid_locates_present_icons(recognizer):
+    """金字塔搜索与逐尺度搜索定位到相同的位置"""
+    frame, centers = make_frame(ELEMENT_ICONS)
+    for path, (center_x, center_y) in centers.items():
+        entry = recognizer.templates[os.path.basename(path)]
+        for mode in ('exhaustive', 'pyramid'):
+            found, position, confidence = recognizer._search(frame, entry, THRESHOLD, mode)
+            assert found, (path, mode, confidence)
+            assert abs(position[0] - center_x) <= 4 and abs(position[1] - center_y) <= 4, (path, mode, position)
+
+
+def test_pyramid_rejects_absent_icon_faster(recognizer):
+    """模板不存在时金字塔搜索不误报，且明显快于逐尺度搜索"""
+    absent = ELEMENT_ICONS[0]
+    frame, _ = make_frame([path for path in ELEMENT_ICONS if path != absent])
+    entry = recognizer.templates[os.path.basename(absent)]
+    
+    elapsed = {}
+    for mode in ('exhaustive', 'pyramid'):
+        start_time = time.perf_counter()
+        found, _, _ = recognizer._search(frame, entry, THRESHOLD, mode)
+        elapsed[mode] = time.perf_counter() - start_time
+        assert not found, mode
+    
+    # 实测约快4-5倍，这里只要求快一倍，避免测试机负载波动导致误报
+    assert elapsed['pyramid'] * 2 < elapsed['exhaustive'], elapsed
@@ -0,0 +1,154 @@
+"""
+ReplayFrameSource测试 - 使用临时PNG目录和timestamps.json
+"""
+import json
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from frame_source import ReplayFrameSource
+
+
+TIMESTAMPS = [10.0, 10.1, 10.3, 10.4]
+
+
+def write_frames(directory, timestamps=TIMESTAMPS, unreadable=()):
+    """
+    写入回放目录：每帧为纯色PNG（像素值为帧序号*10），可选写入timestamps.json
+    
+    Args:
+        directory: 目录（pathlib.Path）
+        timestamps: 各帧的原始时间戳，None表示不写时间戳文件
+        unreadable: 写入无法解码内容的帧序号
+    
+    Returns:
+        list: 文件名列表
+    """
+    names = [f"frame_{i:03d}.png" for i in range(len(timestamps or TIMESTAMPS))]
+    for index, name in enumerate(names):
+        if index in unreadable:
+            (directory / name).write_bytes(b'not a png')
+        else:
+            cv2.imwrite(str(directory / name), np.full((8, 8, 3), index * 10, dtype=np.uint8))
+    if timestamps is not None:
+        (directory / ReplayFrameSource.TIMESTAMPS_FILE).write_text(json.dumps(dict(zip(names, timestamps))))
+    return names
+
+
+def read_all(source, limit=100):
+    """读取来源的所有帧（最多limit帧）"""
+    frames = []
+    while len(frames) < limit:
+        frame = source.read()
+        if frame is None:
+            break
+        frames.append(frame)
+    return frames
+
+
+def test_original_timestamps_preserved(tmp_path):
+    """Frame.timestamp为timestamps.json中的原始时间戳，帧按文件名顺序回放"""
+    write_frames(tmp_path)
+    source = ReplayFrameSource(str(tmp_path), fps=0)
+    
+    frames = read_all(source)
+    
+    assert [f.timestamp for f in frames] == TIMESTAMPS
+    assert [int(f.image[0, 0, 0]) for f in frames] == [0, 10, 20, 30]
+    assert [f.frame_id for f in frames] == [1, 2, 3, 4]
+    assert source.exhausted
+    assert source.read() is None
+
+
+def test_missing_timestamps_use_nominal_fps(tmp_path):
+    """没有时间戳文件时按nominal_fps生成等间隔时间戳"""
+    write_frames(tmp_path, timestamps=None)
+    source = ReplayFrameSource(str(tmp_path), fps=0, nominal_fps=10.0)
+    
+    assert [f.timestamp for f in read_all(source)] == pytest.approx([0.0, 0.1, 0.2, 0.3])
+
+
+def test_pacing_follows_original_timestamps(tmp_path):
+    """fps为None时按原始时间戳的间隔回放"""
+    write_frames(tmp_path)
+    source = ReplayFrameSource(str(tmp_path), fps=None)
+    
+    start_time = time.monotonic()
+    frames = read_all(source)
+    elapsed = time.monotonic() - start_time
+    
+    assert len(frames) == len(TIMESTAMPS)
+    assert elapsed >= 0.38
+    assert elapsed < 1.0
+
+
+def test_pacing_as_fast_as_possible(tmp_path):
+    """fps为0时不等待，即使原始时间戳间隔很大"""
+    write_frames(tmp_path, timestamps=[0.0, 5.0, 10.0, 15.0])
+    source = ReplayFrameSource(str(tmp_path), fps=0)
+    
+    start_time = time.monotonic()
+    frames = read_all(source)
+    
+    assert time.monotonic() - start_time < 0.5
+    assert [f.timestamp for f in frames] == [0.0, 5.0, 10.0, 15.0]
+
+
+def test_pacing_fixed_fps(tmp_path):
+    """fps大于0时按固定帧率回放，时间戳仍为原始时间戳"""
+    write_frames(tmp_path, timestamps=[0.0, 5.0, 10.0, 15.0])
+    source = ReplayFrameSource(str(tmp_path), fps=20.0)
+    
+    start_time = time.monotonic()
+    frames = read_all(source)
+    elapsed = time.monotonic() - start_time
+    
+    assert elapsed >= 0.14
+    assert elapsed < 1.0
+    assert [f.timestamp for f in frames] == [0.0, 5.0, 10.0, 15.0]
+
+
+def test_loop_keeps_timestamps_monotonic(tmp_path):
+    """循环回放时时间戳在原始时间戳上累加回放时长，保持单调递增"""
+    write_frames(tmp_path)
+    source = ReplayFrameSource(str(tmp_path), fps=0, loop=True)
+    
+    frames = read_all(source, limit=len(TIMESTAMPS) * 3)
+    timestamps = [f.timestamp for f in frames]
+    
+    assert len(frames) == len(TIMESTAMPS) * 3
+    assert all(b > a for a, b in zip(timestamps, timestamps[1:]))
+    # 一次回放的时长包含最后一帧的平均间隔
+    duration = TIMESTAMPS[-1] - TIMESTAMPS[0] + (TIMESTAMPS[-1] - TIMESTAMPS[0]) / (len(TIMESTAMPS) - 1)
+    assert timestamps[len(TIMESTAMPS):2 * len(TIMESTAMPS)] == pytest.approx([t + duration for t in TIMESTAMPS])
+    assert not source.exhausted
+
+
+@pytest.mark.parametrize('preload', [False, True])
+def test_unreadable_files_skipped(tmp_path, preload):
+    """无法解码的图片被跳过并计数，不会结束回放"""
+    write_frames(tmp_path, unreadable=(1, 3))
+    source = ReplayFrameSource(str(tmp_path), fps=0, preload=preload)
+    
+    frames = read_all(source)
+    
+    assert [f.timestamp for f in frames] == [TIMESTAMPS[0], TIMESTAMPS[2]]
+    assert [int(f.image[0, 0, 0]) for f in frames] == [0, 20]
+    assert source.unreadable == 2
+    assert source.exhausted
+
+
+def test_close_interrupts_paced_read(tmp_path):
+    """close()使正在等待播放时间的read()立即返回None"""
+    write_frames(tmp_path, timestamps=[0.0, 30.0, 60.0, 90.0])
+    source = ReplayFrameSource(str(tmp_path), fps=None)
+    assert source.read() is not None
+    
+    threading.Timer(0.1, source.close).start()
+    start_time = time.monotonic()
+    
+    assert source.read() is None
+    assert time.monotonic() - start_time < 2.0
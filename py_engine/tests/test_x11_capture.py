@@ -0,0 +1,146 @@
+"""
+X11ShmCapture测试 - 在Xvfb中映射已知颜色的窗口后截图（没有Xvfb时跳过）
+"""
+import ctypes
+import ctypes.util
+import os
+import shutil
+import subprocess
+import time
+
+import numpy as np
+import pytest
+
+from x11_capture import X11ShmCapture
+
+
+SCREEN_SIZE = (640, 480)
+WINDOW_RECT = (50, 40, 120, 80)  # (left, top, width, height)
+WINDOW_COLOR = 0x3366CC          # 24位TrueColor像素值 0xRRGGBB
+WINDOW_BGR = (0xCC, 0x66, 0x33)
+
+pytestmark = pytest.mark.skipif(shutil.which('Xvfb') is None, reason='需要Xvfb')
+
+
+@pytest.fixture(scope='module')
+def display_name():
+    """启动Xvfb，返回显示名称"""
+    read_fd, write_fd = os.pipe()
+    process = subprocess.Popen(
+        ['Xvfb', '-displayfd', str(write_fd), '-screen', '0', f'{SCREEN_SIZE[0]}x{SCREEN_SIZE[1]}x24',
+         '-nolisten', 'tcp'],
+        pass_fds=(write_fd,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    os.close(write_fd)
+    # Xvfb就绪后把显示编号写入-displayfd
+    with os.fdopen(read_fd) as f:
+        number = f.readline().strip()
+    if not number:
+        process.kill()
+        pytest.skip('Xvfb启动失败')
+    
+    yield f':{number}'
+    
+    process.terminate()
+    process.wait(timeout=5)
+
+
+@pytest.fixture
+def window(display_name):
+    """在Xvfb中创建并映射一个纯色窗口，返回窗口ID"""
+    x11 = ctypes.CDLL(ctypes.util.find_library('X11') or 'libX11.so.6')
+    x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    x11.XOpenDisplay.restype = ctypes.c_void_p
+    x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+    x11.XRootWindow.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XRootWindow.restype = ctypes.c_ulong
+    x11.XCreateSimpleWindow.argtypes = [
+        ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_int, ctypes.c_uint, ctypes.c_uint,
+        ctypes.c_uint, ctypes.c_ulong, ctypes.c_ulong
+    ]
+    x11.XCreateSimpleWindow.restype = ctypes.c_ulong
+    x11.XMapWindow.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+    x11.XDestroyWindow.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+    x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+    
+    display = x11.XOpenDisplay(display_name.encode())
+    assert display
+    root = x11.XRootWindow(display, x11.XDefaultScreen(display))
+    left, top, width, height = WINDOW_RECT
+    # 没有窗口管理器，窗口按指定位置显示；服务器在映射时用背景色填充窗口
+    window_id = x11.XCreateSimpleWindow(display, root, left, top, width, height, 0, 0, WINDOW_COLOR)
+    x11.XMapWindow(display, window_id)
+    x11.XSync(display, 0)
+    
+    yield window_id
+    
+    x11.XDestroyWindow(display, window_id)
+    x11.XCloseDisplay(display)
+
+
+@pytest.fixture
+def capture(display_name, window):
+    """连接Xvfb并以测试窗口为目标的截图对象"""
+    shm_capture = X11ShmCapture(display_name)
+    if not shm_capture.available:
+        pytest.skip('Xvfb不支持MIT-SHM')
+    assert shm_capture.set_window(window)
+    
+    # 等待服务器完成窗口绘制
+    deadline = time.monotonic() + 2.0
+    while time.monotonic() < deadline:
+        image = shm_capture.grab()
+        if image is not None and (image == WINDOW_BGR).all():
+            break
+        time.sleep(0.02)
+    
+    yield shm_capture
+    
+    shm_capture.close()
+
+
+def test_grab_returns_window_region(capture):
+    """grab()返回目标窗口区域的BGR图像"""
+    assert capture.get_window_rect() == WINDOW_RECT
+    assert capture.probe_window() == 'normal'
+    
+    image = capture.grab()
+    
+    assert image.shape == (WINDOW_RECT[3], WINDOW_RECT[2], 3)
+    assert image.dtype == np.uint8
+    assert (image == WINDOW_BGR).all()
+
+
+def test_grab_raw_returns_window_region(capture):
+    """grab_raw()返回映射共享内存的4通道图像，通道顺序与raw_format一致"""
+    raw = capture.grab_raw()
+    
+    assert raw.shape == (WINDOW_RECT[3], WINDOW_RECT[2], 4)
+    expected = WINDOW_BGR if capture.raw_format == 'bgra' else WINDOW_BGR[::-1]
+    assert (raw[:, :, :3] == expected).all()
+    # 共享内存在两次截图之间保持不变
+    assert np.shares_memory(raw, capture.grab_raw())
+
+
+def test_output_buffers_reused(capture):
+    """输出缓冲区轮换使用：相邻的截图使用不同缓冲区，BUFFER_COUNT次之后复用同一个"""
+    count = X11ShmCapture.BUFFER_COUNT
+    images = [capture.grab() for _ in range(count + 1)]
+    
+    for i in range(count - 1):
+        assert not np.shares_memory(images[i], images[i + 1])
+    assert np.shares_memory(images[0], images[count])
+    # 每次返回新的视图对象
+    assert images[0] is not images[count]
+
+
+def test_whole_screen_without_window(capture):
+    """未设置目标窗口时截取整个屏幕"""
+    assert capture.set_window(None)
+    
+    image = capture.grab()
+    
+    assert image.shape == (SCREEN_SIZE[1], SCREEN_SIZE[0], 3)
+    left, top, width, height = WINDOW_RECT
+    assert (image[top:top + height, left:left + width] == WINDOW_BGR).all()
@@ -3,10 +3,21 @@
 用于查找和捕获游戏窗口
 跨平台支持: Windows, macOS, Linux
 """
+import os
 import sys
 import platform
+import threading
+import time
 import numpy as np
-import cv2
+
+from capture_backends import CaptureBackend, CaptureBenchmark
+from frame_source import FrameSource, LiveFrameSource
+from capture_scheduler import CaptureScheduler
+from display_geometry import DisplayGeometry
+from x11_capture import X11ShmCapture
+from window_registry import WindowRegistry, X11WindowWatcher
+from engine_log import get_logger
+from window_monitor import STATE_CLOSED, STATE_HIDDEN, STATE_MINIMIZED, STATE_NORMAL, STATE_OCCLUDED
 
 # 根据操作系统导入不同的模块
 if platform.system() == 'Windows':
@@ -14,6 +25,7 @@ if platform.system() == 'Windows':
         import win32gui
         import win32ui
         import win32con
+        import win32process
         PLATFORM = 'windows'
     except ImportError:
         print("[WARN] Windows API modules not available, falling back to cross-platform mode")
@@ -34,12 +46,24 @@ else:  # Linux and others
         print("[WARN] Linux modules not available, falling back to cross-platform mode")
         PLATFORM = 'cross_platform'
 
-print(f"[INFO] Window capture platform: {PLATFORM}")
+logger = get_logger('window_capture')
+logger.info("Window capture platform: %s", PLATFORM)
+
+# PIL的ImageGrab作为可选的截图后端（pyautogui依赖Pillow，通常已安装）
+try:
+    from PIL import ImageGrab
+except ImportError:
+    ImageGrab = None
 
 
 class WindowCapture:
     """跨平台窗口捕获类"""
     
+    WINDOWS_POLL_INTERVAL = 2.0   # Windows窗口注册表的轮询间隔（秒）
+    MACOS_POLL_INTERVAL = 5.0     # macOS窗口注册表的轮询间隔（秒），每次枚举都要启动osascript
+    OCCLUSION_GRID = 3            # 遮挡探测在窗口内按 N×N 网格取样
+    OCCLUSION_MIN_COVERAGE = 0.75  # 被其他程序窗口覆盖的取样点比例达到该值才视为被遮挡
+    
     def __init__(self):
         """初始化窗口捕获器"""
         self.hwnd = None
@@ -47,48 +71,101 @@ class WindowCapture:
         self.platform = PLATFORM
         self.window_rect = None  # 存储窗口位置和大小
         self.scale_factor = 1.0  # 显示缩放因子
+        
+        # 帧来源：默认实时截图，可替换为回放等其他来源
+        self.live_source = LiveFrameSource(self._grab)
+        self.frame_source: FrameSource = self.live_source
+        
+        # 截图调度：运行时由截图线程统一截图，capture_frame()读取最新帧
+        self.scheduler = CaptureScheduler(self._read_source)
+        
+        # 实时截图暂停（窗口不可用时）：未设置表示已暂停，等待帧的消费者阻塞到恢复或超时
+        self._capture_resumed = threading.Event()
+        self._capture_resumed.set()
+        self._resume_scheduler = False
+        
+        # 直接截图（截图线程未运行时）与截图后端测试互斥：X11共享内存的原始视图在下一次截图时被覆盖
+        self._capture_lock = threading.Lock()
+        self._benchmark_suspended = False  # 截图后端测试期间截图线程被挂起，测试结束后需要恢复
+        
+        # Linux下优先使用MIT-SHM截取窗口区域，不可用时回退到pyautogui全屏截图
+        self.x11_capture = None
+        if self.platform in ('linux', 'cross_platform') and sys.platform.startswith('linux') and os.environ.get('DISPLAY'):
+            x11_capture = X11ShmCapture()
+            if x11_capture.available:
+                self.x11_capture = x11_capture
         print(f"[INFO] WindowCapture initialized for platform: {self.platform}")
         
+        # 截图后端：默认使用平台的首选方式，可通过计时测试自动选择最快的后端
+        self.capture_backends = self._create_capture_backends()
+        self.capture_backend = next(iter(self.capture_backends), None)
+        self.backend_benchmark = None
+        
+        # 窗口注册表：首次查找窗口时建立标题索引，之后增量更新
+        self.window_registry = self._create_window_registry()
+        
         # 检测显示缩放因子
         self._detect_scale_factor()
         
-    def find_windows(self, keyword=""):
+        # 显示几何缓存：坐标转换只使用缓存，由截图路径随每帧更新
+        self.geometry = DisplayGeometry(self.platform, self._query_geometry)
+        self.geometry.scale_factor = self.scale_factor
+        
+    def find_windows(self, keyword="", refresh=False):
         """
         查找包含关键词的所有窗口
         
+        从窗口注册表的标题索引中查询，不再每次枚举所有窗口
+        
         Args:
             keyword: 窗口标题关键词（不区分大小写）
+            refresh: 是否先完整枚举一次窗口（不等待注册表的后台更新）
             
         Returns:
             list: [(hwnd, title), ...] 窗口句柄和标题列表
         """
+        return self.window_registry.lookup(keyword, refresh=refresh)
+    
+    def _create_window_registry(self):
+        """
+        创建窗口注册表
+        
+        X11下监听窗口事件增量更新；Windows和macOS后台轮询枚举（macOS每次枚举要启动osascript，间隔更长）
+        
+        Returns:
+            WindowRegistry: 窗口注册表
+        """
         if self.platform == 'windows':
-            return self._find_windows_windows(keyword)
-        elif self.platform == 'macos':
-            return self._find_windows_macos(keyword)
-        else:
-            return self._find_windows_cross_platform(keyword)
+            return WindowRegistry(self._enumerate_windows_windows, poll_interval=self.WINDOWS_POLL_INTERVAL)
+        if self.platform == 'macos':
+            return WindowRegistry(self._enumerate_windows_macos, poll_interval=self.MACOS_POLL_INTERVAL)
+        
+        if self.x11_capture:
+            watcher = X11WindowWatcher()
+            if watcher.available:
+                return WindowRegistry(self._enumerate_windows_cross_platform, watcher=watcher)
+        
+        print("[WARN] Cross-platform window enumeration not fully implemented")
+        return WindowRegistry(self._enumerate_windows_cross_platform, poll_interval=None)
     
-    def _find_windows_windows(self, keyword=""):
-        """Windows平台窗口查找"""
+    def _enumerate_windows_windows(self):
+        """Windows平台枚举所有可见的有标题窗口"""
         windows = []
         
         def callback(hwnd, windows_list):
             """枚举窗口回调函数"""
             if win32gui.IsWindowVisible(hwnd):
                 window_text = win32gui.GetWindowText(hwnd)
-                if window_text and (not keyword or keyword.lower() in window_text.lower()):
+                if window_text:
                     windows_list.append((hwnd, window_text))
             return True
         
         win32gui.EnumWindows(callback, windows)
         return windows
     
-    def _find_windows_macos(self, keyword=""):
-        """macOS平台窗口查找"""
+    def _enumerate_windows_macos(self):
+        """macOS平台枚举所有窗口，句柄为窗口在枚举结果中的序号"""
         try:
-            print(f"[INFO] macOS窗口检测开始，搜索关键词: '{keyword}'")
-            
             # 改进的AppleScript，返回更易解析的格式
             script = '''
             tell application "System Events"
@@ -120,58 +197,27 @@ class WindowCapture:
             end tell
             '''
             
-            print("[INFO] 执行AppleScript获取窗口列表...")
             result = subprocess.run(['osascript', '-e', script], 
                                   capture_output=True, text=True, timeout=10)
             
-            print(f"[DEBUG] AppleScript返回码: {result.returncode}")
-            print(f"[DEBUG] AppleScript输出: {result.stdout[:200]}...")  # 只显示前200字符
-            if result.stderr:
-                print(f"[DEBUG] AppleScript错误: {result.stderr}")
-            
             if result.returncode == 0:
                 output = result.stdout.strip()
                 
                 # 解析统计信息和窗口列表
                 if output.startswith("STATS:"):
                     parts = output.split("|||", 1)
-                    stats_part = parts[0]
                     window_part = parts[1] if len(parts) > 1 else ""
-                    
-                    # 解析统计信息
-                    stats = stats_part.replace("STATS:", "").split(":")
-                    process_count = int(stats[0]) if len(stats) > 0 else 0
-                    window_count = int(stats[1]) if len(stats) > 1 else 0
-                    
-                    print(f"[INFO] 扫描了 {process_count} 个进程，找到 {window_count} 个窗口")
-                    
-                    # 解析窗口列表
-                    if window_part:
-                        window_titles = window_part.split("|||")
-                        print(f"[DEBUG] 解析到 {len(window_titles)} 个窗口标题")
-                    else:
-                        window_titles = []
-                        print("[DEBUG] 没有窗口标题数据")
+                    window_titles = window_part.split("|||") if window_part else []
                 else:
                     # 兼容旧格式
                     window_titles = output.split(", ") if output else []
-                    print(f"[DEBUG] 使用兼容模式解析，得到 {len(window_titles)} 个窗口")
                 
-                # 过滤和匹配窗口
+                # 句柄是窗口在完整列表中的序号，与_set_window_macos的查找方式一致
                 windows = []
-                matched_count = 0
-                
                 for i, title in enumerate(window_titles):
                     title = title.strip()
-                    if title and title != "":
-                        if not keyword or keyword.lower() in title.lower():
-                            windows.append((i, title))
-                            matched_count += 1
-                            print(f"[MATCH] 窗口 {i}: {title}")
-                        else:
-                            print(f"[SKIP] 窗口 {i}: {title}")
-                
-                print(f"[INFO] 匹配到 {matched_count} 个符合条件的窗口")
+                    if title:
+                        windows.append((i, title))
                 return windows
             else:
                 error_msg = result.stderr.strip() if result.stderr else "未知错误"
@@ -189,13 +235,13 @@ class WindowCapture:
             return []
         except Exception as e:
             print(f"[ERROR] macOS窗口枚举异常: {e}")
-            import traceback
-            print(f"[DEBUG] 异常详情: {traceback.format_exc()}")
+            if logger.is_enabled('DEBUG'):
+                import traceback
+                logger.debug("异常详情: %s", traceback.format_exc())
             return []
     
-    def _find_windows_cross_platform(self, keyword=""):
-        """跨平台窗口查找（基础实现）"""
-        print("[WARN] Cross-platform window enumeration not fully implemented")
+    def _enumerate_windows_cross_platform(self):
+        """跨平台窗口枚举（基础实现）"""
         # 返回一个模拟的窗口列表用于测试
         return [(1, "Test Window"), (2, "Another Window")]
     
@@ -210,11 +256,15 @@ class WindowCapture:
             bool: 是否设置成功
         """
         if self.platform == 'windows':
-            return self._set_window_windows(hwnd)
+            success = self._set_window_windows(hwnd)
         elif self.platform == 'macos':
-            return self._set_window_macos(hwnd)
+            success = self._set_window_macos(hwnd)
         else:
-            return self._set_window_cross_platform(hwnd)
+            success = self._set_window_cross_platform(hwnd)
+        
+        # 窗口变化后几何缓存失效
+        self.geometry.invalidate()
+        return success
     
     def _set_window_windows(self, hwnd):
         """Windows平台设置窗口"""
@@ -243,9 +293,9 @@ class WindowCapture:
             print(f"[INFO] macOS设置窗口，索引: {hwnd}")
             
             # 在macOS上，hwnd实际上是窗口索引
-            # 我们需要重新获取窗口列表来找到对应的窗口
-            windows = self._find_windows_macos("")
-            print(f"[DEBUG] 重新获取窗口列表，共 {len(windows)} 个窗口")
+            # 从窗口注册表取窗口列表，与查找窗口时返回的序号一致
+            windows = self.window_registry.lookup("")
+            logger.debug("窗口注册表共 %s 个窗口", len(windows))
             
             if 0 <= hwnd < len(windows):
                 self.hwnd = hwnd
@@ -266,43 +316,349 @@ class WindowCapture:
                 return False
         except Exception as e:
             print(f"[ERROR] macOS设置窗口失败: {e}")
-            import traceback
-            print(f"[DEBUG] 异常详情: {traceback.format_exc()}")
+            if logger.is_enabled('DEBUG'):
+                import traceback
+                logger.debug("异常详情: %s", traceback.format_exc())
         return False
     
     def _set_window_cross_platform(self, hwnd):
         """跨平台设置窗口"""
         self.hwnd = hwnd
-        self.window_title = f"Cross-platform Window {hwnd}"
+        self.window_title = self.window_registry.get_title(hwnd) or f"Cross-platform Window {hwnd}"
+        if self.x11_capture:
+            # 句柄不是有效的X窗口ID时截取整个屏幕
+            self.x11_capture.set_window(hwnd)
         return True
     
-    def capture(self):
+    def set_frame_source(self, source=None):
+        """
+        设置帧来源
+        
+        Args:
+            source: FrameSource实例，None表示恢复实时截图
+        """
+        previous = self.frame_source
+        self.frame_source = source or self.live_source
+        if previous is not self.live_source and previous is not self.frame_source:
+            previous.close()
+        # 丢弃旧来源的最新帧，消费者等待新来源的帧
+        self.scheduler.clear()
+        logger.info("Frame source: %s", self.frame_source.name)
+    
+    @property
+    def is_live(self):
+        """当前是否使用实时截图"""
+        return self.frame_source is self.live_source
+    
+    def start_capture(self, fps=None):
+        """
+        启动截图线程
+        
+        Args:
+            fps: 截图帧率，None保持当前设置
+        """
+        if fps:
+            self.scheduler.set_fps(fps)
+        if self.capture_paused and self.is_live:
+            # 暂停期间只记录，恢复时再启动
+            self._resume_scheduler = True
+            return
+        self.scheduler.start()
+    
+    def stop_capture(self):
+        """停止截图线程，之后capture_frame()恢复为直接截图"""
+        self._resume_scheduler = False
+        self._benchmark_suspended = False
+        self.scheduler.stop()
+    
+    @property
+    def capture_paused(self):
+        """实时截图是否已暂停"""
+        return not self._capture_resumed.is_set()
+    
+    def pause_capture(self):
+        """
+        暂停实时截图（窗口最小化、被遮挡或关闭时）
+        
+        停止截图线程，暂停期间capture_frame()返回None，wait_next_frame()阻塞到恢复或超时，
+        消费者不会在黑屏或过期的画面上反复识别
+        """
+        if self.capture_paused:
+            return
+        self._resume_scheduler = self.scheduler.is_running or self._benchmark_suspended
+        self._benchmark_suspended = False
+        self._capture_resumed.clear()
+        self.scheduler.stop()
+        self.scheduler.clear()
+        logger.info("Live capture paused")
+    
+    def resume_capture(self):
+        """恢复实时截图，暂停前截图线程在运行时重新启动"""
+        if not self.capture_paused:
+            return
+        self._capture_resumed.set()
+        # 窗口可能在不可用期间移动或缩放
+        self.geometry.invalidate()
+        if self._resume_scheduler:
+            self.scheduler.start()
+        self._resume_scheduler = False
+        logger.info("Live capture resumed")
+    
+    def set_capture_format(self, fmt):
+        """
+        设置截图线程的帧存储格式，应与主要消费者（图像识别）需要的格式一致，
+        使截图在转换为该格式时一次完成，消费者无需再转换
+        
+        Args:
+            fmt: 'bgr'、'gray'或'gray_half'
+        """
+        self.scheduler.set_format(fmt)
+        logger.info("Capture format: %s", fmt)
+    
+    def capture_frame(self, timeout=1.0, fmt='bgr'):
+        """
+        获取当前帧
+        
+        截图线程运行时返回最新帧（尚无帧时等待第一帧），不会额外截图；
+        否则直接从帧来源读取一帧
+        
+        Args:
+            timeout: 截图线程尚无帧时的最长等待时间（秒）
+            fmt: 需要的帧格式（'bgr'、'gray'、'gray_half'）
+        
+        Returns:
+            Frame: 帧数据（图像、帧序号、时间戳），失败返回None
+        """
+        if self.capture_paused and self.is_live:
+            return None
+        if not self.scheduler.is_running:
+            return self._read_direct(fmt)
+        frame = self.scheduler.latest()
+        if frame is None:
+            frame = self.scheduler.wait_next(0, timeout=timeout)
+        return frame.to_format(fmt) if frame is not None else None
+    
+    def wait_next_frame(self, after_id=None, timeout=1.0, fmt='bgr'):
+        """
+        等待比after_id更新的帧，用于按帧处理的消费者（同一帧不重复处理）
+        
+        Args:
+            after_id: 已处理过的帧序号，None表示当前最新帧之后的下一帧
+            timeout: 最长等待时间（秒）
+            fmt: 需要的帧格式（'bgr'、'gray'、'gray_half'）
+        
+        Returns:
+            Frame: 新帧，超时返回None；截图线程未运行时直接截取一帧；实时截图暂停时等待恢复
+        """
+        if self.capture_paused and self.is_live:
+            started = time.monotonic()
+            if not self._capture_resumed.wait(timeout):
+                return None
+            timeout = max(0.0, timeout - (time.monotonic() - started))
+        if not self.scheduler.is_running:
+            return self._read_direct(fmt)
+        frame = self.scheduler.wait_next(after_id, timeout=timeout)
+        return frame.to_format(fmt) if frame is not None else None
+    
+    def _read_direct(self, fmt):
+        """
+        截图线程未运行时直接读取一帧
+        
+        在截图锁内完成格式转换，转换结果不再引用截图后端的原始缓冲区，
+        不会被截图后端测试或下一次直接截图覆盖
+        
+        Args:
+            fmt: 需要的帧格式
+        
+        Returns:
+            Frame: 帧数据，失败返回None
+        """
+        with self._capture_lock:
+            frame = self._read_source()
+            return frame.to_format(fmt) if frame is not None else None
+    
+    def _read_source(self):
+        """
+        从当前帧来源读取一帧，实时截图时顺带更新显示几何缓存
+        
+        Returns:
+            Frame: 帧数据，失败返回None
+        """
+        frame = self.frame_source.read()
+        if frame is not None and self.is_live:
+            height, width = frame.shape[:2]
+            self.geometry.observe_frame((width, height))
+        return frame
+    
+    def _query_geometry(self):
+        """
+        查询逻辑屏幕尺寸和截图区域的位置（显示几何缓存的查询函数）
+        
+        Returns:
+            tuple: (screen_size, window_rect)，未知的项为None
+        """
+        window_rect = self.get_window_rect() if self.hwnd is not None else None
+        return self._get_screen_size(), window_rect
+    
+    def _get_screen_size(self):
+        """
+        获取逻辑屏幕尺寸（鼠标坐标系）
+        
+        Returns:
+            tuple: (width, height)，无法获取时返回None
+        """
+        if self.x11_capture:
+            return self.x11_capture.screen_size
+        try:
+            size = pyautogui.size()
+            return (size.width, size.height)
+        except Exception:
+            return None
+    
+    def capture(self, fmt='bgr'):
         """
         捕获当前设置的窗口
         
+        Args:
+            fmt: 输出格式，'bgr'、'gray'或'gray_half'（1/2分辨率灰度）
+        
         Returns:
-            numpy.ndarray: BGR格式的图像，如果失败返回None
+            numpy.ndarray: 指定格式的图像，如果失败返回None
+        """
+        frame = self.capture_frame(fmt=fmt)
+        return frame.image if frame is not None else None
+    
+    def _grab(self):
+        """
+        按平台截取当前窗口（实时帧来源的截图函数）
+        
+        截图保持平台的原生通道顺序，不在这里转换，由消费者一次转换为需要的格式
+        
+        Returns:
+            tuple: (image, format) 原生格式的图像和格式名称，如果失败返回None
         """
         if self.hwnd is None:
-            print("未设置窗口句柄")
+            logger.warn("未设置窗口句柄", interval=5)
             return None
-            
+        
+        backend = self.capture_backends.get(self.capture_backend)
+        if backend is None:
+            logger.error("没有可用的截图后端", interval=5)
+            return None
+        return backend.grab()
+    
+    def capture_window(self, fmt='bgr'):
+        """
+        捕获窗口的别名方法，与capture()功能相同
+        主要用于图像识别系统的兼容性
+        
+        Args:
+            fmt: 输出格式，'bgr'、'gray'或'gray_half'
+        
+        Returns:
+            numpy.ndarray: 指定格式的图像，如果失败返回None
+        """
+        return self.capture(fmt)
+    
+    def _create_capture_backends(self):
+        """
+        列出当前平台可用的截图后端，第一个为默认后端
+        
+        Returns:
+            dict: {name: CaptureBackend}
+        """
+        backends = []
         if self.platform == 'windows':
-            return self._capture_windows()
+            backends.append(CaptureBackend('gdi', self._capture_windows, 'window', "GDI BitBlt窗口截图"))
+            if ImageGrab is not None:
+                backends.append(CaptureBackend('imagegrab', self._capture_imagegrab_window, 'window', "PIL ImageGrab区域截图"))
         elif self.platform == 'macos':
-            return self._capture_macos()
+            backends.append(CaptureBackend('pyautogui', self._capture_macos, 'screen', "pyautogui全屏截图"))
+            if ImageGrab is not None:
+                backends.append(CaptureBackend('imagegrab', self._capture_imagegrab, 'screen', "PIL ImageGrab全屏截图"))
         else:
-            return self._capture_cross_platform()
+            if self.x11_capture:
+                backends.append(CaptureBackend('x11_shm', self._capture_x11, 'window', "MIT-SHM窗口区域截图"))
+            if self.platform == 'linux':
+                backends.append(CaptureBackend('pyautogui', self._capture_cross_platform, 'screen', "pyautogui全屏截图"))
+            if ImageGrab is not None and os.environ.get('DISPLAY'):
+                backends.append(CaptureBackend('imagegrab', self._capture_imagegrab, 'screen', "PIL ImageGrab全屏截图"))
+        return {backend.name: backend for backend in backends}
     
-    def capture_window(self):
+    def set_capture_backend(self, name):
         """
-        捕获窗口的别名方法，与capture()功能相同
-        主要用于图像识别系统的兼容性
+        切换截图后端
+        
+        Args:
+            name: 后端名称
         
         Returns:
-            numpy.ndarray: BGR格式的图像，如果失败返回None
+            bool: 是否切换成功
         """
-        return self.capture()
+        if name not in self.capture_backends:
+            logger.error("不支持的截图后端: %s，可用: %s", name, list(self.capture_backends))
+            return False
+        
+        if name != self.capture_backend:
+            self.capture_backend = name
+            # 截图区域可能改变（窗口区域/整个屏幕），几何缓存和旧帧都失效
+            self.geometry.invalidate()
+            self.scheduler.clear()
+        logger.info("Capture backend: %s", name)
+        return True
+    
+    def benchmark_capture_backends(self, frames=CaptureBenchmark.DEFAULT_FRAMES, apply=True):
+        """
+        对所有可用的截图后端做计时测试，并切换到最快的可用后端
+        
+        测试期间挂起截图线程，并持有截图锁使直接截图等待测试结束，避免争用截图资源影响计时；
+        测试结束后只在截图线程仍应运行时（未断开、未暂停）通过start_capture()恢复
+        
+        Args:
+            frames: 每个后端计时的截图次数
+            apply: 是否切换到测试选出的后端
+        
+        Returns:
+            dict: 测试报告（见CaptureBenchmark.run），未设置窗口时返回None
+        """
+        if self.hwnd is None:
+            logger.warn("未设置窗口，跳过截图后端测试")
+            return None
+        
+        with self._capture_lock:
+            if self.scheduler.is_running:
+                # 测试期间pause_capture()据此记录恢复后需要重启，stop_capture()清除该标记
+                self._benchmark_suspended = True
+                self.scheduler.stop()
+            try:
+                benchmark = CaptureBenchmark(frames=frames, fmt=self.scheduler.format)
+                report = benchmark.run(list(self.capture_backends.values()))
+            finally:
+                resume, self._benchmark_suspended = self._benchmark_suspended, False
+                if resume and self.hwnd is not None:
+                    # 暂停期间start_capture()只记录，窗口恢复时再启动
+                    self.start_capture()
+        
+        report['previous'] = self.capture_backend
+        self.backend_benchmark = report
+        if report['selected'] is None:
+            logger.warn("没有通过检查的截图后端，保持使用 %s", self.capture_backend)
+        elif apply:
+            self.set_capture_backend(report['selected'])
+        return report
+    
+    def get_capture_backend_info(self):
+        """
+        获取截图后端信息
+        
+        Returns:
+            dict: 当前后端、可用后端和最近一次计时测试报告
+        """
+        return {
+            "selected": self.capture_backend,
+            "available": list(self.capture_backends),
+            "benchmark": self.backend_benchmark
+        }
     
     def _capture_windows(self):
         """Windows平台窗口捕获"""
@@ -337,11 +693,11 @@ class WindowCapture:
             mfcDC.DeleteDC()
             win32gui.ReleaseDC(self.hwnd, hwndDC)
             
-            # 转换为BGR格式（OpenCV标准）
-            return cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+            # 保持BGRA，由消费者直接转换为需要的格式（BGR或灰度），省去一次中间转换
+            return img, 'bgra'
             
         except Exception as e:
-            print(f"Windows捕获窗口失败: {e}")
+            logger.error("Windows捕获窗口失败: %s", e, interval=5)
             return None
     
     def _capture_macos(self):
@@ -351,24 +707,136 @@ class WindowCapture:
             # 注意：这会截取整个屏幕，不是特定窗口
             # 更精确的窗口捕获需要使用Quartz框架，但比较复杂
             screenshot = pyautogui.screenshot()
-            # 转换为numpy数组
-            img = np.array(screenshot)
-            # 转换为BGR格式（OpenCV标准）
-            return cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+            # 转换为numpy数组（RGB）
+            return np.array(screenshot), 'rgb'
         except Exception as e:
-            print(f"macOS捕获窗口失败: {e}")
+            logger.error("macOS捕获窗口失败: %s", e, interval=5)
             return None
     
+    def _capture_x11(self):
+        """X11共享内存截取窗口区域"""
+        # 共享内存的原始视图在下一次截图时被覆盖，截图线程会立即把它转换到环形缓冲区
+        img = self.x11_capture.grab_raw()
+        if img is None:
+            return None
+        return img, self.x11_capture.raw_format
+    
     def _capture_cross_platform(self):
         """跨平台窗口捕获"""
         try:
             # 使用pyautogui进行屏幕截图
             screenshot = pyautogui.screenshot()
-            img = np.array(screenshot)
-            return cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+            return np.array(screenshot), 'rgb'
         except Exception as e:
-            print(f"跨平台捕获失败: {e}")
+            logger.error("跨平台捕获失败: %s", e, interval=5)
+            return None
+    
+    def _capture_imagegrab(self, bbox=None):
+        """
+        PIL ImageGrab截图
+        
+        Args:
+            bbox: 截图区域 (left, top, right, bottom)，None截取整个屏幕
+        
+        Returns:
+            tuple: (image, format)，失败返回None
+        """
+        try:
+            screenshot = ImageGrab.grab(bbox=bbox)
+            fmt = 'rgba' if screenshot.mode == 'RGBA' else 'rgb'
+            if screenshot.mode not in ('RGB', 'RGBA'):
+                screenshot = screenshot.convert('RGB')
+            return np.asarray(screenshot), fmt
+        except Exception as e:
+            logger.error("ImageGrab截图失败: %s", e, interval=5)
+            return None
+    
+    def _capture_imagegrab_window(self):
+        """PIL ImageGrab截取窗口区域（Windows）"""
+        rect = self._get_window_rect_windows()
+        if rect is None:
+            return None
+        left, top, width, height = rect
+        return self._capture_imagegrab((left, top, left + width, top + height))
+    
+    def probe_window_state(self):
+        """
+        探测目标窗口的状态，只查询窗口矩形和可见性，不截图
+        
+        Returns:
+            str: 'normal'、'minimized'、'hidden'、'occluded'或'closed'，未设置窗口时返回None
+        """
+        if self.hwnd is None:
             return None
+        
+        if self.platform == 'windows':
+            return self._probe_window_state_windows()
+        elif self.platform == 'macos':
+            return self._probe_window_state_macos()
+        else:
+            return self._probe_window_state_cross_platform()
+    
+    def _probe_window_state_windows(self):
+        """Windows平台探测窗口状态"""
+        if not win32gui.IsWindow(self.hwnd):
+            return STATE_CLOSED
+        if win32gui.IsIconic(self.hwnd):
+            return STATE_MINIMIZED
+        if not win32gui.IsWindowVisible(self.hwnd):
+            return STATE_HIDDEN
+        
+        left, top, right, bottom = win32gui.GetWindowRect(self.hwnd)
+        if right <= left or bottom <= top:
+            return STATE_HIDDEN
+        
+        # 在窗口内按网格取样，大部分取样点被其他程序的窗口覆盖时才视为被遮挡：
+        # PrintWindow截图不受部分遮挡影响，本工具自己的窗口（Electron界面、预览）也不算遮挡
+        desktop = win32gui.GetWindowRect(win32gui.GetDesktopWindow())
+        own_pids = {os.getpid(), os.getppid()}
+        grid = self.OCCLUSION_GRID
+        sampled = covered = 0
+        for row in range(grid):
+            for col in range(grid):
+                point = (left + (right - left) * (2 * col + 1) // (2 * grid),
+                         top + (bottom - top) * (2 * row + 1) // (2 * grid))
+                if not (desktop[0] <= point[0] < desktop[2] and desktop[1] <= point[1] < desktop[3]):
+                    continue
+                sampled += 1
+                if self._is_foreign_window(win32gui.WindowFromPoint(point), own_pids):
+                    covered += 1
+        if sampled and covered >= sampled * self.OCCLUSION_MIN_COVERAGE:
+            return STATE_OCCLUDED
+        return STATE_NORMAL
+    
+    def _is_foreign_window(self, hwnd, own_pids):
+        """
+        判断取样点所属的窗口是否属于其他程序
+        
+        Args:
+            hwnd: WindowFromPoint返回的窗口
+            own_pids: 本引擎及其父进程（Electron）的进程ID
+        
+        Returns:
+            bool: 既不是目标窗口（沿GetParent向上查找，包括游戏的子窗口和弹出窗口），也不属于本工具时返回True
+        """
+        owner = hwnd
+        while owner and owner != self.hwnd:
+            owner = win32gui.GetParent(owner)
+        if owner == self.hwnd or not hwnd:
+            return False
+        _, pid = win32process.GetWindowThreadProcessId(hwnd)
+        return pid not in own_pids
+    
+    def _probe_window_state_macos(self):
+        """macOS平台探测窗口状态：按标题检查窗口是否仍在窗口注册表中（无法低成本判断最小化）"""
+        titles = {title for _, title in self.window_registry.lookup("")}
+        return STATE_NORMAL if self.window_title in titles else STATE_CLOSED
+    
+    def _probe_window_state_cross_platform(self):
+        """跨平台探测窗口状态：X11查询窗口属性，其他情况视为正常"""
+        if self.x11_capture:
+            return self.x11_capture.probe_window() or STATE_NORMAL
+        return STATE_NORMAL
     
     def get_window_rect(self):
         """
@@ -393,7 +861,7 @@ class WindowCapture:
             left, top, right, bottom = win32gui.GetWindowRect(self.hwnd)
             return (left, top, right - left, bottom - top)
         except Exception as e:
-            print(f"Windows获取窗口矩形失败: {e}")
+            logger.error("Windows获取窗口矩形失败: %s", e, interval=5)
             return None
     
     def _get_window_rect_macos(self):
@@ -403,17 +871,18 @@ class WindowCapture:
             size = pyautogui.size()
             return (0, 0, size.width, size.height)
         except Exception as e:
-            print(f"macOS获取窗口矩形失败: {e}")
+            logger.error("macOS获取窗口矩形失败: %s", e, interval=5)
             return None
     
     def _get_window_rect_cross_platform(self):
-        """跨平台获取窗口矩形"""
-        try:
-            size = pyautogui.size()
-            return (0, 0, size.width, size.height)
-        except Exception as e:
-            print(f"跨平台获取窗口矩形失败: {e}")
-            return None
+        """跨平台获取窗口矩形（截图区域：MIT-SHM后端为窗口区域，其他后端为整个屏幕）"""
+        if self.x11_capture and self.capture_backend == 'x11_shm':
+            rect = self.x11_capture.get_window_rect()
+            if rect is not None:
+                return rect
+        
+        size = self._get_screen_size()
+        return (0, 0, size[0], size[1]) if size else None
             
     def activate_window(self):
         """
@@ -549,14 +1018,14 @@ class WindowCapture:
             end tell
             '''
             
-            print("[DEBUG] 执行AppleScript激活窗口...")
+            logger.debug("执行AppleScript激活窗口...")
             result = subprocess.run(['osascript', '-e', script], 
                                   capture_output=True, text=True, timeout=10)
             
-            print(f"[DEBUG] AppleScript返回码: {result.returncode}")
-            print(f"[DEBUG] AppleScript输出: {result.stdout.strip()}")
+            logger.debug("AppleScript返回码: %s", result.returncode)
+            logger.debug("AppleScript输出: %s", result.stdout.strip())
             if result.stderr:
-                print(f"[DEBUG] AppleScript错误: {result.stderr.strip()}")
+                logger.debug("AppleScript错误: %s", result.stderr.strip())
             
             if result.returncode == 0:
                 output = result.stdout.strip()
@@ -584,8 +1053,9 @@ class WindowCapture:
             return False
         except Exception as e:
             print(f"[ERROR] macOS窗口激活出错: {e}")
-            import traceback
-            print(f"[DEBUG] 异常详情: {traceback.format_exc()}")
+            if logger.is_enabled('DEBUG'):
+                import traceback
+                logger.debug("异常详情: %s", traceback.format_exc())
             return False
     
     def _activate_window_macos_fallback(self):
@@ -638,7 +1108,7 @@ class WindowCapture:
                 end tell
                 '''
                 
-                print(f"[DEBUG] 尝试激活包含关键词 '{keyword}' 的应用...")
+                logger.debug("尝试激活包含关键词 '%s' 的应用...", keyword)
                 result = subprocess.run(['osascript', '-e', script], 
                                       capture_output=True, text=True, timeout=5)
                 
@@ -648,9 +1118,9 @@ class WindowCapture:
                         print(f"[OK] 备用方法成功激活应用: {output}")
                         return True
                     else:
-                        print(f"[DEBUG] 关键词 '{keyword}' 未找到匹配应用: {output}")
+                        logger.debug("关键词 '%s' 未找到匹配应用: %s", keyword, output)
                 else:
-                    print(f"[DEBUG] 关键词 '{keyword}' 激活失败: {result.stderr}")
+                    logger.debug("关键词 '%s' 激活失败: %s", keyword, result.stderr)
             
             print("[WARN] 所有备用激活方法都失败了")
             return False
@@ -727,7 +1197,7 @@ class WindowCapture:
                     import pyautogui
                     # 获取pyautogui报告的屏幕尺寸
                     logical_width, logical_height = pyautogui.size()
-                    print(f"[DEBUG] pyautogui屏幕尺寸: {logical_width}x{logical_height}")
+                    logger.debug("pyautogui屏幕尺寸: %sx%s", logical_width, logical_height)
                     
                     # 使用Cocoa API获取真实屏幕尺寸
                     import subprocess
@@ -773,7 +1243,9 @@ class WindowCapture:
     def convert_relative_to_screen_coords(self, rel_x, rel_y):
         """
         将相对于截图的坐标转换为屏幕绝对坐标
-        专门针对macOS HiDPI环境进行优化
+        
+        只使用显示几何缓存做算术运算，不截图也不查询屏幕（缓存由截图路径更新，
+        没有新帧超过刷新间隔时才在这里重新查询窗口位置）
         
         Args:
             rel_x: 相对X坐标（截图内的坐标）
@@ -783,121 +1255,9 @@ class WindowCapture:
             tuple: (screen_x, screen_y) 屏幕绝对坐标
         """
         try:
-            print(f"[DEBUG] 开始坐标转换: 相对坐标({rel_x}, {rel_y})")
-            print(f"[DEBUG] 当前平台: {self.platform}")
-            
-            # 获取屏幕尺寸
-            import pyautogui
-            logical_screen_width, logical_screen_height = pyautogui.size()
-            print(f"[DEBUG] 逻辑屏幕尺寸: {logical_screen_width}x{logical_screen_height}")
-            
-            if self.platform == 'macos':
-                # macOS 坐标转换：考虑 HiDPI 和窗口偏移
-                print(f"[DEBUG] macOS 坐标转换开始...")
-                
-                # 方法1：尝试获取当前截图进行精确转换
-                current_screenshot = self.capture()
-                if current_screenshot is not None:
-                    screenshot_height, screenshot_width = current_screenshot.shape[:2]
-                    print(f"[DEBUG] 截图实际尺寸: {screenshot_width}x{screenshot_height}")
-                    
-                    # 检查是否为全屏截图（HiDPI环境）
-                    if screenshot_width > logical_screen_width * 1.5:
-                        # HiDPI 环境：需要缩放转换
-                        scale_x = screenshot_width / logical_screen_width
-                        scale_y = screenshot_height / logical_screen_height
-                        print(f"[DEBUG] HiDPI环境，缩放比例: X={scale_x:.4f}, Y={scale_y:.4f}")
-                        
-                        screen_x = rel_x / scale_x
-                        screen_y = rel_y / scale_y
-                        print(f"[DEBUG] HiDPI缩放转换: ({rel_x}, {rel_y}) -> ({screen_x:.1f}, {screen_y:.1f})")
-                    else:
-                        # 标准环境：直接使用坐标
-                        print(f"[DEBUG] 标准分辨率环境")
-                        screen_x = rel_x
-                        screen_y = rel_y
-                        print(f"[DEBUG] 直接使用坐标: ({rel_x}, {rel_y}) -> ({screen_x}, {screen_y})")
-                else:
-                    # 方法2：无法获取截图，使用智能推测
-                    print(f"[WARN] 无法获取截图，使用智能推测")
-                    
-                    # 检查坐标是否明显超出逻辑屏幕范围
-                    if rel_x > logical_screen_width * 1.5 or rel_y > logical_screen_height * 1.5:
-                        # 坐标明显超出，可能是 HiDPI 环境
-                        estimated_scale = 2.0  # 假设是 2x Retina
-                        screen_x = rel_x / estimated_scale
-                        screen_y = rel_y / estimated_scale
-                        print(f"[DEBUG] 推测HiDPI环境，缩放转换: ({rel_x}, {rel_y}) -> ({screen_x:.1f}, {screen_y:.1f})")
-                    else:
-                        # 坐标在合理范围内，直接使用
-                        screen_x = rel_x
-                        screen_y = rel_y
-                        print(f"[DEBUG] 坐标在合理范围，直接使用: ({rel_x}, {rel_y})")
-                
-            elif self.platform == 'windows':
-                # Windows平台：需要考虑窗口位置偏移
-                window_rect = self.get_window_rect()
-                if window_rect:
-                    window_x, window_y, window_width, window_height = window_rect
-                    print(f"[DEBUG] Windows窗口信息: 位置({window_x}, {window_y}), 尺寸({window_width}x{window_height})")
-                    
-                    # 检查是否需要缩放调整
-                    if window_width > logical_screen_width or window_height > logical_screen_height:
-                        # 有缩放的情况
-                        scale_x = window_width / logical_screen_width
-                        scale_y = window_height / logical_screen_height
-                        screen_x = rel_x / scale_x
-                        screen_y = rel_y / scale_y
-                        print(f"[DEBUG] Windows缩放转换: 缩放因子({scale_x:.2f}, {scale_y:.2f})")
-                    else:
-                        # 无缩放，直接加窗口偏移
-                        screen_x = window_x + rel_x
-                        screen_y = window_y + rel_y
-                        print(f"[DEBUG] Windows偏移转换: 窗口偏移({window_x}, {window_y})")
-                else:
-                    # 无法获取窗口信息，直接使用相对坐标
-                    screen_x = rel_x
-                    screen_y = rel_y
-                    print(f"[DEBUG] Windows回退处理: 直接使用相对坐标")
-                    
-            else:
-                # 其他平台默认处理
-                screen_x = rel_x
-                screen_y = rel_y
-                print(f"[DEBUG] 默认平台处理: 直接使用相对坐标")
-            
-            # 重要：对于macOS HiDPI环境，不要强制限制坐标范围
-            # 因为在HiDPI环境下，有效的鼠标坐标可能超出逻辑屏幕尺寸
-            if self.platform == 'macos':
-                # macOS环境下，允许坐标超出逻辑屏幕范围
-                # 但仍然进行合理性检查，避免过度偏离
-                max_reasonable_x = logical_screen_width * 3  # 允许3倍逻辑宽度
-                max_reasonable_y = logical_screen_height * 3  # 允许3倍逻辑高度
-                
-                original_x, original_y = screen_x, screen_y
-                screen_x = max(0, min(screen_x, max_reasonable_x))
-                screen_y = max(0, min(screen_y, max_reasonable_y))
-                
-                if original_x != screen_x or original_y != screen_y:
-                    print(f"[WARN] macOS坐标超出合理范围，已调整: ({original_x:.1f}, {original_y:.1f}) -> ({screen_x:.1f}, {screen_y:.1f})")
-                else:
-                    print(f"[INFO] macOS坐标在合理范围内: ({screen_x:.1f}, {screen_y:.1f})")
-            else:
-                # 非macOS平台，保持原有的严格限制
-                original_x, original_y = screen_x, screen_y
-                screen_x = max(0, min(screen_x, logical_screen_width - 1))
-                screen_y = max(0, min(screen_y, logical_screen_height - 1))
-                
-                if original_x != screen_x or original_y != screen_y:
-                    print(f"[WARN] 坐标被限制在屏幕范围内: ({original_x}, {original_y}) -> ({screen_x}, {screen_y})")
-            
-            print(f"[DEBUG] 最终转换结果: ({rel_x}, {rel_y}) -> ({screen_x:.1f}, {screen_y:.1f})")
-            return int(screen_x), int(screen_y)
-            
+            return self.geometry.to_screen(rel_x, rel_y)
         except Exception as e:
-            print(f"[ERROR] 坐标转换失败: {e}")
-            import traceback
-            print(f"[DEBUG] 错误详情: {traceback.format_exc()}")
+            logger.error("坐标转换失败: %s", e, interval=5)
             return rel_x, rel_y
     
     def get_accurate_click_position(self, template_match_x, template_match_y, template_name=None):
@@ -907,25 +1267,9 @@ class WindowCapture:
         Args:
             template_match_x: 模板匹配得到的X坐标
             template_match_y: 模板匹配得到的Y坐标
-            template_name: 模板名称（用于特殊调整）
+            template_name: 模板名称（保留参数，目前不按模板做位置微调）
             
         Returns:
             tuple: (click_x, click_y) 精确的点击坐标
         """
-        # 首先进行基本的坐标转换
-        screen_x, screen_y = self.convert_relative_to_screen_coords(template_match_x, template_match_y)
-        
-        # 根据模板类型进行微调（可选）
-        if template_name:
-            if 'challenge' in template_name.lower() or '挑战' in template_name:
-                # 对于挑战按钮，可能需要点击中心偏下一点
-                print(f"[DEBUG] 挑战按钮位置微调前: ({screen_x}, {screen_y})")
-                # 这里可以根据需要添加微调逻辑
-                print(f"[DEBUG] 挑战按钮位置微调后: ({screen_x}, {screen_y})")
-            elif 'dungeon' in template_name.lower() or '副本' in template_name:
-                # 对于副本图标，确保点击中心
-                print(f"[DEBUG] 副本图标位置微调前: ({screen_x}, {screen_y})")
-                # 这里可以根据需要添加微调逻辑
-                print(f"[DEBUG] 副本图标位置微调后: ({screen_x}, {screen_y})")
-        
-        return screen_x, screen_y
+        return self.convert_relative_to_screen_coords(template_match_x, template_match_y)
@@ -0,0 +1,168 @@
+"""
+窗口状态监控模块
+定期探测目标窗口的状态（正常、最小化、隐藏、被遮挡、已关闭），状态变化时回调。
+探测只查询窗口矩形和可见性（每次几次系统调用），不截图
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from engine_log import get_logger
+
+logger = get_logger('window_monitor')
+
+
+# 窗口状态
+STATE_NORMAL = 'normal'        # 窗口可见，可以截图和点击
+STATE_MINIMIZED = 'minimized'  # 窗口最小化（X11下为未映射）
+STATE_HIDDEN = 'hidden'        # 窗口不可见或尺寸为0
+STATE_OCCLUDED = 'occluded'    # 窗口被其他窗口遮挡
+STATE_CLOSED = 'closed'        # 窗口已关闭
+
+WINDOW_STATES = (STATE_NORMAL, STATE_MINIMIZED, STATE_HIDDEN, STATE_OCCLUDED, STATE_CLOSED)
+
+
+class WindowStateMonitor:
+    """
+    窗口状态监控
+    
+    监控线程每隔interval调用一次probe。窗口变为不可用需要连续confirm_probes次探测结果一致才生效
+    （过滤菜单、提示框等短暂遮挡），恢复正常则立即生效，使流水线尽快恢复
+    """
+    
+    DEFAULT_INTERVAL = 0.5       # 探测间隔（秒）
+    DEFAULT_CONFIRM_PROBES = 2   # 确认窗口不可用需要的连续探测次数
+    
+    def __init__(self, probe: Callable[[], str], on_change: Callable[[str, str], None],
+                 interval: float = DEFAULT_INTERVAL, confirm_probes: int = DEFAULT_CONFIRM_PROBES):
+        """
+        初始化窗口状态监控
+        
+        Args:
+            probe: 探测窗口状态的函数，返回WINDOW_STATES之一
+            on_change: 状态变化回调，参数为 (previous, state)
+            interval: 探测间隔（秒）
+            confirm_probes: 确认窗口不可用需要的连续探测次数
+        """
+        self._probe = probe
+        self._on_change = on_change
+        self.interval = float(interval)
+        self.confirm_probes = max(1, int(confirm_probes))
+        
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        
+        self.state = STATE_NORMAL
+        self._pending: Optional[str] = None
+        self._pending_count = 0
+        self._changed_at = time.time()
+        self._stats = {'probes': 0, 'probe_failures': 0, 'changes': 0, 'total_probe_ms': 0.0}
+    
+    @property
+    def is_running(self) -> bool:
+        """监控线程是否在运行"""
+        return self._thread is not None and self._thread.is_alive()
+    
+    @property
+    def usable(self) -> bool:
+        """窗口当前是否可用"""
+        return self.state == STATE_NORMAL
+    
+    def start(self) -> None:
+        """从正常状态开始监控（已在运行时只重置状态）"""
+        with self._lock:
+            self.state = STATE_NORMAL
+            self._pending = None
+            self._pending_count = 0
+            self._changed_at = time.time()
+        
+        if self.is_running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="WindowStateMonitor", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """停止监控线程"""
+        self._stop_event.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=2.0)
+        self._thread = None
+    
+    def check(self) -> str:
+        """
+        探测一次窗口状态，状态变化生效时调用on_change
+        
+        Returns:
+            str: 当前（生效的）窗口状态
+        """
+        started = time.perf_counter()
+        try:
+            observed = self._probe()
+        except Exception as e:
+            logger.warn("Window state probe failed: %s", e, interval=5)
+            observed = None
+        probe_ms = (time.perf_counter() - started) * 1000
+        
+        with self._lock:
+            self._stats['probes'] += 1
+            self._stats['total_probe_ms'] += probe_ms
+            if observed not in WINDOW_STATES:
+                # 探测失败时保持当前状态
+                self._stats['probe_failures'] += 1
+                return self.state
+            
+            previous = self.state
+            if observed == previous:
+                self._pending = None
+                self._pending_count = 0
+                return previous
+            
+            if observed != self._pending:
+                self._pending = observed
+                self._pending_count = 0
+            self._pending_count += 1
+            if observed != STATE_NORMAL and self._pending_count < self.confirm_probes:
+                return previous
+            
+            self.state = observed
+            self._pending = None
+            self._pending_count = 0
+            self._changed_at = time.time()
+            self._stats['changes'] += 1
+        
+        try:
+            self._on_change(previous, observed)
+        except Exception as e:
+            logger.error("Window state callback failed: %s", e, interval=5)
+        return observed
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取监控状态和统计
+        
+        Returns:
+            Dict[str, Any]: 当前状态、持续时间、探测次数和平均探测耗时等
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            state, changed_at = self.state, self._changed_at
+        
+        probes = stats['probes']
+        total_probe_ms = stats.pop('total_probe_ms')
+        stats.update({
+            'state': state,
+            'usable': state == STATE_NORMAL,
+            'since': changed_at,
+            'running': self.is_running,
+            'interval': self.interval,
+            'avg_probe_ms': round(total_probe_ms / probes, 3) if probes else 0.0
+        })
+        return stats
+    
+    def _run(self) -> None:
+        """监控线程主循环"""
+        while not self._stop_event.wait(self.interval):
+            self.check()
@@ -0,0 +1,549 @@
+"""
+窗口注册表模块
+维护顶层窗口的标题索引，按关键词查找窗口时直接查询内存中的索引，不再每次枚举所有窗口。
+索引只构建一次，之后增量更新：X11下监听根窗口的_NET_CLIENT_LIST和窗口标题的属性变化事件，
+其他平台由后台线程定期枚举并与索引比较差异
+"""
+import ctypes
+import select
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import x11_capture
+from engine_log import get_logger
+from x11_capture import IS_VIEWABLE, XWindowAttributes
+
+logger = get_logger('window_registry')
+
+
+# Xlib事件类型和事件掩码
+CREATE_NOTIFY = 16
+DESTROY_NOTIFY = 17
+UNMAP_NOTIFY = 18
+MAP_NOTIFY = 19
+REPARENT_NOTIFY = 21
+PROPERTY_NOTIFY = 28
+SUBSTRUCTURE_NOTIFY_MASK = 1 << 19
+PROPERTY_CHANGE_MASK = 1 << 22
+ANY_PROPERTY_TYPE = 0
+XA_WINDOW = 33
+
+# 影响顶层窗口列表的事件（没有窗口管理器维护_NET_CLIENT_LIST时使用）
+_TREE_EVENTS = (CREATE_NOTIFY, DESTROY_NOTIFY, UNMAP_NOTIFY, MAP_NOTIFY, REPARENT_NOTIFY)
+
+
+class XPropertyEvent(ctypes.Structure):
+    """XPropertyEvent结构（前五个字段与XAnyEvent相同）"""
+    _fields_ = [
+        ('type', ctypes.c_int),
+        ('serial', ctypes.c_ulong),
+        ('send_event', ctypes.c_int),
+        ('display', ctypes.c_void_p),
+        ('window', ctypes.c_ulong),
+        ('atom', ctypes.c_ulong),
+        ('time', ctypes.c_ulong),
+        ('state', ctypes.c_int),
+    ]
+
+
+class XEvent(ctypes.Union):
+    """XEvent联合体（只使用属性事件的字段，其余按Xlib定义的大小占位）"""
+    _fields_ = [
+        ('type', ctypes.c_int),
+        ('xproperty', XPropertyEvent),
+        ('pad', ctypes.c_long * 24),
+    ]
+
+
+_declared = False
+_declared_lock = threading.Lock()
+
+
+def _load_window_functions():
+    """
+    加载X11库并声明窗口列表相关的函数
+    
+    Returns:
+        ctypes.CDLL: libX11，系统没有X11库时返回None
+    """
+    global _declared
+    libs = x11_capture._load_libraries()
+    if libs is None:
+        return None
+    x11 = libs[0]
+    
+    with _declared_lock:
+        if not _declared:
+            display_p = ctypes.c_void_p
+            x11.XInternAtom.argtypes = [display_p, ctypes.c_char_p, ctypes.c_int]
+            x11.XInternAtom.restype = ctypes.c_ulong
+            x11.XGetWindowProperty.argtypes = [
+                display_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_long, ctypes.c_long, ctypes.c_int,
+                ctypes.c_ulong, ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_int),
+                ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_void_p)
+            ]
+            x11.XQueryTree.argtypes = [
+                display_p, ctypes.c_ulong, ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_ulong),
+                ctypes.POINTER(ctypes.POINTER(ctypes.c_ulong)), ctypes.POINTER(ctypes.c_uint)
+            ]
+            x11.XFree.argtypes = [ctypes.c_void_p]
+            x11.XSelectInput.argtypes = [display_p, ctypes.c_ulong, ctypes.c_long]
+            x11.XPending.argtypes = [display_p]
+            x11.XNextEvent.argtypes = [display_p, ctypes.POINTER(XEvent)]
+            x11.XFlush.argtypes = [display_p]
+            x11.XConnectionNumber.argtypes = [display_p]
+            _declared = True
+    return x11
+
+
+class X11WindowWatcher:
+    """
+    X11顶层窗口监听
+    
+    有窗口管理器时以根窗口的_NET_CLIENT_LIST为窗口列表，列表属性变化时重新读取并只查询新增窗口的标题；
+    没有窗口管理器时（如裸Xvfb）以根窗口下可见的子窗口为窗口列表，监听子窗口的创建、销毁和映射。
+    每个窗口只在出现时和_NET_WM_NAME/WM_NAME属性变化时读取一次标题。
+    使用独立的显示连接，所有Xlib调用在锁内串行执行
+    """
+    
+    def __init__(self, display_name: Optional[str] = None):
+        """
+        初始化窗口监听并连接显示服务器
+        
+        Args:
+            display_name: 显示名称（如":99"），None使用DISPLAY环境变量
+        """
+        self.available = False
+        self._lock = threading.Lock()
+        self._display = None
+        self._root = 0
+        self._titles: Dict[int, str] = {}    # 当前窗口列表（按列表顺序）及标题
+        self._use_client_list = False
+        self._list_dirty = True
+        
+        self._x11 = _load_window_functions()
+        if self._x11 is None:
+            return
+        
+        x11 = self._x11
+        self._display = x11.XOpenDisplay(display_name.encode() if display_name else None)
+        if not self._display:
+            logger.warn("Cannot open X display, window events disabled")
+            return
+        
+        self._root = x11.XRootWindow(self._display, x11.XDefaultScreen(self._display))
+        self._atoms = {
+            name: x11.XInternAtom(self._display, name.encode(), 0)
+            for name in ('_NET_CLIENT_LIST', '_NET_WM_NAME', 'WM_NAME', 'UTF8_STRING')
+        }
+        x11.XSelectInput(self._display, self._root, PROPERTY_CHANGE_MASK | SUBSTRUCTURE_NOTIFY_MASK)
+        x11.XFlush(self._display)
+        self._fd = x11.XConnectionNumber(self._display)
+        self.available = True
+    
+    def snapshot(self) -> List[Tuple[int, str]]:
+        """
+        重新读取窗口列表和所有窗口的标题
+        
+        Returns:
+            list: [(window_id, title), ...]
+        """
+        with self._lock:
+            if not self.available:
+                return []
+            self._titles = {}
+            self._reload_list()
+            self._list_dirty = False
+            return self._windows()
+    
+    def poll(self, timeout: float) -> Optional[List[Tuple[int, str]]]:
+        """
+        等待并处理窗口事件
+        
+        Args:
+            timeout: 最长等待时间（秒）
+        
+        Returns:
+            list: 窗口列表或标题发生变化时返回新的 [(window_id, title), ...]，没有变化返回None
+        """
+        if not self.available:
+            time.sleep(timeout)
+            return None
+        
+        with self._lock:
+            pending = self._x11.XPending(self._display)
+        if not pending:
+            readable, _, _ = select.select([self._fd], [], [], timeout)
+            if not readable:
+                return None
+        
+        with self._lock:
+            if not self.available:
+                return None
+            changed = self._process_events()
+            if self._list_dirty:
+                changed = self._reload_list() or changed
+                self._list_dirty = False
+            return self._windows() if changed else None
+    
+    def close(self) -> None:
+        """断开显示连接"""
+        with self._lock:
+            if self._display:
+                self._x11.XCloseDisplay(self._display)
+                self._display = None
+            self.available = False
+    
+    def _process_events(self) -> bool:
+        """
+        处理已到达的所有事件（调用方持有锁）
+        
+        Returns:
+            bool: 是否有窗口标题变化（窗口列表变化只标记为待重新读取）
+        """
+        x11 = self._x11
+        event = XEvent()
+        title_atoms = (self._atoms['_NET_WM_NAME'], self._atoms['WM_NAME'])
+        changed = False
+        
+        while x11.XPending(self._display):
+            x11.XNextEvent(self._display, ctypes.byref(event))
+            if event.type == PROPERTY_NOTIFY:
+                window, atom = event.xproperty.window, event.xproperty.atom
+                if window == self._root:
+                    if atom == self._atoms['_NET_CLIENT_LIST']:
+                        self._list_dirty = True
+                elif window in self._titles and atom in title_atoms:
+                    title = self._read_title(window)
+                    if title != self._titles[window]:
+                        self._titles[window] = title
+                        changed = True
+            elif event.type in _TREE_EVENTS and not self._use_client_list:
+                self._list_dirty = True
+        return changed
+    
+    def _reload_list(self) -> bool:
+        """
+        重新读取窗口列表，只查询新增窗口的标题（调用方持有锁）
+        
+        Returns:
+            bool: 窗口列表是否变化
+        """
+        window_ids = self._read_client_list()
+        self._use_client_list = window_ids is not None
+        if window_ids is None:
+            window_ids = self._read_top_level_windows()
+        
+        titles = {}
+        for window_id in window_ids:
+            if window_id in self._titles:
+                titles[window_id] = self._titles[window_id]
+            else:
+                # 新窗口：订阅标题变化后再读取标题，避免错过两者之间的修改
+                self._x11.XSelectInput(self._display, window_id, PROPERTY_CHANGE_MASK)
+                titles[window_id] = self._read_title(window_id)
+        
+        changed = list(titles) != list(self._titles)
+        self._titles = titles
+        return changed
+    
+    def _windows(self) -> List[Tuple[int, str]]:
+        """有标题的窗口列表（调用方持有锁）"""
+        return [(window_id, title) for window_id, title in self._titles.items() if title]
+    
+    def _read_client_list(self) -> Optional[List[int]]:
+        """
+        读取窗口管理器维护的_NET_CLIENT_LIST
+        
+        Returns:
+            list: 窗口ID列表，没有窗口管理器时返回None
+        """
+        data = self._get_property(self._root, self._atoms['_NET_CLIENT_LIST'], XA_WINDOW)
+        if data is None:
+            return None
+        return list(data)
+    
+    def _read_top_level_windows(self) -> List[int]:
+        """
+        读取根窗口下可见的子窗口（没有窗口管理器时使用）
+        
+        Returns:
+            list: 窗口ID列表（按叠放顺序）
+        """
+        x11 = self._x11
+        root = ctypes.c_ulong()
+        parent = ctypes.c_ulong()
+        children = ctypes.POINTER(ctypes.c_ulong)()
+        count = ctypes.c_uint()
+        if not x11.XQueryTree(self._display, self._root, ctypes.byref(root), ctypes.byref(parent),
+                              ctypes.byref(children), ctypes.byref(count)):
+            return []
+        
+        window_ids = [children[i] for i in range(count.value)]
+        if children:
+            x11.XFree(children)
+        
+        attributes = XWindowAttributes()
+        return [
+            window_id for window_id in window_ids
+            if x11.XGetWindowAttributes(self._display, window_id, ctypes.byref(attributes))
+            and attributes.map_state == IS_VIEWABLE and not attributes.override_redirect
+        ]
+    
+    def _read_title(self, window_id: int) -> str:
+        """
+        读取窗口标题，优先使用UTF-8的_NET_WM_NAME
+        
+        Args:
+            window_id: X窗口ID
+        
+        Returns:
+            str: 窗口标题，窗口不存在或没有标题时返回空字符串
+        """
+        data = self._get_property(window_id, self._atoms['_NET_WM_NAME'], self._atoms['UTF8_STRING'])
+        if not data:
+            data = self._get_property(window_id, self._atoms['WM_NAME'], ANY_PROPERTY_TYPE)
+        if not data:
+            return ""
+        return bytes(data).decode('utf-8', errors='replace').strip()
+    
+    def _get_property(self, window_id: int, atom: int, req_type: int):
+        """
+        读取窗口属性
+        
+        Args:
+            window_id: X窗口ID
+            atom: 属性
+            req_type: 期望的属性类型（ANY_PROPERTY_TYPE不限）
+        
+        Returns:
+            8位格式返回bytes，32位格式返回整数列表；属性不存在或窗口已销毁时返回None
+        """
+        x11 = self._x11
+        actual_type = ctypes.c_ulong()
+        actual_format = ctypes.c_int()
+        item_count = ctypes.c_ulong()
+        bytes_after = ctypes.c_ulong()
+        data = ctypes.c_void_p()
+        
+        status = x11.XGetWindowProperty(
+            self._display, window_id, atom, 0, 1 << 16, 0, req_type,
+            ctypes.byref(actual_type), ctypes.byref(actual_format), ctypes.byref(item_count),
+            ctypes.byref(bytes_after), ctypes.byref(data)
+        )
+        if status != 0 or not data.value:
+            return None
+        
+        try:
+            if actual_type.value == 0:
+                return None
+            if actual_format.value == 8:
+                return ctypes.string_at(data.value, item_count.value)
+            if actual_format.value == 32:
+                # 32位格式的属性在客户端按C long存放
+                return list((ctypes.c_ulong * item_count.value).from_address(data.value))
+            return None
+        finally:
+            x11.XFree(data)
+
+
+class WindowRegistry:
+    """
+    窗口注册表
+    
+    首次查询时完整枚举一次窗口并建立标题索引（小写标题），之后由后台线程增量维护：
+    有事件监听（watcher）时等待窗口事件，否则每隔poll_interval枚举一次并与索引比较，
+    只有窗口列表或标题变化时才重建索引。关键词查询只扫描内存中的索引，结果按关键词缓存到下一次变化
+    """
+    
+    DEFAULT_POLL_INTERVAL = 2.0    # 轮询枚举的间隔（秒）
+    MAX_CACHED_KEYWORDS = 64       # 查询结果缓存的关键词数量上限
+    
+    def __init__(self, enumerate_windows: Callable[[], List[Tuple[int, str]]],
+                 poll_interval: Optional[float] = DEFAULT_POLL_INTERVAL,
+                 watcher: Optional[X11WindowWatcher] = None):
+        """
+        初始化窗口注册表
+        
+        Args:
+            enumerate_windows: 完整枚举窗口的函数，返回 [(hwnd, title), ...]
+            poll_interval: 轮询枚举的间隔（秒），None表示不在后台更新（窗口列表固定或只按需刷新）
+            watcher: 窗口事件监听，提供时以事件代替轮询
+        """
+        self._enumerate_windows = enumerate_windows
+        self.poll_interval = poll_interval
+        self.watcher = watcher
+        if watcher is not None:
+            self.backend = 'x11_events'
+        else:
+            self.backend = 'polling' if poll_interval else 'static'
+        
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = False
+        
+        self._windows: Dict[int, str] = {}
+        self._index: List[Tuple[int, str, str]] = []     # (hwnd, title, 小写标题)
+        self._cache: Dict[str, List[Tuple[int, str]]] = {}
+        self._version = 0
+        self._updated_at: Optional[float] = None
+        self._stats = {
+            'full_scans': 0,
+            'incremental_updates': 0,
+            'lookups': 0,
+            'cache_hits': 0,
+            'last_scan_ms': 0.0
+        }
+    
+    def start(self) -> None:
+        """完整枚举一次窗口建立索引，并启动后台更新线程"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        
+        self.refresh()
+        if self.watcher is None and not self.poll_interval:
+            return
+        
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="WindowRegistry", daemon=True)
+        self._thread.start()
+        logger.info("Window registry started (%s), %s windows indexed", self.backend, len(self._windows))
+    
+    def stop(self) -> None:
+        """停止后台更新线程（再次查询时重新建立索引）"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        with self._lock:
+            self._started = False
+    
+    def refresh(self) -> bool:
+        """
+        立即完整枚举一次窗口并更新索引
+        
+        Returns:
+            bool: 窗口列表或标题是否变化
+        """
+        with self._refresh_lock:
+            started = time.perf_counter()
+            if self.watcher is not None:
+                windows = self.watcher.snapshot()
+            else:
+                windows = self._enumerate_windows()
+            scan_ms = (time.perf_counter() - started) * 1000
+            
+            with self._lock:
+                self._stats['full_scans'] += 1
+                self._stats['last_scan_ms'] = round(scan_ms, 2)
+            return self._apply(windows)
+    
+    def lookup(self, keyword: str = "", refresh: bool = False) -> List[Tuple[int, str]]:
+        """
+        按关键词查找窗口
+        
+        Args:
+            keyword: 窗口标题关键词（不区分大小写），空字符串返回所有窗口
+            refresh: 是否先完整枚举一次（不等待后台更新）
+        
+        Returns:
+            list: [(hwnd, title), ...]
+        """
+        if not self._started:
+            self.start()
+        elif refresh:
+            self.refresh()
+        
+        key = keyword.lower()
+        with self._lock:
+            self._stats['lookups'] += 1
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._stats['cache_hits'] += 1
+                return list(cached)
+            
+            result = [(hwnd, title) for hwnd, title, lowered in self._index if key in lowered]
+            if len(self._cache) >= self.MAX_CACHED_KEYWORDS:
+                self._cache.clear()
+            self._cache[key] = result
+            return list(result)
+    
+    def get_title(self, hwnd: int) -> Optional[str]:
+        """
+        获取窗口标题
+        
+        Args:
+            hwnd: 窗口句柄
+        
+        Returns:
+            str: 窗口标题，不在索引中时返回None
+        """
+        with self._lock:
+            return self._windows.get(hwnd)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取注册表统计信息
+        
+        Returns:
+            Dict[str, Any]: 后端、窗口数量、索引版本、枚举和查询次数等
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'backend': self.backend,
+                'running': self._thread is not None and self._thread.is_alive(),
+                'windows': len(self._windows),
+                'version': self._version,
+                'index_age_s': round(time.monotonic() - self._updated_at, 1) if self._updated_at is not None else None
+            })
+            return stats
+    
+    def _apply(self, windows: List[Tuple[int, str]]) -> bool:
+        """
+        把新的窗口列表合并到索引
+        
+        Args:
+            windows: [(hwnd, title), ...]
+        
+        Returns:
+            bool: 是否有变化
+        """
+        current = {hwnd: title.strip() for hwnd, title in windows if title and title.strip()}
+        
+        with self._lock:
+            self._updated_at = time.monotonic()
+            # 顺序也比较：macOS的句柄是窗口在枚举结果中的序号
+            if list(current.items()) == list(self._windows.items()):
+                return False
+            
+            if self._version:
+                self._stats['incremental_updates'] += 1
+            self._windows = current
+            self._index = [(hwnd, title, title.lower()) for hwnd, title in current.items()]
+            self._cache.clear()
+            self._version += 1
+            return True
+    
+    def _run(self) -> None:
+        """后台更新线程主循环"""
+        interval = self.poll_interval or self.DEFAULT_POLL_INTERVAL
+        
+        while not self._stop_event.is_set():
+            try:
+                if self.watcher is not None:
+                    windows = self.watcher.poll(interval)
+                    if windows is not None:
+                        self._apply(windows)
+                else:
+                    if self._stop_event.wait(interval):
+                        break
+                    self.refresh()
+            except Exception as e:
+                logger.warn("Window registry update failed: %s", e, interval=5)
+                self._stop_event.wait(interval)
@@ -0,0 +1,504 @@
+"""
+X11共享内存截图模块
+通过ctypes调用libX11/libXext的MIT-SHM扩展，把目标窗口区域直接截取到共享内存，
+避免pyautogui全屏截图经过PIL和多次拷贝。只依赖系统的X11库，可以在Xvfb下运行
+"""
+import ctypes
+import ctypes.util
+import threading
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from engine_log import get_logger
+
+logger = get_logger('x11_capture')
+
+
+# Xlib常量
+ZPIXMAP = 2
+ALL_PLANES = 0xFFFFFFFFFFFFFFFF
+IS_VIEWABLE = 2
+# System V共享内存常量
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+
+
+class XShmSegmentInfo(ctypes.Structure):
+    """XShmSegmentInfo结构"""
+    _fields_ = [
+        ('shmseg', ctypes.c_ulong),
+        ('shmid', ctypes.c_int),
+        ('shmaddr', ctypes.c_void_p),
+        ('readOnly', ctypes.c_int),
+    ]
+
+
+class XImage(ctypes.Structure):
+    """XImage结构（只读取数据布局相关的字段，函数表按指针占位）"""
+    _fields_ = [
+        ('width', ctypes.c_int),
+        ('height', ctypes.c_int),
+        ('xoffset', ctypes.c_int),
+        ('format', ctypes.c_int),
+        ('data', ctypes.c_void_p),
+        ('byte_order', ctypes.c_int),
+        ('bitmap_unit', ctypes.c_int),
+        ('bitmap_bit_order', ctypes.c_int),
+        ('bitmap_pad', ctypes.c_int),
+        ('depth', ctypes.c_int),
+        ('bytes_per_line', ctypes.c_int),
+        ('bits_per_pixel', ctypes.c_int),
+        ('red_mask', ctypes.c_ulong),
+        ('green_mask', ctypes.c_ulong),
+        ('blue_mask', ctypes.c_ulong),
+        ('obdata', ctypes.c_void_p),
+        ('f', ctypes.c_void_p * 6),
+    ]
+
+
+class XWindowAttributes(ctypes.Structure):
+    """XWindowAttributes结构"""
+    _fields_ = [
+        ('x', ctypes.c_int),
+        ('y', ctypes.c_int),
+        ('width', ctypes.c_int),
+        ('height', ctypes.c_int),
+        ('border_width', ctypes.c_int),
+        ('depth', ctypes.c_int),
+        ('visual', ctypes.c_void_p),
+        ('root', ctypes.c_ulong),
+        ('class', ctypes.c_int),
+        ('bit_gravity', ctypes.c_int),
+        ('win_gravity', ctypes.c_int),
+        ('backing_store', ctypes.c_int),
+        ('backing_planes', ctypes.c_ulong),
+        ('backing_pixel', ctypes.c_ulong),
+        ('save_under', ctypes.c_int),
+        ('colormap', ctypes.c_ulong),
+        ('map_installed', ctypes.c_int),
+        ('map_state', ctypes.c_int),
+        ('all_event_masks', ctypes.c_long),
+        ('your_event_mask', ctypes.c_long),
+        ('do_not_propagate_mask', ctypes.c_long),
+        ('override_redirect', ctypes.c_int),
+        ('screen', ctypes.c_void_p),
+    ]
+
+
+class XErrorEvent(ctypes.Structure):
+    """XErrorEvent结构"""
+    _fields_ = [
+        ('type', ctypes.c_int),
+        ('display', ctypes.c_void_p),
+        ('resourceid', ctypes.c_ulong),
+        ('serial', ctypes.c_ulong),
+        ('error_code', ctypes.c_ubyte),
+        ('request_code', ctypes.c_ubyte),
+        ('minor_code', ctypes.c_ubyte),
+    ]
+
+
+X_ERROR_HANDLER = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(XErrorEvent))
+
+# 延迟加载的库句柄
+_libs = None
+_libs_lock = threading.Lock()
+
+# X错误处理：Xlib默认的错误处理会直接退出进程，这里只记录最近一次错误码
+_last_error = 0
+
+
+@X_ERROR_HANDLER
+def _error_handler(display, event):
+    """记录X错误而不是退出进程"""
+    global _last_error
+    _last_error = event.contents.error_code
+    return 0
+
+
+def _load_libraries():
+    """
+    加载并声明X11、Xext和libc函数
+    
+    Returns:
+        tuple: (libX11, libXext, libc)，系统没有X11库时返回None
+    """
+    global _libs
+    with _libs_lock:
+        if _libs is not None:
+            return _libs or None
+        
+        try:
+            x11 = ctypes.CDLL(ctypes.util.find_library('X11') or 'libX11.so.6')
+            xext = ctypes.CDLL(ctypes.util.find_library('Xext') or 'libXext.so.6')
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        except OSError:
+            _libs = ()
+            return None
+        
+        display_p = ctypes.c_void_p
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XOpenDisplay.restype = display_p
+        x11.XCloseDisplay.argtypes = [display_p]
+        x11.XDefaultScreen.argtypes = [display_p]
+        x11.XRootWindow.argtypes = [display_p, ctypes.c_int]
+        x11.XRootWindow.restype = ctypes.c_ulong
+        x11.XDefaultVisual.argtypes = [display_p, ctypes.c_int]
+        x11.XDefaultVisual.restype = ctypes.c_void_p
+        x11.XDefaultDepth.argtypes = [display_p, ctypes.c_int]
+        x11.XDisplayWidth.argtypes = [display_p, ctypes.c_int]
+        x11.XDisplayHeight.argtypes = [display_p, ctypes.c_int]
+        x11.XSync.argtypes = [display_p, ctypes.c_int]
+        x11.XSetErrorHandler.argtypes = [X_ERROR_HANDLER]
+        x11.XSetErrorHandler.restype = ctypes.c_void_p
+        x11.XGetWindowAttributes.argtypes = [display_p, ctypes.c_ulong, ctypes.POINTER(XWindowAttributes)]
+        x11.XTranslateCoordinates.argtypes = [
+            display_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_int, ctypes.c_int,
+            ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_ulong)
+        ]
+        x11.XDestroyImage.argtypes = [ctypes.POINTER(XImage)]
+        
+        xext.XShmQueryExtension.argtypes = [display_p]
+        xext.XShmCreateImage.argtypes = [
+            display_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_void_p,
+            ctypes.POINTER(XShmSegmentInfo), ctypes.c_uint, ctypes.c_uint
+        ]
+        xext.XShmCreateImage.restype = ctypes.POINTER(XImage)
+        xext.XShmAttach.argtypes = [display_p, ctypes.POINTER(XShmSegmentInfo)]
+        xext.XShmDetach.argtypes = [display_p, ctypes.POINTER(XShmSegmentInfo)]
+        xext.XShmGetImage.argtypes = [
+            display_p, ctypes.c_ulong, ctypes.POINTER(XImage), ctypes.c_int, ctypes.c_int, ctypes.c_ulong
+        ]
+        
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        libc.shmat.restype = ctypes.c_void_p
+        libc.shmdt.argtypes = [ctypes.c_void_p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+        
+        x11.XSetErrorHandler(_error_handler)
+        _libs = (x11, xext, libc)
+        return _libs
+
+
+class X11ShmCapture:
+    """
+    基于MIT-SHM的X11窗口截图
+    
+    X服务器直接把窗口区域写入共享内存段，numpy数组直接映射该内存，
+    转换为BGR时写入预分配的输出缓冲区，整个过程不产生额外的内存分配。
+    输出缓冲区轮换使用，返回的图像在之后BUFFER_COUNT次截图内保持有效，需要长期保存时应复制
+    """
+    
+    BUFFER_COUNT = 3  # 轮换使用的输出缓冲区数量
+    
+    def __init__(self, display_name: Optional[str] = None):
+        """
+        初始化X11截图并连接显示服务器
+        
+        Args:
+            display_name: 显示名称（如":99"），None使用DISPLAY环境变量
+        """
+        self.available = False       # MIT-SHM是否可用
+        self.window_id = None        # 目标窗口，None表示整个屏幕
+        self._lock = threading.Lock()
+        self._display = None
+        self._root = 0
+        self._visual = None
+        self._depth = 0
+        self._screen_size = (0, 0)
+        self._image = None           # XShmCreateImage创建的XImage
+        self._segment = None         # 共享内存段信息
+        self._image_size = None      # 当前共享内存图像的尺寸 (width, height)
+        self._raw = None             # 映射共享内存的BGRA/RGBA数组
+        self._convert_code = cv2.COLOR_BGRA2BGR
+        self._buffers = []           # 预分配的BGR输出缓冲区
+        self._buffer_index = 0
+        
+        self._libs = _load_libraries()
+        if self._libs is None:
+            logger.warn("X11 libraries not available, MIT-SHM capture disabled")
+            return
+        
+        x11, xext, _ = self._libs
+        self._display = x11.XOpenDisplay(display_name.encode() if display_name else None)
+        if not self._display:
+            logger.warn("Cannot open X display, MIT-SHM capture disabled")
+            return
+        
+        if not xext.XShmQueryExtension(self._display):
+            logger.warn("MIT-SHM extension not available on this display")
+            self.close()
+            return
+        
+        screen = x11.XDefaultScreen(self._display)
+        self._root = x11.XRootWindow(self._display, screen)
+        self._visual = x11.XDefaultVisual(self._display, screen)
+        self._depth = x11.XDefaultDepth(self._display, screen)
+        self._screen_size = (x11.XDisplayWidth(self._display, screen), x11.XDisplayHeight(self._display, screen))
+        
+        if self._depth not in (24, 32):
+            logger.warn("Unsupported X display depth %s, MIT-SHM capture disabled", self._depth)
+            self.close()
+            return
+        
+        self.available = True
+        logger.ok("MIT-SHM capture enabled, screen %sx%s", self._screen_size[0], self._screen_size[1])
+    
+    def set_window(self, window_id: Optional[int]) -> bool:
+        """
+        设置截图的目标窗口
+        
+        Args:
+            window_id: X窗口ID，None表示整个屏幕
+        
+        Returns:
+            bool: 窗口是否有效（无效时截取整个屏幕）
+        """
+        with self._lock:
+            self.window_id = None
+            if window_id is None or not self.available:
+                return window_id is None
+            if self._window_geometry(window_id) is None:
+                logger.warn("X window %s not found, capturing the whole screen", window_id, interval=5)
+                return False
+            self.window_id = window_id
+            return True
+    
+    def probe_window(self) -> Optional[str]:
+        """
+        探测目标窗口的状态（一次属性查询，不截图）
+        
+        Returns:
+            str: 'closed'（窗口已销毁）、'minimized'（窗口未映射）或'normal'，没有目标窗口时返回None
+        """
+        global _last_error
+        with self._lock:
+            if not self.available or self.window_id is None:
+                return None
+            
+            x11 = self._libs[0]
+            attributes = XWindowAttributes()
+            _last_error = 0
+            ok = x11.XGetWindowAttributes(self._display, self.window_id, ctypes.byref(attributes))
+            x11.XSync(self._display, 0)
+            if not ok or _last_error:
+                return 'closed'
+            if attributes.map_state != IS_VIEWABLE:
+                return 'minimized'
+            return 'normal'
+    
+    @property
+    def raw_format(self) -> str:
+        """grab_raw()返回图像的通道顺序：'bgra'或'rgba'"""
+        return 'rgba' if self._convert_code == cv2.COLOR_RGBA2BGR else 'bgra'
+    
+    @property
+    def screen_size(self) -> Tuple[int, int]:
+        """屏幕尺寸 (width, height)"""
+        return self._screen_size
+    
+    def get_window_rect(self) -> Optional[Tuple[int, int, int, int]]:
+        """
+        获取截图区域（目标窗口在屏幕上的可见部分）
+        
+        Returns:
+            tuple: (left, top, width, height)，不可用时返回None
+        """
+        with self._lock:
+            return self._capture_rect()
+    
+    def grab(self) -> Optional[np.ndarray]:
+        """
+        截取目标窗口，返回BGR图像
+        
+        Returns:
+            numpy.ndarray: BGR图像（输出缓冲区的新视图），失败返回None
+        """
+        with self._lock:
+            raw = self._grab_raw()
+            if raw is None:
+                return None
+            
+            height, width = raw.shape[:2]
+            if not self._buffers or self._buffers[0].shape[:2] != (height, width):
+                self._buffers = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(self.BUFFER_COUNT)]
+            buffer = self._buffers[self._buffer_index]
+            self._buffer_index = (self._buffer_index + 1) % self.BUFFER_COUNT
+            
+            cv2.cvtColor(raw, self._convert_code, dst=buffer)
+            # 返回新的视图对象，使下游按对象身份缓存的逻辑能区分不同帧
+            return buffer.view()
+    
+    def grab_raw(self) -> Optional[np.ndarray]:
+        """
+        截取目标窗口，返回直接映射共享内存的4通道图像
+        
+        Returns:
+            numpy.ndarray: BGRA（或RGBA，取决于显示格式）图像，下一次截图时内容会被覆盖，失败返回None
+        """
+        with self._lock:
+            return self._grab_raw()
+    
+    def close(self) -> None:
+        """释放共享内存并断开显示连接"""
+        with self._lock:
+            self._release_image()
+            if self._display:
+                self._libs[0].XCloseDisplay(self._display)
+                self._display = None
+            self.available = False
+    
+    def _grab_raw(self) -> Optional[np.ndarray]:
+        """截取到共享内存（调用方持有锁）"""
+        if not self.available:
+            return None
+        
+        rect = self._capture_rect()
+        if rect is None:
+            return None
+        left, top, width, height = rect
+        
+        try:
+            if self._image_size != (width, height):
+                self._allocate_image(width, height)
+        except Exception as e:
+            logger.error("MIT-SHM allocation failed: %s", e)
+            self._release_image()
+            return None
+        
+        _, xext, _ = self._libs
+        if not xext.XShmGetImage(self._display, self._root, self._image, left, top, ALL_PLANES):
+            return None
+        return self._raw
+    
+    def _capture_rect(self) -> Optional[Tuple[int, int, int, int]]:
+        """
+        计算截图区域，裁剪到屏幕范围内（调用方持有锁）
+        
+        Returns:
+            tuple: (left, top, width, height)，窗口不可见时返回None
+        """
+        if not self.available:
+            return None
+        
+        screen_width, screen_height = self._screen_size
+        if self.window_id is None:
+            return 0, 0, screen_width, screen_height
+        
+        geometry = self._window_geometry(self.window_id)
+        if geometry is None:
+            return None
+        x, y, width, height = geometry
+        
+        left, top = max(0, x), max(0, y)
+        right, bottom = min(screen_width, x + width), min(screen_height, y + height)
+        if right <= left or bottom <= top:
+            return None
+        return left, top, right - left, bottom - top
+    
+    def _window_geometry(self, window_id: int) -> Optional[Tuple[int, int, int, int]]:
+        """
+        查询窗口在根窗口坐标系中的位置和尺寸
+        
+        Args:
+            window_id: X窗口ID
+        
+        Returns:
+            tuple: (x, y, width, height)，窗口不存在或未显示时返回None
+        """
+        global _last_error
+        x11 = self._libs[0]
+        attributes = XWindowAttributes()
+        x = ctypes.c_int()
+        y = ctypes.c_int()
+        child = ctypes.c_ulong()
+        
+        _last_error = 0
+        ok = x11.XGetWindowAttributes(self._display, window_id, ctypes.byref(attributes))
+        if ok:
+            ok = x11.XTranslateCoordinates(self._display, window_id, self._root, 0, 0,
+                                           ctypes.byref(x), ctypes.byref(y), ctypes.byref(child))
+        x11.XSync(self._display, 0)
+        if not ok or _last_error or attributes.map_state != IS_VIEWABLE:
+            return None
+        return x.value, y.value, attributes.width, attributes.height
+    
+    def _allocate_image(self, width: int, height: int) -> None:
+        """
+        按尺寸创建共享内存图像（调用方持有锁）
+        
+        Args:
+            width: 宽度
+            height: 高度
+        """
+        self._release_image()
+        x11, xext, libc = self._libs
+        
+        segment = XShmSegmentInfo()
+        image = xext.XShmCreateImage(self._display, self._visual, self._depth, ZPIXMAP, None,
+                                     ctypes.byref(segment), width, height)
+        if not image:
+            raise RuntimeError("XShmCreateImage failed")
+        if image.contents.bits_per_pixel != 32:
+            image.contents.data = None
+            x11.XDestroyImage(image)
+            raise RuntimeError(f"unsupported bits per pixel: {image.contents.bits_per_pixel}")
+        
+        bytes_per_line = image.contents.bytes_per_line
+        size = bytes_per_line * height
+        shmid = libc.shmget(IPC_PRIVATE, size, IPC_CREAT | 0o600)
+        if shmid < 0:
+            image.contents.data = None
+            x11.XDestroyImage(image)
+            raise OSError(ctypes.get_errno(), "shmget failed")
+        
+        address = libc.shmat(shmid, None, 0)
+        if address in (None, ctypes.c_void_p(-1).value):
+            libc.shmctl(shmid, IPC_RMID, None)
+            image.contents.data = None
+            x11.XDestroyImage(image)
+            raise OSError(ctypes.get_errno(), "shmat failed")
+        
+        segment.shmid = shmid
+        segment.shmaddr = address
+        segment.readOnly = 0
+        image.contents.data = address
+        xext.XShmAttach(self._display, ctypes.byref(segment))
+        x11.XSync(self._display, 0)
+        # 服务器已挂载，标记删除后进程退出时内核会自动回收共享内存段
+        libc.shmctl(shmid, IPC_RMID, None)
+        
+        self._image = image
+        self._segment = segment
+        self._image_size = (width, height)
+        
+        # 直接映射共享内存，按行跨度处理行尾填充
+        buffer = (ctypes.c_uint8 * size).from_address(address)
+        self._raw = np.ndarray((height, width, 4), dtype=np.uint8, buffer=buffer, strides=(bytes_per_line, 4, 1))
+        
+        # ZPixmap在小端机器上红色掩码为0xff0000时内存顺序为B, G, R, X
+        red_first = image.contents.red_mask == 0xFF and image.contents.byte_order == 0
+        self._convert_code = cv2.COLOR_RGBA2BGR if red_first else cv2.COLOR_BGRA2BGR
+    
+    def _release_image(self) -> None:
+        """释放共享内存图像（调用方持有锁）"""
+        if self._image is None:
+            return
+        
+        x11, xext, libc = self._libs
+        self._raw = None
+        self._buffers = []
+        xext.XShmDetach(self._display, ctypes.byref(self._segment))
+        x11.XSync(self._display, 0)
+        # 图像数据位于共享内存，不能由XDestroyImage释放
+        self._image.contents.data = None
+        x11.XDestroyImage(self._image)
+        libc.shmdt(self._segment.shmaddr)
+        
+        self._image = None
+        self._segment = None
+        self._image_size = None
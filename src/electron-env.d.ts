@@ -5,6 +5,31 @@ declare global {
     electronAPI: {
       ping: () => Promise<string>
       sendToPython: (data: any) => void
+      invokePython: (command: { action: string; [key: string]: any }, timeoutMs?: number) => Promise<{
+        type: 'response'
+        id: string
+        action: string | null
+        success: boolean
+        data: any
+        timing: { queue_ms: number; duration_ms: number }
+        timestamp: number
+      }>
+      onPreviewFrame: (callback: (frame: {
+        meta: {
+          slot: number
+          seq: number
+          frame_id: number
+          width: number
+          height: number
+          channels: number
+          encoding: 'jpeg' | 'rgba'
+          length: number
+          source_size: [number, number]
+          encode_ms: number
+        }
+        data: Uint8Array
+      }) => void) => void
+      offPreviewFrame: () => void
       onPythonData: (callback: (data: any) => void) => void
       // 配置相关方法
       saveConfig: (config: { hotkeys: { start: string; stop: string }; serverType?: 'cn' | 'global' }) => Promise<boolean>
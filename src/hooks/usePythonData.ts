@@ -63,6 +63,10 @@ export function usePythonData() {
                data.type === 'config_test_result') {
         handleImageRecognitionData(data)
       }
+      // 命令回复和引擎就绪消息由主进程按id分发给invokePython的调用方
+      else if (data.type === 'response' || data.type === 'ready') {
+        return
+      }
       // 未知消息类型
       else {
         console.warn('Unknown Python data type:', data.type, data)